@@ -1,5 +1,6 @@
 from flask import Flask, render_template, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.engine import make_url
 import os
 import urllib.parse
 from dotenv import load_dotenv
@@ -10,6 +11,10 @@ load_dotenv()
 
 app = Flask(__name__)
 
+# jsonify writes pre-encoded GeoJSON (RawJSON) into responses as it is
+from raw_json import RawJSONProvider
+app.json = RawJSONProvider(app)
+
 # Configure database
 database_url = os.getenv('DATABASE_URL')
 
@@ -48,8 +53,92 @@ if database_url and 'mssql+pyodbc' in database_url:
 
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# Concurrency model of the gunicorn workers, 'threads' or 'gevent' (see concurrency.py)
+from concurrency import CONCURRENCY_MODE, gevent_enabled
+app.config['CONCURRENCY_MODE'] = CONCURRENCY_MODE
+
+# Request threads per gthread worker and requests per gevent worker, read by gunicorn.conf.py too
+app.config['GUNICORN_THREADS'] = int(os.getenv('GUNICORN_THREADS', '4'))
+app.config['GUNICORN_WORKER_CONNECTIONS'] = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+# Search runs the database and geocoder lookups concurrently, waiting at most SEARCH_DEADLINE seconds for the geocoder.
+# Each search holds up to two search threads. In gevent mode they are greenlets, so every
+# request a worker accepts can search at once; the database calls are still capped by DB_THREADPOOL_SIZE.
+app.config['SEARCH_DEADLINE'] = float(os.getenv('SEARCH_DEADLINE', '2.5'))
+app.config['SEARCH_THREADS'] = int(os.getenv(
+    'SEARCH_THREADS',
+    str(2 * app.config['GUNICORN_WORKER_CONNECTIONS']) if gevent_enabled() else '4'
+))
+
+# Database calls running at once per worker in gevent mode
+app.config['DB_THREADPOOL_SIZE'] = int(os.getenv('DB_THREADPOOL_SIZE', '10'))
+
+# Everything below is per worker process, so keep the defaults small: every
+# gunicorn worker gets its own pool and caches. A threaded worker uses at
+# most one connection per request thread plus one per search thread, a
+# gevent worker one per database call running on its threadpool.
+if gevent_enabled():
+    default_pool_size = app.config['DB_THREADPOOL_SIZE']
+else:
+    default_pool_size = app.config['GUNICORN_THREADS'] + app.config['SEARCH_THREADS']
+
+# Connection pool per worker process. Azure SQL drops idle connections, so
+# connections are recycled well before that and checked before use.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+    'pool_pre_ping': True
+}
+
+# Only a QueuePool takes a size, SQLite in memory uses a single static connection
+def uses_queue_pool(url):
+    """Check whether the engine for a database URL gets a QueuePool."""
+    url = make_url(url)
+    return not (url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'))
+
+if database_url and uses_queue_pool(database_url):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update({
+        'pool_size': int(os.getenv('DB_POOL_SIZE', str(default_pool_size))),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '2')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30'))
+    })
+
+# Memory held by the in-process caches of each worker
+app.config['SNAPSHOT_CACHE_MB'] = int(os.getenv('SNAPSHOT_CACHE_MB', '16'))
+app.config['TILE_MEMORY_CACHE_SIZE'] = int(os.getenv('TILE_MEMORY_CACHE_SIZE', '256'))
+
+# Connections each worker opens on startup, so first requests don't pay for the login
+app.config['DB_POOL_WARM'] = int(os.getenv('DB_POOL_WARM', '2'))
+
+# Directory for on-disk caches (e.g. vector tiles), shared by all workers
+app.config['CACHE_DIR'] = os.getenv('CACHE_DIR', os.path.join(app.instance_path, 'cache'))
+
+# Geocoder used for place-name search, point PHOTON_URL at a local stand-in for tests and benchmarks
+app.config['PHOTON_URL'] = os.getenv('PHOTON_URL', 'https://photon.komoot.io/api/')
+app.config['PHOTON_TIMEOUT'] = float(os.getenv('PHOTON_TIMEOUT', '3'))
+app.config['GEOCODER_CACHE_TTL'] = int(os.getenv('GEOCODER_CACHE_TTL', '3600'))
+app.config['GEOCODER_CACHE_SIZE'] = int(os.getenv('GEOCODER_CACHE_SIZE', '2048'))
+
+# Offline place names searched before the geocoder, a CSV of name, place_type, city, region, lat, lng.
+# The bundled file only lists major places, point this at a LINZ or OpenStreetMap extract for full coverage.
+app.config['GAZETTEER_PATH'] = os.getenv('GAZETTEER_PATH', os.path.join(app.root_path, 'data', 'nz_places.csv'))
+# The geocoder is asked when the gazetteer returns fewer places than this. 1 (only when it has no
+# match) suits a full extract; raise it, up to 10, to let the geocoder fill in for the bundled list.
+app.config['GAZETTEER_FALLBACK_THRESHOLD'] = int(os.getenv('GAZETTEER_FALLBACK_THRESHOLD', '1'))
+
 db = SQLAlchemy(app)
 
+# Keep pyodbc from blocking the other requests of a gevent worker
+if gevent_enabled():
+    from concurrency import make_driver_cooperative
+    with app.app_context():
+        make_driver_cooperative(db.engine, app.config['DB_THREADPOOL_SIZE'])
+
+# Spatial SQL of the database engine in use, SQL Server, PostGIS or SpatiaLite (see spatial_backends)
+from spatial_backends import get_spatial_backend
+with app.app_context():
+    spatial = get_spatial_backend(db.engine)
+
 from flask_migrate import Migrate
 
 # Initialize the database and migration
@@ -57,6 +146,7 @@ migrate = Migrate(app, db)
 
 # Import routes after app initialization to avoid circular imports
 from routes import *
+import commands
 
 if __name__ == '__main__':
     with app.app_context():
@@ -0,0 +1,360 @@
+"""
+Benchmark the API against a synthetic dataset.
+
+Loads a synthetic dataset through the bulk import endpoint, then drives the
+Flask routes with concurrent requests through the test client and writes a
+JSON report with throughput, latency percentiles and SQL statements per
+request for each scenario, and the peak RSS of the whole run, for diffing
+between commits.
+
+The database is whatever DATABASE_URL points at, so use a disposable local
+instance, never production. The geocoder is replaced by an in-process stub
+with a fixed latency, so search results don't depend on the network.
+
+Usage:
+    python -m benchmarks.run --scale 10000 --output results.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Run from the repository root so the app modules can be imported
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db, spatial
+from sqlalchemy import event, text
+
+from benchmarks.synthetic import generate_features
+from cache import locations_version
+from geocoder import geocoder
+from tiles import tile_cache
+
+# Features per bulk import request while loading
+LOAD_BATCH_SIZE = 5000
+
+# Location types the synthetic dataset uses, created if missing
+LOCATION_TYPES = [
+    {'short_name': 'dog_park', 'icon': 'pets', 'color': '#4CAF50'},
+    {'short_name': 'vet', 'icon': 'local_hospital', 'color': '#2196F3'},
+]
+
+# Viewports used by the bbox scenarios: (name, bbox, zoom)
+VIEWPORTS = [
+    ('wellington', '174.70,-41.35,174.90,-41.20', 13),
+    ('auckland', '174.60,-37.00,174.95,-36.75', 11),
+    ('north_island', '172.5,-41.7,178.6,-34.3', 7),
+]
+
+# Search queries, a mix of places, parks and typos
+SEARCH_QUERIES = ['wel', 'Auckland', 'Benchmark Park 0001', 'chch', 'taupo', 'Kelburn', 'park 00', 'dunedn']
+
+
+class StubGeocoderBackend:
+    """Geocoder backend answering from memory after a fixed delay."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def search(self, params):
+        time.sleep(self.latency)
+        return {
+            'type': 'FeatureCollection',
+            'features': [{
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [174.7762, -41.2865]},
+                'properties': {
+                    'name': f"{params['q'].title()} Stub",
+                    'country': 'New Zealand',
+                    'state': 'Wellington',
+                    'osm_key': 'place',
+                    'osm_value': 'suburb',
+                    'suburb': 'Stub'
+                }
+            }]
+        }
+
+
+class StatementCounter:
+    """
+    Counts every SQL statement run on the engine, whichever thread runs it.
+
+    Statements are counted for a whole scenario and divided by its requests,
+    so those run on the app's own threads (e.g. the search pool) are included.
+    """
+
+    def __init__(self):
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def install(self):
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._increment)
+
+    def _increment(self, *args):
+        with self._lock:
+            self._count += 1
+
+    def reset(self):
+        with self._lock:
+            self._count = 0
+
+    @property
+    def count(self):
+        return self._count
+
+
+statements = StatementCounter()
+
+
+def percentile(values, fraction):
+    """Get a percentile of sorted values, by nearest rank."""
+    if not values:
+        return None
+    index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def peak_rss_mb():
+    """Get the peak resident set size of this process, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def summarize(name, results, elapsed, statement_count):
+    """Build the report entry of a scenario from (latency, status) results and its SQL statement count."""
+    latencies = sorted(result[0] for result in results)
+    errors = sum(1 for result in results if result[1] >= 400)
+
+    return {
+        'scenario': name,
+        'requests': len(results),
+        'errors': errors,
+        'throughput_rps': round(len(results) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+            'p50': round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+            'p90': round(percentile(latencies, 0.90) * 1000, 3) if latencies else None,
+            'p99': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+            'max': round(latencies[-1] * 1000, 3) if latencies else None,
+        },
+        'sql_statements_per_request': round(statement_count / len(results), 2) if results else None
+    }
+
+
+def run_scenario(name, make_request, requests, concurrency):
+    """
+    Run a scenario's requests concurrently.
+
+    Args:
+        name: Scenario name for the report
+        make_request: Function taking a test client and a request number and
+            returning a response
+        requests: Number of requests
+        concurrency: Number of requests in flight at once
+    """
+    local = threading.local()
+
+    def one(i):
+        # Test clients aren't shared between threads
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+
+        started = time.perf_counter()
+        response = make_request(client, i)
+        response.get_data()
+        return (time.perf_counter() - started, response.status_code)
+
+    statements.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    summary = summarize(name, results, elapsed, statements.count)
+    print(f"{name}: {summary['throughput_rps']} req/s, p50 {summary['latency_ms']['p50']} ms, "
+          f"p99 {summary['latency_ms']['p99']} ms, {summary['errors']} errors", file=sys.stderr)
+    return summary
+
+
+def reset_dataset():
+    """Delete every location created by a previous benchmark run."""
+    with app.app_context():
+        db.session.execute(text("""
+            DELETE FROM map_location_lod
+            WHERE location_id IN (SELECT id FROM map_location WHERE name LIKE 'Benchmark Park %')
+        """))
+        db.session.execute(text("DELETE FROM map_location WHERE name LIKE 'Benchmark Park %'"))
+        db.session.commit()
+
+    # The rows were deleted behind the app's back, so drop everything built
+    # from them, or later scenarios would measure stale cache hits
+    locations_version.bump()
+    tile_cache.clear()
+
+
+def ensure_location_types(client):
+    """Create the location types of the synthetic dataset if they don't exist."""
+    existing = {location_type['short_name'] for location_type in client.get('/api/location-types').get_json()['data']}
+    for location_type in LOCATION_TYPES:
+        if location_type['short_name'] not in existing:
+            client.post('/api/location-types', json=location_type)
+
+
+def load_dataset(client, scale, seed):
+    """
+    Load a synthetic dataset through the bulk import endpoint.
+
+    Returns:
+        dict: The report entry of the load
+    """
+    features = generate_features(scale, seed=seed)
+    results = []
+    statements.reset()
+    started = time.perf_counter()
+
+    while True:
+        batch = [feature for _, feature in zip(range(LOAD_BATCH_SIZE), features)]
+        if not batch:
+            break
+
+        batch_started = time.perf_counter()
+        response = client.post('/api/locations/bulk', json={'type': 'FeatureCollection', 'features': batch})
+        results.append((time.perf_counter() - batch_started, response.status_code))
+
+        if response.status_code != 201:
+            raise RuntimeError(f"Bulk import failed: {response.get_data(as_text=True)[:500]}")
+
+    elapsed = time.perf_counter() - started
+    summary = summarize('bulk_load', results, elapsed, statements.count)
+    summary['features'] = scale
+    summary['features_per_second'] = round(scale / elapsed, 1)
+    print(f"bulk_load: {scale} features in {elapsed:.1f} s", file=sys.stderr)
+    return summary
+
+
+def benchmark_location_ids(limit=100):
+    """Get the IDs of some loaded benchmark locations, for the update scenario."""
+    with app.app_context():
+        rows = db.session.execute(text(f"""
+            SELECT {spatial.top(':limit')} id FROM map_location
+            WHERE name LIKE 'Benchmark Park %'
+            ORDER BY id {spatial.limit(':limit')}
+        """), {'limit': limit}).fetchall()
+        return [row.id for row in rows]
+
+
+def build_scenarios(seed, location_ids):
+    """Get the (name, request function) pairs of every read and write scenario."""
+    scenarios = [
+        ('locations_all', lambda client, i: client.get('/api/locations')),
+        # A unique parameter per request defeats the response cache
+        ('locations_all_uncached', lambda client, i: client.get(f'/api/locations?nocache={seed}-{i}')),
+        ('locations_page', lambda client, i: client.get(f'/api/locations?limit=100&nocache={seed}-{i}')),
+        ('locations_markers', lambda client, i: client.get(
+            f'/api/locations?fields=id,name,lat,lng,type&geometry=none&nocache={seed}-{i}'
+        )),
+        ('dog_parks', lambda client, i: client.get('/api/dog_parks')),
+        ('search', lambda client, i: client.get(f'/api/search?q={SEARCH_QUERIES[i % len(SEARCH_QUERIES)]}')),
+        ('nearby', lambda client, i: client.get(f'/api/locations/nearby?lat={-41.29 + (i % 50) * 0.001}&lng=174.78&k=10')),
+        ('create', lambda client, i: client.post('/api/locations', json={
+            'name': f"Benchmark Park write {seed}-{i}",
+            'description': 'Benchmark write',
+            'location_type': 'dog_park',
+            'geometry': {'type': 'Point', 'coordinates': [174.78 + (i % 100) * 0.0001, -41.29]}
+        })),
+    ]
+
+    if location_ids:
+        scenarios.append(('update', lambda client, i: client.put(f'/api/locations/{location_ids[i % len(location_ids)]}', json={
+            'name': f"Benchmark Park update {location_ids[i % len(location_ids)]}",
+            'description': 'Benchmark update',
+            'location_type': 'dog_park',
+            'geometry': {'type': 'Point', 'coordinates': [174.78, -41.29 + (i % 100) * 0.0001]}
+        })))
+
+    for name, bbox, zoom in VIEWPORTS:
+        scenarios.append((
+            f'locations_bbox_{name}_uncached',
+            lambda client, i, bbox=bbox, zoom=zoom: client.get(f'/api/locations?bbox={bbox}&zoom={zoom}&nocache={seed}-{i}')
+        ))
+
+    return scenarios
+
+
+def git_revision():
+    """Get the commit being benchmarked, if running from a git checkout."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scale', type=int, default=1000, choices=[1000, 10000, 100000],
+                        help='Number of synthetic locations to load')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight at once')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic dataset')
+    parser.add_argument('--geocoder-latency', type=float, default=0.05,
+                        help='Seconds the stub geocoder takes to answer')
+    parser.add_argument('--scenario', action='append', help='Only run the named scenario (repeatable)')
+    parser.add_argument('--skip-load', action='store_true', help='Reuse the dataset from a previous run')
+    parser.add_argument('--keep', action='store_true', help='Leave the dataset in the database afterwards')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    geocoder.backend = StubGeocoderBackend(args.geocoder_latency)
+    geocoder.cache.clear()
+    statements.install()
+    client = app.test_client()
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'database': spatial.name,
+        'scale': args.scale,
+        'concurrency': args.concurrency,
+        'requests_per_scenario': args.requests,
+        'seed': args.seed,
+        'results': []
+    }
+
+    ensure_location_types(client)
+
+    if not args.skip_load:
+        reset_dataset()
+        report['results'].append(load_dataset(client, args.scale, args.seed))
+
+    try:
+        for name, make_request in build_scenarios(args.seed, benchmark_location_ids()):
+            if args.scenario and name not in args.scenario:
+                continue
+            report['results'].append(run_scenario(name, make_request, args.requests, args.concurrency))
+    finally:
+        if not args.keep:
+            reset_dataset()
+
+    # ru_maxrss is a high-water mark for the whole process, dataset load
+    # included, so it is only meaningful once per run
+    report['peak_rss_mb'] = round(peak_rss_mb(), 1)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
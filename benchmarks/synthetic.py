@@ -0,0 +1,113 @@
+"""
+Synthetic dog park datasets for benchmarks.
+
+Parks are scattered around the towns in the bundled gazetteer, so their
+density follows where people actually live. A dataset mixes points (vets,
+small parks), linestrings (walking tracks) and polygons (park boundaries)
+with vertex counts in the range of real park data. The same seed always
+gives the same dataset.
+"""
+import csv
+import math
+import os
+import random
+
+# Share of each geometry kind in a dataset
+POINT_SHARE = 0.4
+LINE_SHARE = 0.2
+
+# Vertex count ranges of linestrings and polygon rings
+LINE_VERTICES = (20, 200)
+POLYGON_VERTICES = (16, 400)
+
+# Metres per degree of latitude
+METRES_PER_DEGREE = 111320.0
+
+PLACES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'nz_places.csv')
+
+
+def load_centres(path=PLACES_PATH):
+    """Load the (lng, lat) points parks are scattered around."""
+    with open(path, newline='', encoding='utf-8') as places_file:
+        return [(float(row['lng']), float(row['lat'])) for row in csv.DictReader(places_file)]
+
+
+def _offset(lng, lat, east_m, north_m):
+    """Move a point by a distance in metres."""
+    return (
+        lng + east_m / (METRES_PER_DEGREE * math.cos(math.radians(lat))),
+        lat + north_m / METRES_PER_DEGREE
+    )
+
+
+def _point(rng, lng, lat):
+    return {'type': 'Point', 'coordinates': [round(lng, 7), round(lat, 7)]}
+
+
+def _linestring(rng, lng, lat):
+    """A meandering track with a few metres between vertices."""
+    coordinates = []
+    heading = rng.uniform(0, 2 * math.pi)
+    for _ in range(rng.randint(*LINE_VERTICES)):
+        coordinates.append([round(lng, 7), round(lat, 7)])
+        heading += rng.gauss(0, 0.3)
+        step = rng.uniform(5, 25)
+        lng, lat = _offset(lng, lat, step * math.cos(heading), step * math.sin(heading))
+    return {'type': 'LineString', 'coordinates': coordinates}
+
+
+def _polygon(rng, lng, lat):
+    """A lumpy, counter-clockwise park boundary 50 to 800 metres across."""
+    vertices = rng.randint(*POLYGON_VERTICES)
+    radius = rng.uniform(25, 400)
+    ring = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        distance = radius * rng.uniform(0.85, 1.15)
+        point_lng, point_lat = _offset(lng, lat, distance * math.cos(angle), distance * math.sin(angle))
+        ring.append([round(point_lng, 7), round(point_lat, 7)])
+    ring.append(ring[0])
+    return {'type': 'Polygon', 'coordinates': [ring]}
+
+
+def generate_features(count, seed=0, location_types=('dog_park', 'vet')):
+    """
+    Generate a synthetic dataset.
+
+    Args:
+        count: Number of features
+        seed: Random seed
+        location_types: Type short_names to use, the first for parks and
+            tracks, the second for points
+
+    Yields:
+        dict: GeoJSON Features with name, description and location_type properties
+    """
+    rng = random.Random(seed)
+    centres = load_centres()
+
+    for i in range(count):
+        centre_lng, centre_lat = rng.choice(centres)
+        # Most parks within a few kilometres of the town centre
+        lng, lat = _offset(centre_lng, centre_lat, rng.gauss(0, 3000), rng.gauss(0, 3000))
+
+        kind = rng.random()
+        if kind < POINT_SHARE:
+            geometry = _point(rng, lng, lat)
+            location_type = location_types[-1]
+        elif kind < POINT_SHARE + LINE_SHARE:
+            geometry = _linestring(rng, lng, lat)
+            location_type = location_types[0]
+        else:
+            geometry = _polygon(rng, lng, lat)
+            location_type = location_types[0]
+
+        yield {
+            'type': 'Feature',
+            'geometry': geometry,
+            'properties': {
+                'name': f"Benchmark Park {i:06d}",
+                'description': f"Synthetic location {i} generated with seed {seed}",
+                'location_type': location_type
+            }
+        }
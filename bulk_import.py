@@ -0,0 +1,198 @@
+"""
+Bulk import of map locations from GeoJSON.
+
+Features are read from a FeatureCollection or from newline delimited GeoJSON
+(one Feature per line), validated up front, and inserted with multi-row
+INSERT statements in a single transaction, so an import either succeeds
+completely or leaves the table untouched.
+"""
+from app import db, spatial
+from sqlalchemy import text
+import json
+import shapely
+from shapely.geometry import shape
+
+from models import calculate_center_coordinates_batch
+from location_types import current_location_types
+from geojson_encoder import geometry_to_geojson_text
+from lod import insert_lod_geometries
+
+# Rows per INSERT statement. Each row binds 7 parameters, keeping each
+# statement well below SQL Server's limit of 2100 parameters.
+INSERT_CHUNK_SIZE = 250
+
+# Content types read as newline delimited GeoJSON rather than a FeatureCollection
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/geo+json-seq')
+
+
+class BulkImportError(ValueError):
+    """Raised when features fail validation, with one message per invalid feature."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid feature(s)")
+        self.errors = errors
+
+
+def read_features(request):
+    """
+    Read the features to import from a request.
+
+    Returns:
+        list: GeoJSON Feature dicts
+
+    Raises:
+        BulkImportError: If the body isn't a FeatureCollection or valid NDJSON
+    """
+    if request.mimetype in NDJSON_CONTENT_TYPES:
+        features = []
+        for line_number, line in enumerate(request.stream, start=1):
+            # GeoJSON text sequences prefix each record with a record separator
+            try:
+                line = line.decode('utf-8').strip().lstrip('\x1e')
+            except UnicodeDecodeError:
+                raise BulkImportError([f"Line {line_number}: not valid UTF-8"])
+            if not line:
+                continue
+            try:
+                features.append(json.loads(line))
+            except ValueError as e:
+                raise BulkImportError([f"Line {line_number}: invalid JSON: {str(e)}"])
+        return features
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and data.get('type') == 'FeatureCollection':
+        return data.get('features') or []
+    if isinstance(data, list):
+        return data
+
+    raise BulkImportError(["Body must be a GeoJSON FeatureCollection or newline delimited GeoJSON features"])
+
+
+def prepare_rows(features):
+    """
+    Validate features and convert them to rows for insertion.
+
+    Each feature needs a geometry and name and location_type properties,
+    location_type being a type ID or short_name as for a single location.
+
+    Returns:
+        tuple: (list of row dicts, list of Shapely geometries)
+
+    Raises:
+        BulkImportError: Listing every invalid feature
+    """
+    # Resolve location types from memory rather than one query per feature
+    location_types = current_location_types()
+
+    rows = []
+    geoms = []
+    errors = []
+
+    for index, feature in enumerate(features):
+        if not isinstance(feature, dict):
+            errors.append(f"Feature {index}: not a GeoJSON object")
+            continue
+
+        properties = feature.get('properties') or {}
+        if not isinstance(properties, dict):
+            errors.append(f"Feature {index}: properties must be an object")
+            continue
+
+        name = properties.get('name')
+        if not name:
+            errors.append(f"Feature {index}: missing name")
+            continue
+
+        location_type_input = properties.get('location_type', properties.get('type'))
+        location_type = location_types.resolve(location_type_input)
+
+        if not location_type:
+            errors.append(f"Feature {index}: invalid location type: {location_type_input}")
+            continue
+
+        try:
+            geom = shape(feature.get('geometry') or {})
+        except Exception as e:
+            errors.append(f"Feature {index}: invalid geometry: {str(e)}")
+            continue
+
+        if geom.is_empty:
+            errors.append(f"Feature {index}: empty geometry")
+            continue
+
+        rows.append({
+            'name': name,
+            'description': properties.get('description', ''),
+            'wkt': geom.wkt,
+            'geojson': geometry_to_geojson_text(geom),
+            'type': location_type.id
+        })
+        geoms.append(geom)
+
+    if errors:
+        raise BulkImportError(errors)
+
+    # Centre points for all features in one vectorised pass
+    for row, (lat, lng) in zip(rows, calculate_center_coordinates_batch(geoms)):
+        row['lat'] = lat
+        row['lng'] = lng
+
+    return rows, geoms
+
+
+def _insert_chunk(rows):
+    """
+    Insert rows with a single statement and return their new IDs, in row order.
+
+    Neither SQL Server's OUTPUT nor RETURNING guarantee the order of the
+    returned rows, but identities of an INSERT ... SELECT are assigned in
+    ORDER BY order, so sorting the IDs lines them up with the rows again.
+    """
+    values = []
+    params = {}
+    for i, row in enumerate(rows):
+        values.append(f"(:name_{i}, :description_{i}, :wkt_{i}, :geojson_{i}, :type_{i}, :lat_{i}, :lng_{i}, {i})")
+        for key in ('name', 'description', 'wkt', 'geojson', 'type', 'lat', 'lng'):
+            params[f"{key}_{i}"] = row[key]
+
+    source = spatial.values_table(
+        ', '.join(values),
+        ['name', 'description', 'wkt', 'geojson', 'type', 'lat', 'lng', 'position'],
+        'v'
+    )
+
+    sql = text(spatial.insert_returning_id(
+        "INSERT INTO map_location (name, description, geometry, geojson, type, lat, lng, created_at, updated_at)",
+        f"""
+        SELECT v.name, v.description, {spatial.geometry_from_wkt('v.wkt')}, v.geojson, v.type, v.lat, v.lng, {spatial.now}, {spatial.now}
+        FROM {source}
+        ORDER BY v.position
+        """
+    ))
+
+    return sorted(row.id for row in db.session.execute(sql, params).fetchall())
+
+
+def insert_locations(rows, geoms):
+    """
+    Insert prepared rows and their LOD geometries.
+
+    Runs in the caller's transaction, the caller is responsible for committing.
+
+    Returns:
+        list: The new location IDs, in row order
+    """
+    location_ids = []
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        location_ids += _insert_chunk(rows[start:start + INSERT_CHUNK_SIZE])
+
+    insert_lod_geometries(zip(location_ids, geoms))
+
+    return location_ids
+
+
+def import_bounds(geoms):
+    """Get the combined bounds of imported geometries, for cache invalidation."""
+    if not geoms:
+        return None
+    return tuple(shapely.total_bounds(geoms))
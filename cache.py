@@ -0,0 +1,256 @@
+"""
+In-process caches, most importantly for serialized API responses.
+
+Cached responses are keyed by request and tagged with the version of the
+dataset they were built from. Write routes bump the version, which is kept
+in a small file in CACHE_DIR so that every worker sees the change on its
+next request.
+"""
+from app import app
+from flask import request
+from collections import OrderedDict, namedtuple
+import contextlib
+import functools
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from metrics import record_cache
+
+try:
+    import fcntl
+except ImportError:
+    # No file locks on Windows, where only bumps within one process are serialised
+    fcntl = None
+
+
+class DatasetVersion:
+    """Version token of a dataset, shared between workers through a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stat_key = None
+        # Used if the version file can't be read or written
+        self._token = uuid.uuid4().hex
+        # Set once writing the version file failed, e.g. CACHE_DIR isn't
+        # writable, so reads keep the in-process token instead of bumping it
+        self._write_failed = False
+
+    def get(self):
+        """Get the current version token."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            if self._write_failed:
+                return self._token
+            return self.bump()
+        except OSError:
+            return self._token
+
+        # Only re-read the file when it has been replaced
+        stat_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if stat_key != self._stat_key:
+                try:
+                    with open(self.path) as version_file:
+                        self._token = version_file.read().strip() or self._token
+                    self._stat_key = stat_key
+                except OSError:
+                    pass
+            return self._token
+
+    def bump(self):
+        """Change the version token, invalidating everything built from the old one."""
+        return self.bump_from(None)[0]
+
+    def bump_from(self, previous):
+        """
+        Change the version token, telling whether it was still a given token.
+
+        Reading and replacing the token happen under a lock shared by every
+        worker, so no other bump can slip in between. Something patched
+        incrementally for the previous version, e.g. an in-memory index, is
+        only current for the new one if nothing else bumped meanwhile.
+
+        Args:
+            previous: The token the version is expected to have
+
+        Returns:
+            tuple: (new token, whether the version was still previous)
+        """
+        token = uuid.uuid4().hex
+        with self._lock, self._file_lock():
+            current = self._token if self._write_failed else self._read_file()
+            unchanged = previous is not None and current == previous
+
+            self._token = token
+            try:
+                directory = os.path.dirname(self.path)
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                with os.fdopen(fd, 'w') as version_file:
+                    version_file.write(token)
+                os.replace(tmp_path, self.path)
+                self._stat_key = None
+                self._write_failed = False
+            except OSError as e:
+                self._write_failed = True
+                app.logger.error(f"Error writing dataset version {self.path}: {str(e)}")
+        return token, unchanged
+
+    def _read_file(self):
+        """Read the token from the version file, bypassing the cached stat."""
+        try:
+            with open(self.path) as version_file:
+                return version_file.read().strip() or self._token
+        except OSError:
+            return self._token
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Hold the lock serialising bumps across workers, if the lock file can be opened."""
+        if fcntl is None:
+            yield
+            return
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            lock_file = open(self.path + '.lock', 'a')
+        except OSError:
+            yield
+            return
+
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+Snapshot = namedtuple('Snapshot', ['version', 'body', 'etag', 'mimetype'])
+
+
+class SnapshotCache:
+    """LRU cache of response bodies, each valid for a single dataset version."""
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """Get the snapshot for a key, or None if missing or built from another version."""
+        with self._lock:
+            snapshot = self._entries.get(key)
+            if snapshot is None:
+                return None
+            if snapshot.version != version:
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return snapshot
+
+    def put(self, key, version, body, mimetype):
+        """Store a response body and return its snapshot."""
+        snapshot = Snapshot(version, body, hashlib.sha1(body).hexdigest(), mimetype)
+
+        # Don't let a single huge response evict everything else
+        if len(body) > self.max_bytes // 4:
+            return snapshot
+
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = snapshot
+            self._size += len(body)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+        return snapshot
+
+    def _pop(self, key):
+        snapshot = self._entries.pop(key, None)
+        if snapshot is not None:
+            self._size -= len(snapshot.body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire a fixed time after being stored."""
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get a cached value, or None if it is missing or has expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Store a value."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+locations_version = DatasetVersion(os.path.join(app.config['CACHE_DIR'], 'locations.version'))
+snapshot_cache = SnapshotCache(max_bytes=app.config['SNAPSHOT_CACHE_MB'] * 1024 * 1024)
+
+
+def cached_snapshot(view):
+    """
+    Cache a view's successful responses until the locations dataset changes.
+
+    Responses carry an ETag, and requests with a matching If-None-Match get
+    a 304 Not Modified without a body.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+        version = locations_version.get()
+
+        snapshot = snapshot_cache.get(key, version)
+        record_cache('snapshot', snapshot is not None)
+        if snapshot is None:
+            response = app.make_response(view(*args, **kwargs))
+
+            # Only cache complete, successful responses
+            if response.status_code != 200 or response.is_streamed:
+                return response
+
+            snapshot = snapshot_cache.put(key, version, response.get_data(), response.mimetype)
+
+        response = app.response_class(snapshot.body, mimetype=snapshot.mimetype)
+        response.set_etag(snapshot.etag)
+        # Browsers keep the response but check it is still current before using it
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    return wrapper
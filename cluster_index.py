@@ -0,0 +1,250 @@
+"""
+In-memory clustering of map locations for /api/clusters.
+
+Locations are clustered on a hierarchical grid in web mercator space. The
+centre of each location (its lat/lng columns) is stored once as fixed point
+grid coordinates, and its cell at any zoom level is those coordinates
+shifted right, so the cells of each zoom level nest exactly inside the cells
+of the level above. Clustering a viewport groups the locations in the cells
+it covers with a few vectorised numpy calls, so browsers get one marker per
+cluster instead of clustering the whole dataset themselves.
+"""
+from app import db
+from sqlalchemy import text
+import threading
+import numpy as np
+
+from cache import locations_version
+
+# Bits of precision of the grid coordinates along each axis
+GRID_BITS = 30
+
+# Cells per 256 pixel map tile along each axis is 2 ** CELL_ZOOM_OFFSET,
+# so 2 gives cells of 64 pixels, about the radius of a cluster marker
+CELL_ZOOM_OFFSET = 2
+
+# Above this zoom level locations are no longer clustered, each is returned on its own
+MAX_CLUSTER_ZOOM = 16
+
+# Latitude limit of the web mercator projection
+MAX_LATITUDE = 85.0511287798
+
+# Locations the arrays have room for before they first grow
+INITIAL_CAPACITY = 1024
+
+
+def _to_grid(lng, lat):
+    """
+    Convert longitudes and latitudes to web mercator grid coordinates.
+
+    Returns:
+        tuple: (x, y) integer arrays, y increasing southwards
+    """
+    lng = np.asarray(lng, dtype=np.float64)
+    lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE))
+
+    x = (lng + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0
+
+    scale = 1 << GRID_BITS
+    return (
+        np.clip(np.floor(x * scale), 0, scale - 1).astype(np.int64),
+        np.clip(np.floor(y * scale), 0, scale - 1).astype(np.int64)
+    )
+
+
+class ClusterIndex:
+    """Grid index of location centres, updated incrementally on writes."""
+
+    def __init__(self):
+        self.version = None
+        self._lock = threading.RLock()
+        self._clear(INITIAL_CAPACITY)
+
+    def _clear(self, capacity):
+        # location ID -> slot in the arrays
+        self._slots = {}
+        # Slots of removed locations, reused by the next additions
+        self._free = []
+        # Slots used so far, the arrays are unused past it
+        self._size = 0
+
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._lat = np.zeros(capacity, dtype=np.float64)
+        self._lng = np.zeros(capacity, dtype=np.float64)
+        self._x = np.zeros(capacity, dtype=np.int64)
+        self._y = np.zeros(capacity, dtype=np.int64)
+        self._type = np.zeros(capacity, dtype=np.int64)
+        self._used = np.zeros(capacity, dtype=bool)
+
+    def load(self, rows, version):
+        """Rebuild the index from (id, lat, lng, type) rows for a dataset version."""
+        rows = [row for row in rows if row[1] is not None and row[2] is not None]
+
+        with self._lock:
+            self._clear(max(INITIAL_CAPACITY, len(rows)))
+
+            if rows:
+                ids, lat, lng, types = (np.asarray(column) for column in zip(*rows))
+                count = len(rows)
+                self._ids[:count] = ids
+                self._lat[:count] = lat
+                self._lng[:count] = lng
+                self._x[:count], self._y[:count] = _to_grid(lng, lat)
+                self._type[:count] = types
+                self._used[:count] = True
+                self._slots = dict(zip(ids.tolist(), range(count)))
+                self._size = count
+
+            self.version = version
+
+    def add(self, location_id, lat, lng, type_id):
+        """Add or move a location."""
+        with self._lock:
+            # Locations without a centre can't be placed on the grid
+            if lat is None or lng is None:
+                self._remove(location_id)
+                return
+
+            slot = self._slots.get(location_id)
+            if slot is None:
+                slot = self._free.pop() if self._free else self._next_slot()
+                self._slots[location_id] = slot
+
+            x, y = _to_grid([lng], [lat])
+            self._ids[slot] = location_id
+            self._lat[slot] = lat
+            self._lng[slot] = lng
+            self._x[slot] = x[0]
+            self._y[slot] = y[0]
+            self._type[slot] = type_id
+            self._used[slot] = True
+
+    def remove(self, location_id):
+        """Remove a location."""
+        with self._lock:
+            self._remove(location_id)
+
+    def advance_version(self, previous_version, version):
+        """Mark the index current for a new version if it was current for the previous one."""
+        with self._lock:
+            if self.version == previous_version:
+                self.version = version
+
+    def _remove(self, location_id):
+        slot = self._slots.pop(location_id, None)
+        if slot is not None:
+            self._used[slot] = False
+            self._free.append(slot)
+
+    def _next_slot(self):
+        """Get the next unused slot, growing the arrays when they are full."""
+        if self._size == len(self._ids):
+            capacity = len(self._ids) * 2
+            for name in ('_ids', '_lat', '_lng', '_x', '_y', '_type', '_used'):
+                array = getattr(self, name)
+                grown = np.zeros(capacity, dtype=array.dtype)
+                grown[:len(array)] = array
+                setattr(self, name, grown)
+
+        slot = self._size
+        self._size += 1
+        return slot
+
+    def clusters(self, zoom, bbox=None, type_id=None):
+        """
+        Cluster the locations in a viewport for a zoom level.
+
+        Whole cells are included, so a cluster's count doesn't change as the
+        viewport edge moves across it.
+
+        Args:
+            zoom: Map zoom level
+            bbox: Optional (min_lng, min_lat, max_lng, max_lat), the whole map by default
+            type_id: Optional location type ID, to only cluster locations of that type
+
+        Returns:
+            list: Cluster dictionaries with count, centroid lat and lng, bbox,
+                dominant location type ID and, for a single location, its id
+        """
+        shift = GRID_BITS - CELL_ZOOM_OFFSET - min(zoom, MAX_CLUSTER_ZOOM)
+
+        with self._lock:
+            size = self._size
+            mask = self._used[:size].copy()
+            if type_id is not None:
+                mask &= self._type[:size] == type_id
+
+            cell_x = self._x[:size] >> shift
+            cell_y = self._y[:size] >> shift
+
+            if bbox:
+                min_lng, min_lat, max_lng, max_lat = bbox
+                # The grid's y axis points south, so the north edge has the lower y
+                (west, east), (north, south) = _to_grid([min_lng, max_lng], [max_lat, min_lat])
+                mask &= ((cell_x >= west >> shift) & (cell_x <= east >> shift) &
+                         (cell_y >= north >> shift) & (cell_y <= south >> shift))
+
+            selected = np.flatnonzero(mask)
+            ids = self._ids[selected]
+            lat = self._lat[selected]
+            lng = self._lng[selected]
+            types = self._type[selected]
+
+            if zoom > MAX_CLUSTER_ZOOM:
+                # Every location is a cluster of its own
+                keys = selected
+            else:
+                keys = (cell_x[selected] << GRID_BITS) | cell_y[selected]
+
+        if not len(keys):
+            return []
+
+        # Group the locations of each cell together
+        order = np.argsort(keys, kind='stable')
+        keys, ids, lat, lng, types = keys[order], ids[order], lat[order], lng[order], types[order]
+
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        counts = np.diff(np.append(starts, len(keys)))
+
+        # Most common type of each cluster, the lowest ID on a tie
+        type_count = int(types.max()) + 1
+        cluster_of = np.repeat(np.arange(len(starts)), counts)
+        type_counts = np.bincount(cluster_of * type_count + types, minlength=len(starts) * type_count)
+        dominant = type_counts.reshape(len(starts), type_count).argmax(axis=1)
+
+        columns = zip(
+            counts.tolist(),
+            (np.add.reduceat(lat, starts) / counts).tolist(),
+            (np.add.reduceat(lng, starts) / counts).tolist(),
+            np.minimum.reduceat(lng, starts).tolist(),
+            np.minimum.reduceat(lat, starts).tolist(),
+            np.maximum.reduceat(lng, starts).tolist(),
+            np.maximum.reduceat(lat, starts).tolist(),
+            dominant.tolist(),
+            ids[starts].tolist()
+        )
+
+        return [
+            {
+                'count': count,
+                'lat': centroid_lat,
+                'lng': centroid_lng,
+                'bbox': [west, south, east, north],
+                'type': dominant_type,
+                'id': first_id if count == 1 else None
+            }
+            for count, centroid_lat, centroid_lng, west, south, east, north, dominant_type, first_id in columns
+        ]
+
+
+cluster_index = ClusterIndex()
+
+
+def current_cluster_index():
+    """Get the cluster index, rebuilding it if the locations changed in another worker."""
+    version = locations_version.get()
+    if cluster_index.version != version:
+        rows = db.session.execute(text("SELECT id, lat, lng, type FROM map_location")).fetchall()
+        cluster_index.load([(row.id, row.lat, row.lng, row.type) for row in rows], version)
+    return cluster_index
@@ -0,0 +1,146 @@
+"""
+Flask CLI commands for maintaining derived location data.
+
+Run with e.g. `flask --app app rebuild-lod`.
+"""
+from app import app, db, spatial
+from sqlalchemy import text
+import click
+import shapely
+
+from lod import store_lod_geometries
+from geojson_encoder import geometry_to_geojson_text
+from models import calculate_center_coordinates_batch
+from cache import locations_version
+from tiles import tile_cache
+
+
+def derived_data_changed():
+    """Invalidate the caches built from location data after a chunk of changes is committed."""
+    # Invalidate the cached API responses in every worker, the name and
+    # cluster indexes see the new version and rebuild themselves. Bumped
+    # first, so a tile rendered meanwhile isn't cached (see get_tile).
+    locations_version.bump()
+    # The commands rewrite locations all over the map, so drop every cached tile
+    tile_cache.clear()
+
+
+@app.cli.command('rebuild-lod')
+@click.option('--chunk-size', default=500, show_default=True, help='Locations processed per transaction.')
+def rebuild_lod(chunk_size):
+    """Rebuild the simplified LOD geometries for every location."""
+    last_id = 0
+    total = 0
+
+    while True:
+        rows = db.session.execute(
+            text(f"""
+                SELECT {spatial.top(int(chunk_size))} id, {spatial.as_binary('geometry')} as wkb
+                FROM map_location
+                WHERE id > :last_id
+                ORDER BY id {spatial.limit(int(chunk_size))}
+            """),
+            {"last_id": last_id}
+        ).fetchall()
+
+        if not rows:
+            break
+
+        for row, geom in zip(rows, shapely.from_wkb([row.wkb for row in rows])):
+            if geom is not None:
+                store_lod_geometries(row.id, geom)
+
+        db.session.commit()
+        derived_data_changed()
+
+        last_id = rows[-1].id
+        total += len(rows)
+        click.echo(f"Rebuilt LOD geometries for {total} locations")
+
+
+@app.cli.command('recompute-centres')
+@click.option('--chunk-size', default=2000, show_default=True, help='Locations processed per transaction.')
+def recompute_centres(chunk_size):
+    """Recompute the lat/lng centre point of every location."""
+    last_id = 0
+    total = 0
+
+    while True:
+        rows = db.session.execute(
+            text(f"""
+                SELECT {spatial.top(int(chunk_size))} id, {spatial.as_binary('geometry')} as wkb
+                FROM map_location
+                WHERE id > :last_id
+                ORDER BY id {spatial.limit(int(chunk_size))}
+            """),
+            {"last_id": last_id}
+        ).fetchall()
+
+        if not rows:
+            break
+
+        # Parse and compute the whole chunk with vectorised calls
+        geoms = shapely.from_wkb([row.wkb for row in rows])
+        centres = calculate_center_coordinates_batch(geoms)
+
+        db.session.execute(
+            text("UPDATE map_location SET lat = :lat, lng = :lng WHERE id = :id"),
+            [{"id": row.id, "lat": lat, "lng": lng} for row, (lat, lng) in zip(rows, centres)]
+        )
+        db.session.commit()
+        derived_data_changed()
+
+        last_id = rows[-1].id
+        total += len(rows)
+        click.echo(f"Recomputed centres for {total} locations")
+
+
+@app.cli.command('backfill-geojson')
+@click.option('--chunk-size', default=1000, show_default=True, help='Locations processed per transaction.')
+@click.option('--all', 'rebuild_all', is_flag=True, help='Rewrite every location, not just those without GeoJSON.')
+def backfill_geojson(chunk_size, rebuild_all):
+    """Store the pre-encoded GeoJSON of locations that don't have it yet."""
+    last_id = 0
+    total = 0
+    condition = "" if rebuild_all else "AND geojson IS NULL"
+
+    while True:
+        rows = db.session.execute(
+            text(f"""
+                SELECT {spatial.top(int(chunk_size))} id, {spatial.as_binary('geometry')} as wkb
+                FROM map_location
+                WHERE id > :last_id {condition}
+                ORDER BY id {spatial.limit(int(chunk_size))}
+            """),
+            {"last_id": last_id}
+        ).fetchall()
+
+        if not rows:
+            break
+
+        geoms = shapely.from_wkb([row.wkb for row in rows])
+        updates = [
+            {"id": row.id, "geojson": geometry_to_geojson_text(geom)}
+            for row, geom in zip(rows, geoms) if geom is not None
+        ]
+
+        if updates:
+            db.session.execute(text("UPDATE map_location SET geojson = :geojson WHERE id = :id"), updates)
+            db.session.commit()
+            derived_data_changed()
+
+        last_id = rows[-1].id
+        total += len(rows)
+        click.echo(f"Stored GeoJSON for {total} locations")
+
+
+@app.cli.command('create-spatial-schema')
+def create_spatial_schema():
+    """Create the tables and spatial index on a PostGIS or SpatiaLite database."""
+    if not spatial.schema_statements:
+        raise click.ClickException(f"The {spatial.name} schema is managed by the migrations, run `flask db upgrade`")
+
+    with db.engine.begin() as connection:
+        spatial.create_schema(connection)
+
+    click.echo(f"Created the {spatial.name} schema")
@@ -0,0 +1,83 @@
+"""
+Optional cooperative concurrency with gevent.
+
+With CONCURRENCY_MODE=gevent, gunicorn runs gevent workers that serve many
+requests at once in one process. gunicorn.conf.py monkey patches the
+standard library before the app is imported, which makes sockets, and so
+the requests based geocoder client, cooperative. pyodbc talks to SQL Server
+from C and would still block the whole worker, so its connections and
+cursors are wrapped in proxies that hand every call waiting on the server
+to gevent's pool of real threads while the waiting greenlet yields. That
+includes fetching rows: pyodbc only buffers a few rows at a time, so each
+fetch of a streamed result can be another round trip.
+"""
+import os
+
+# 'threads' for threaded workers, 'gevent' for cooperative workers
+CONCURRENCY_MODE = os.getenv('CONCURRENCY_MODE', 'threads')
+
+
+def gevent_enabled():
+    """Check whether the app runs in gevent workers."""
+    return CONCURRENCY_MODE == 'gevent'
+
+
+class _CooperativeProxy:
+    """Proxy of a DBAPI object running its blocking methods through a runner."""
+
+    # Methods that wait on the server
+    blocking_methods = ()
+
+    def __init__(self, target, run):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_run', run)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if name in self.blocking_methods:
+            return lambda *args: self._run(value, *args)
+        return value
+
+    def __setattr__(self, name, value):
+        # e.g. fast_executemany on cursors and autocommit on connections
+        setattr(self._target, name, value)
+
+
+class CooperativeCursor(_CooperativeProxy):
+    """DBAPI cursor whose executes and fetches run on gevent's threadpool."""
+
+    blocking_methods = ('execute', 'executemany', 'fetchone', 'fetchmany', 'fetchall', 'nextset')
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+
+class CooperativeConnection(_CooperativeProxy):
+    """DBAPI connection whose cursors and transaction calls are cooperative."""
+
+    blocking_methods = ('commit', 'rollback')
+
+    def cursor(self, *args):
+        return CooperativeCursor(self._target.cursor(*args), self._run)
+
+
+def make_driver_cooperative(engine, threadpool_size):
+    """
+    Run the blocking DBAPI calls of an engine on gevent's threadpool.
+
+    Args:
+        engine: SQLAlchemy engine
+        threadpool_size: Maximum number of database calls running at once
+    """
+    import gevent
+    from sqlalchemy import event
+
+    def run(func, *args):
+        threadpool = gevent.get_hub().threadpool
+        threadpool.maxsize = max(threadpool.maxsize, threadpool_size)
+        return threadpool.apply(func, args)
+
+    # Every connection of the pool is wrapped, so all of its cursors are too
+    @event.listens_for(engine, 'do_connect')
+    def connect(dialect, conn_rec, cargs, cparams):
+        return CooperativeConnection(run(lambda: dialect.loaded_dbapi.connect(*cargs, **cparams)), run)
@@ -0,0 +1,124 @@
+"""
+Full table exports of map locations in GIS file formats.
+
+FlatGeobuf and GeoPackage files are written with fiona (in requirements.txt),
+which is imported on first use since it loads GDAL. Locations are read from the cursor in
+batches and written as they arrive, so memory use doesn't grow with the
+table, and the finished file is then streamed back from disk.
+"""
+from app import app
+import os
+import shutil
+import tempfile
+
+from serializers import iter_locations
+from raw_json import to_python
+
+# Export formats written to a file: (OGR driver, file extension, mimetype)
+FILE_FORMATS = {
+    'flatgeobuf': ('FlatGeobuf', '.fgb', 'application/octet-stream'),
+    'gpkg': ('GPKG', '.gpkg', 'application/geopackage+sqlite3'),
+}
+
+# Name of the exported layer
+LAYER_NAME = 'map_location'
+
+# Attribute schema of exported locations
+SCHEMA = {
+    'geometry': 'Unknown',
+    'properties': {
+        'id': 'int',
+        'name': 'str:255',
+        'description': 'str',
+        'type': 'int',
+        'type_short_name': 'str:50',
+        'lat': 'float',
+        'lng': 'float',
+        'created_at': 'str',
+        'updated_at': 'str',
+    }
+}
+
+# Features handed to the driver at a time
+WRITE_BATCH_SIZE = 1000
+
+# Size of the pieces the finished file is streamed in
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def location_to_record(location):
+    """Convert a serialized location to a fiona record."""
+    return {
+        'geometry': to_python(location['geometry']),
+        'properties': {
+            'id': location['id'],
+            'name': location['name'],
+            'description': location['description'],
+            'type': location['type'],
+            'type_short_name': (location['location_type'] or {}).get('short_name'),
+            'lat': location['lat'],
+            'lng': location['lng'],
+            'created_at': location['created_at'],
+            'updated_at': location['updated_at'],
+        }
+    }
+
+
+def write_export_file(output_format):
+    """
+    Write every location to a temporary file in a GIS format.
+
+    Args:
+        output_format: A key of FILE_FORMATS
+
+    Returns:
+        str: Path of the file, remove its directory with remove_export_file
+    """
+    import fiona
+
+    driver, extension, mimetype = FILE_FORMATS[output_format]
+    directory = tempfile.mkdtemp(prefix='export-')
+    path = os.path.join(directory, f"locations{extension}")
+
+    # FlatGeobuf's spatial index needs every feature in memory, so leave it out
+    options = {'SPATIAL_INDEX': 'NO'} if driver == 'FlatGeobuf' else {}
+
+    try:
+        with fiona.open(path, 'w', driver=driver, schema=SCHEMA, crs='EPSG:4326',
+                        layer=LAYER_NAME, **options) as collection:
+            batch = []
+            for location in iter_locations(order_by="ml.id"):
+                if not location['geometry']:
+                    continue
+                batch.append(location_to_record(location))
+                if len(batch) >= WRITE_BATCH_SIZE:
+                    collection.writerecords(batch)
+                    batch = []
+            if batch:
+                collection.writerecords(batch)
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    return path
+
+
+def stream_export_file(path):
+    """Stream an export file in chunks, removing it once it has been sent."""
+    try:
+        with open(path, 'rb') as export_file:
+            while True:
+                chunk = export_file.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        remove_export_file(path)
+
+
+def remove_export_file(path):
+    """Remove an export file and its temporary directory."""
+    try:
+        shutil.rmtree(os.path.dirname(path))
+    except OSError as e:
+        app.logger.warning(f"Error removing export file {path}: {str(e)}")
@@ -0,0 +1,139 @@
+"""
+Offline gazetteer of New Zealand place names.
+
+Cities, towns, suburbs and villages are loaded from a CSV file (name,
+place_type, city, region, lat, lng), such as an extract of the LINZ or
+OpenStreetMap place names. The bundled data/nz_places.csv is only a short
+hand-picked list of major places, not such an extract (see the README for
+building one, and GAZETTEER_FALLBACK_THRESHOLD for leaning on the
+geocoder). Every word start of every name is kept in a sorted list, so a
+prefix lookup is a binary search and "hutt" finds "Lower Hutt". Names are
+normalised the same way as the search query, so macrons don't matter.
+"""
+from app import app
+import bisect
+import csv
+import threading
+
+from text_utils import normalize_text
+
+# Order of place types in results, most significant first
+PLACE_TYPE_RANK = {'City': 0, 'Town': 1, 'Suburb': 2, 'Village': 3}
+
+
+class Gazetteer:
+    """Prefix index of place names."""
+
+    def __init__(self, places):
+        self.places = places
+
+        # Sorted (key, place index) pairs, one for each word start of each name
+        keys = []
+        for index, place in enumerate(places):
+            normalized = normalize_text(place['name'].lower())
+            words = normalized.split()
+            for i in range(len(words)):
+                keys.append((' '.join(words[i:]), index))
+        keys.sort()
+        self._keys = keys
+
+    @classmethod
+    def from_csv(cls, path):
+        """Load a gazetteer from a CSV file."""
+        places = []
+        with open(path, newline='', encoding='utf-8') as places_file:
+            for row in csv.DictReader(places_file):
+                try:
+                    places.append({
+                        'name': row['name'].strip(),
+                        'place_type': row['place_type'].strip() or 'Location',
+                        'city': (row.get('city') or '').strip(),
+                        'region': (row.get('region') or '').strip(),
+                        'lat': float(row['lat']),
+                        'lng': float(row['lng'])
+                    })
+                except (KeyError, ValueError):
+                    app.logger.warning(f"Skipping invalid gazetteer row: {row}")
+        return cls(places)
+
+    def search(self, query, limit=10):
+        """
+        Find places with a word starting with the query.
+
+        Places whose name starts with the query come first, then the rest,
+        each ordered by place type and name.
+
+        Args:
+            query: The search text
+            limit: Maximum number of places
+
+        Returns:
+            list: Place dicts
+        """
+        normalized_query = ' '.join(normalize_text(query.lower()).split())
+        if not normalized_query:
+            return []
+
+        matches = {}
+        # Walk the keys from the first possible match without copying the rest of the list
+        keys = self._keys
+        for position in range(bisect.bisect_left(keys, (normalized_query,)), len(keys)):
+            key, index = keys[position]
+            if not key.startswith(normalized_query):
+                break
+            # Keep the best kind of match for each place
+            whole_name = normalize_text(self.places[index]['name'].lower()) == key
+            matches[index] = matches.get(index, False) or whole_name
+
+        def rank(index):
+            place = self.places[index]
+            return (
+                not matches[index],
+                PLACE_TYPE_RANK.get(place['place_type'], len(PLACE_TYPE_RANK)),
+                place['name']
+            )
+
+        return [self.places[index] for index in sorted(matches, key=rank)[:limit]]
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Get the gazetteer, loading it on first use."""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                path = app.config['GAZETTEER_PATH']
+                try:
+                    _gazetteer = Gazetteer.from_csv(path)
+                except OSError as e:
+                    app.logger.error(f"Error loading gazetteer {path}: {str(e)}")
+                    _gazetteer = Gazetteer([])
+    return _gazetteer
+
+
+def place_to_location(place):
+    """Convert a gazetteer place to a search result."""
+    # Describe the place the same way as geocoder results
+    description_parts = [part for part in (place['city'], place['region']) if part and part != place['name']]
+    description = ', '.join(description_parts) if description_parts else place['place_type']
+
+    return {
+        'id': None,
+        'name': place['name'],
+        'description': description,
+        'type': place['place_type'],
+        # Default location_type for external locations
+        'location_type': {
+            'id': None,
+            'name': place['place_type'],
+            'icon': 'place',  # Material Icons map marker
+            'color': '#666666'  # Default gray color
+        },
+        'lat': place['lat'],
+        'lng': place['lng'],
+        'source': 'gazetteer'
+    }
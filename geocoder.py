@@ -0,0 +1,96 @@
+"""
+Client for the Photon geocoder used by place-name search.
+
+Requests go through a pooled keep-alive session with a timeout, and results
+are cached for an hour, keyed on the normalised query parameters. The backend
+is pluggable: point PHOTON_URL at a local stand-in server, or swap
+geocoder.backend for an in-process one in tests and benchmarks.
+"""
+from app import app
+import requests
+from requests.adapters import HTTPAdapter
+import time
+
+from cache import TTLCache
+from metrics import record_cache, GEOCODER_LATENCY, GEOCODER_ERRORS
+from text_utils import normalize_text
+
+# New Zealand bounding box (minLng,minLat,maxLng,maxLat)
+NZ_BBOX = '165.5,-47.5,179.0,-34.0'
+
+
+class PhotonBackend:
+    """Backend calling a Photon HTTP API through a pooled session."""
+
+    def __init__(self, url, timeout=3.0, pool_size=10):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def search(self, params):
+        """
+        Run a search.
+
+        Returns:
+            dict: The GeoJSON FeatureCollection returned by Photon
+
+        Raises:
+            requests.RequestException: If the request fails or times out
+        """
+        response = self.session.get(self.url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+class GeocoderClient:
+    """Caching geocoder client, delegating uncached searches to a backend."""
+
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+
+    def search(self, query, limit, osm_tag='place', bbox=NZ_BBOX, lang='en'):
+        """
+        Search for places matching a query.
+
+        Failures are logged and return no results, and are not cached.
+
+        Returns:
+            list: GeoJSON features
+        """
+        key = (normalize_text(query.strip().lower()), limit, osm_tag, bbox, lang)
+        features = self.cache.get(key)
+        record_cache('geocoder', features is not None)
+        if features is not None:
+            return features
+
+        params = {
+            'q': query,
+            'limit': limit,
+            'lang': lang,
+            'osm_tag': osm_tag,
+            'bbox': bbox
+        }
+
+        started = time.perf_counter()
+        try:
+            data = self.backend.search(params)
+        except Exception as e:
+            GEOCODER_ERRORS.inc()
+            app.logger.error(f"Error calling geocoder for '{query}': {str(e)}")
+            return []
+        finally:
+            GEOCODER_LATENCY.observe(time.perf_counter() - started)
+
+        features = data.get('features', []) if isinstance(data, dict) else []
+        self.cache.put(key, features)
+        return features
+
+
+geocoder = GeocoderClient(
+    PhotonBackend(app.config['PHOTON_URL'], timeout=app.config['PHOTON_TIMEOUT']),
+    TTLCache(max_entries=app.config['GEOCODER_CACHE_SIZE'], ttl=app.config['GEOCODER_CACHE_TTL'])
+)
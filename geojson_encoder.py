@@ -0,0 +1,64 @@
+"""
+GeoJSON encoding of shapely geometries.
+
+shapely.geometry.mapping builds a tuple for every coordinate in Python. The
+encoder here pulls each ring or line out as a coordinate array and converts
+it to lists in a single call, which is several times faster for the park
+boundaries the API serves.
+"""
+import json
+import shapely
+
+
+def _coordinates(geom):
+    """Get the coordinates of a simple geometry as a list of [x, y] lists."""
+    return shapely.get_coordinates(geom).tolist()
+
+
+def _polygon_coordinates(polygon):
+    if polygon.is_empty:
+        return []
+    return [_coordinates(polygon.exterior)] + [_coordinates(ring) for ring in polygon.interiors]
+
+
+def geometry_to_geojson(geom):
+    """
+    Convert a shapely geometry to a GeoJSON geometry dict.
+
+    Args:
+        geom: Shapely geometry
+
+    Returns:
+        dict: The GeoJSON geometry, or None if geom is None
+    """
+    if geom is None:
+        return None
+
+    geom_type = geom.geom_type
+
+    if geom_type == 'Point':
+        coordinates = _coordinates(geom)
+        return {'type': 'Point', 'coordinates': coordinates[0] if coordinates else []}
+
+    if geom_type in ('LineString', 'LinearRing'):
+        return {'type': 'LineString', 'coordinates': _coordinates(geom)}
+
+    if geom_type == 'Polygon':
+        return {'type': 'Polygon', 'coordinates': _polygon_coordinates(geom)}
+
+    if geom_type == 'MultiPoint':
+        return {'type': 'MultiPoint', 'coordinates': _coordinates(geom)}
+
+    if geom_type == 'MultiLineString':
+        return {'type': 'MultiLineString', 'coordinates': [_coordinates(line) for line in geom.geoms]}
+
+    if geom_type == 'MultiPolygon':
+        return {'type': 'MultiPolygon', 'coordinates': [_polygon_coordinates(polygon) for polygon in geom.geoms]}
+
+    # GeometryCollection
+    return {'type': geom_type, 'geometries': [geometry_to_geojson(part) for part in geom.geoms]}
+
+
+def geometry_to_geojson_text(geom):
+    """Convert a shapely geometry to compact GeoJSON text, for storing pre-encoded."""
+    return json.dumps(geometry_to_geojson(geom), separators=(',', ':'))
@@ -0,0 +1,89 @@
+"""
+Gunicorn configuration, used by startup.txt.
+
+Every setting can be overridden with the environment variable in its
+comment, and CONCURRENCY_MODE=gevent switches to cooperative gevent
+workers (see concurrency.py). The app is loaded once in the master process
+and the workers are forked from it, then each worker replaces the inherited
+connection pool with its own and warms it up before serving requests.
+"""
+import os
+
+# Concurrency model (CONCURRENCY_MODE), 'threads' or 'gevent'
+gevent_mode = os.getenv('CONCURRENCY_MODE', 'threads') == 'gevent'
+
+# gevent has to patch the standard library before the app imports it
+if gevent_mode:
+    from gevent import monkey
+    monkey.patch_all()
+
+import multiprocessing
+import shutil
+import tempfile
+
+# Directory where every worker writes its metrics (PROMETHEUS_MULTIPROC_DIR),
+# emptied on startup so samples of old processes aren't counted. Has to be
+# set before the app imports prometheus_client.
+metrics_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'dogparksnz-metrics')
+)
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir, exist_ok=True)
+
+# Address to listen on (GUNICORN_BIND)
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+if gevent_mode:
+    # One cooperative worker per core (WEB_CONCURRENCY), at most 4, each
+    # serving up to GUNICORN_WORKER_CONNECTIONS requests at once
+    workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 4)))
+    worker_class = 'gevent'
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+else:
+    # Worker processes (WEB_CONCURRENCY). Each has its own connection pool
+    # and caches, so rely on threads rather than the usual 2 x cores + 1,
+    # which runs small App Service plans out of memory and Azure SQL connections.
+    workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count() + 1, 4)))
+
+    # Threads per worker (GUNICORN_THREADS), so a worker waiting on the database
+    # or the geocoder can still serve other requests
+    threads = int(os.getenv('GUNICORN_THREADS', '4'))
+    worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Request timeout in seconds (GUNICORN_TIMEOUT)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '600'))
+
+# Seconds to keep idle client connections open (GUNICORN_KEEPALIVE)
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# Load the app before forking, so imports happen once and the workers share memory
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    """Load the shared caches in the master, before the workers are forked."""
+    from warmup import warm_shared_caches
+    warm_shared_caches()
+
+
+def post_fork(server, worker):
+    """Give each worker its own connection pool and warm it up."""
+    from app import app, db
+    from warmup import warm_connection_pool, warm_worker_caches
+
+    # Connections inherited from the master can't be shared between
+    # processes. Drop them without closing them, the master still owns them.
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    warm_connection_pool(app.config['DB_POOL_WARM'])
+    warm_worker_caches()
+
+
+def child_exit(server, worker):
+    """Stop counting the live samples of a worker that has exited."""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,88 @@
+"""
+In-process registry of location types.
+
+There are only a handful of location types and they rarely change, so every
+worker keeps them all in memory, keyed by ID and short_name. This replaces
+the per-request type lookups when writing locations, and the join on
+location_type when reading them. Changes to the types bump a version shared
+through CACHE_DIR, so every worker reloads its registry on its next use.
+"""
+from app import app, db
+from sqlalchemy import text
+from collections import namedtuple
+import os
+import threading
+
+from cache import DatasetVersion
+
+LocationTypeInfo = namedtuple('LocationTypeInfo', ['id', 'short_name', 'icon', 'color'])
+
+location_types_version = DatasetVersion(os.path.join(app.config['CACHE_DIR'], 'location_types.version'))
+
+
+class LocationTypeRegistry:
+    """Location types keyed by ID and short_name, for one version of the table."""
+
+    def __init__(self, location_types, version):
+        self.version = version
+        self.by_id = {location_type.id: location_type for location_type in location_types}
+        self.by_name = {location_type.short_name: location_type for location_type in location_types}
+
+    def resolve(self, value):
+        """
+        Look up a location type by ID or short_name.
+
+        Args:
+            value: A type ID (int or digit string) or short_name
+
+        Returns:
+            LocationTypeInfo: The type, or None if there is no such type
+        """
+        if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+            return self.by_id.get(int(value))
+        # Anything else, e.g. a list or object in imported JSON, matches no type
+        if not isinstance(value, str):
+            return None
+        return self.by_name.get(value)
+
+    def embed(self, type_id):
+        """Get the type metadata embedded in serialized locations, or None for an unknown type."""
+        location_type = self.by_id.get(type_id)
+        if location_type is None:
+            return None
+        return {
+            'id': location_type.id,
+            'short_name': location_type.short_name,
+            'icon': location_type.icon,
+            'color': location_type.color
+        }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def current_location_types():
+    """Get the location type registry, reloading it if the types have changed."""
+    global _registry
+    version = location_types_version.get()
+
+    registry = _registry
+    if registry is not None and registry.version == version:
+        return registry
+
+    with _registry_lock:
+        if _registry is None or _registry.version != version:
+            rows = db.session.execute(
+                text("SELECT id, short_name, icon, color FROM location_type")
+            ).fetchall()
+            _registry = LocationTypeRegistry(
+                [LocationTypeInfo(row.id, row.short_name, row.icon, row.color) for row in rows],
+                version
+            )
+        return _registry
+
+
+def invalidate_location_types():
+    """Make every worker reload its registry, call after committing a type change."""
+    location_types_version.bump()
@@ -0,0 +1,136 @@
+"""
+Zoom-dependent levels of detail (LOD) for location geometries.
+
+Simplified versions of each geometry are pre-computed when a location is
+written and stored in the map_location_lod table, one row per tier. The API
+picks a tier from the requested zoom level, so clients zoomed out to a whole
+region don't download and parse full resolution park boundaries.
+"""
+from app import db
+from sqlalchemy import text
+import shapely
+from geojson_encoder import geometry_to_geojson_text
+
+# (tier, maximum zoom level, simplification tolerance in degrees). Each
+# tolerance is roughly half a screen pixel at the tier's maximum zoom level.
+# Zoom levels above the last tier use the full resolution geometry.
+LOD_TIERS = [
+    (0, 8, 0.002),
+    (1, 11, 0.0003),
+    (2, 14, 0.00004),
+]
+
+# Rows per INSERT statement of insert_lod_geometries. Each row binds 3
+# parameters, and SQL Server takes at most 1000 rows in a VALUES list and
+# 2100 parameters in a statement.
+INSERT_CHUNK_SIZE = 500
+
+
+def tier_for_zoom(zoom):
+    """
+    Get the LOD tier to use for a zoom level.
+
+    Returns:
+        int: The tier, or None if the full resolution geometry should be used
+    """
+    if zoom is None:
+        return None
+
+    for tier, max_zoom, tolerance in LOD_TIERS:
+        if zoom <= max_zoom:
+            return tier
+
+    return None
+
+
+def build_lod_geometries(geom):
+    """
+    Build the simplified GeoJSON for each LOD tier of a geometry.
+
+    Tiers that don't remove any vertices are skipped, those zoom levels fall
+    back to the full resolution geometry.
+
+    Args:
+        geom: Shapely geometry
+
+    Returns:
+        dict: GeoJSON text keyed by tier
+    """
+    lod_geometries = {}
+    num_coordinates = shapely.get_num_coordinates(geom)
+
+    for tier, max_zoom, tolerance in LOD_TIERS:
+        simplified = geom.simplify(tolerance, preserve_topology=True)
+
+        if simplified.is_empty or shapely.get_num_coordinates(simplified) >= num_coordinates:
+            continue
+
+        lod_geometries[tier] = geometry_to_geojson_text(simplified)
+
+    return lod_geometries
+
+
+def store_lod_geometries(location_id, geom):
+    """
+    Replace the stored LOD geometries for a location.
+
+    Runs in the caller's transaction, the caller is responsible for committing.
+    """
+    db.session.execute(
+        text("DELETE FROM map_location_lod WHERE location_id = :location_id"),
+        {"location_id": location_id}
+    )
+
+    rows = [
+        {"location_id": location_id, "tier": tier, "geojson": geojson}
+        for tier, geojson in build_lod_geometries(geom).items()
+    ]
+
+    if rows:
+        db.session.execute(
+            text("""
+                INSERT INTO map_location_lod (location_id, tier, geojson)
+                VALUES (:location_id, :tier, :geojson)
+            """),
+            rows
+        )
+
+
+def insert_lod_geometries(locations):
+    """
+    Store the LOD geometries for new locations in a single batched insert.
+
+    Runs in the caller's transaction, the caller is responsible for committing.
+
+    Args:
+        locations: Iterable of (location ID, Shapely geometry) pairs
+    """
+    rows = [
+        (location_id, tier, geojson)
+        for location_id, geom in locations
+        for tier, geojson in build_lod_geometries(geom).items()
+    ]
+
+    # Multi-row VALUES statements rather than executemany, which pyodbc
+    # would run as one round trip per row
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        values = []
+        params = {}
+        for i, (location_id, tier, geojson) in enumerate(rows[start:start + INSERT_CHUNK_SIZE]):
+            values.append(f"(:location_id_{i}, :tier_{i}, :geojson_{i})")
+            params[f"location_id_{i}"] = location_id
+            params[f"tier_{i}"] = tier
+            params[f"geojson_{i}"] = geojson
+
+        db.session.execute(
+            text(f"INSERT INTO map_location_lod (location_id, tier, geojson) VALUES {', '.join(values)}"),
+            params
+        )
+
+
+def delete_lod_geometries(location_id):
+    """Delete the stored LOD geometries for a location."""
+    db.session.execute(
+        text("DELETE FROM map_location_lod WHERE location_id = :location_id"),
+        {"location_id": location_id}
+    )
@@ -0,0 +1,173 @@
+"""
+Prometheus metrics, exported at /metrics.
+
+Covers request latency per route, SQL statements and time per request (from
+SQLAlchemy engine events, including streamed bodies and search pool jobs),
+geocoder latency and errors, and cache hits and misses. Under gunicorn, gunicorn.conf.py sets PROMETHEUS_MULTIPROC_DIR so
+every worker writes its samples to a shared directory, and /metrics adds
+them up across workers.
+"""
+from app import app, db
+from flask import g, request
+from sqlalchemy import event
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+)
+from prometheus_client import multiprocess
+import contextvars
+import os
+import threading
+import time
+
+# Request latency buckets in seconds, from cached responses to large exports
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Buckets for the number of SQL statements run by one request
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to handle a request, by route.',
+    ['method', 'route', 'status'], buckets=LATENCY_BUCKETS
+)
+
+SQL_STATEMENT_DURATION = Histogram(
+    'sql_statement_duration_seconds', 'Time to execute a SQL statement.',
+    buckets=LATENCY_BUCKETS
+)
+
+SQL_STATEMENTS_PER_REQUEST = Histogram(
+    'sql_statements_per_request', 'SQL statements run while handling a request, by route.',
+    ['route'], buckets=STATEMENT_COUNT_BUCKETS
+)
+
+SQL_TIME_PER_REQUEST = Histogram(
+    'sql_time_per_request_seconds', 'Time spent in SQL statements while handling a request, by route.',
+    ['route'], buckets=LATENCY_BUCKETS
+)
+
+GEOCODER_LATENCY = Histogram(
+    'geocoder_request_duration_seconds', 'Time for a geocoder backend request.',
+    buckets=LATENCY_BUCKETS
+)
+
+GEOCODER_ERRORS = Counter(
+    'geocoder_errors_total', 'Failed geocoder backend requests.'
+)
+
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups, by cache and result (hit or miss).',
+    ['cache', 'result']
+)
+
+
+def record_cache(cache, hit):
+    """Count a lookup in a named cache."""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def _route():
+    """Get the route pattern of the current request, so label values stay bounded."""
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+class RequestSqlStats:
+    """SQL statements and time of one request, added to from any thread working for it."""
+
+    def __init__(self):
+        self.statements = 0
+        self.time = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, duration):
+        with self._lock:
+            self.statements += 1
+            self.time += duration
+
+
+# SQL stats of the request being handled. A context variable rather than g,
+# so it is still set while a streamed body is sent, and can be carried into
+# pool threads with with_request_metrics.
+_request_sql_stats = contextvars.ContextVar('request_sql_stats', default=None)
+
+
+def with_request_metrics(func):
+    """
+    Wrap a function to run on another thread, e.g. in an executor, so the
+    SQL it runs is counted against the current request.
+    """
+    context = contextvars.copy_context()
+    return lambda *args: context.run(func, *args)
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    _request_sql_stats.set(RequestSqlStats())
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('metrics_started')
+    stats = _request_sql_stats.get()
+    if started is not None and stats is not None:
+        method, route, status = request.method, _route(), str(response.status_code)
+
+        # Observed once the body has been sent, so streamed responses include
+        # the time and SQL spent producing it
+        def observe():
+            REQUEST_LATENCY.labels(method, route, status).observe(time.perf_counter() - started)
+            SQL_STATEMENTS_PER_REQUEST.labels(route).observe(stats.statements)
+            SQL_TIME_PER_REQUEST.labels(route).observe(stats.time)
+
+        response.call_on_close(observe)
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_started')
+    if not started:
+        return
+
+    duration = time.perf_counter() - started.pop()
+    SQL_STATEMENT_DURATION.observe(duration)
+
+    # Statements outside a request (e.g. CLI commands and warm-up) aren't counted,
+    # those of pool threads are when the job was wrapped with with_request_metrics
+    stats = _request_sql_stats.get()
+    if stats is not None:
+        stats.add(duration)
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None:
+        started = context.connection.info.get('metrics_started')
+        if started:
+            started.pop()
+
+
+with app.app_context():
+    event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(db.engine, 'handle_error', _handle_error)
+
+
+def render_metrics():
+    """
+    Render the metrics in the Prometheus text format.
+
+    Returns:
+        tuple: (body, content type)
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # Add up the samples written by every worker
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,38 @@
+"""Add map_location_lod table for simplified geometries
+
+Revision ID: 3b7e51c9a2d4
+Revises: d01258bcd434
+Create Date: 2026-10-18 09:12:40.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e51c9a2d4'
+down_revision = 'd01258bcd434'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # startup.txt runs db.create_all() before the migrations, which may have
+    # already created the table from the model
+    if sa.inspect(op.get_bind()).has_table('map_location_lod'):
+        return
+
+    op.create_table(
+        'map_location_lod',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('location_id', sa.Integer(), nullable=False),
+        sa.Column('tier', sa.Integer(), nullable=False),
+        sa.Column('geojson', sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(['location_id'], ['map_location.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('location_id', 'tier', name='uq_map_location_lod_location_tier')
+    )
+
+
+def downgrade():
+    op.drop_table('map_location_lod')
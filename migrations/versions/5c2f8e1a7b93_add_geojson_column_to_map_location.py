@@ -0,0 +1,34 @@
+"""Add geojson column to map_location for pre-encoded geometries
+
+Revision ID: 5c2f8e1a7b93
+Revises: 3b7e51c9a2d4
+Create Date: 2026-10-18 14:37:05.912734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2f8e1a7b93'
+down_revision = '3b7e51c9a2d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # startup.txt runs db.create_all() before the migrations, which creates
+    # the column if it created the whole table from the model
+    columns = [column['name'] for column in sa.inspect(op.get_bind()).get_columns('map_location')]
+    if 'geojson' in columns:
+        return
+
+    # Filled in by writes and `flask backfill-geojson`, reads fall back to
+    # the geography column while it is NULL
+    with op.batch_alter_table('map_location', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geojson', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('map_location', schema=None) as batch_op:
+        batch_op.drop_column('geojson')
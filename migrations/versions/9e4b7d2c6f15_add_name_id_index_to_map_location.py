@@ -0,0 +1,32 @@
+"""Add (name, id) index to map_location for keyset pagination
+
+Revision ID: 9e4b7d2c6f15
+Revises: 5c2f8e1a7b93
+Create Date: 2026-10-18 18:21:47.506318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4b7d2c6f15'
+down_revision = '5c2f8e1a7b93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # startup.txt runs db.create_all() before the migrations, which creates
+    # the index if it created the whole table from the model
+    indexes = [index['name'] for index in sa.inspect(op.get_bind()).get_indexes('map_location')]
+    if 'idx_map_location_name_id' in indexes:
+        return
+
+    # Pages in name order seek to the cursor and read rows in index order,
+    # instead of scanning and sorting the whole table for every page
+    op.create_index('idx_map_location_name_id', 'map_location', ['name', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_map_location_name_id', table_name='map_location')
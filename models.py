@@ -3,6 +3,8 @@ from datetime import datetime
 from geoalchemy2 import Geography
 from shapely.geometry import mapping, shape as shapely_shape, Point, LineString, Polygon
 from sqlalchemy import text
+import numpy as np
+import shapely
 import shapely.wkt
 from shapely import wkb
 
@@ -28,6 +30,10 @@ class LocationType(db.Model):
 class MapLocation(db.Model):
     """Model for map locations."""
     __tablename__ = 'map_location'
+    __table_args__ = (
+        # Supports keyset pagination in name order (see pagination.py)
+        db.Index('idx_map_location_name_id', 'name', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
@@ -36,6 +42,8 @@ class MapLocation(db.Model):
     type = db.Column(db.Integer, db.ForeignKey('location_type.id'), nullable=False)
     lat = db.Column(db.Float, nullable=True)
     lng = db.Column(db.Float, nullable=True)
+    # The geometry pre-encoded as GeoJSON text, deferred as only the raw SQL reads need it
+    geojson = db.deferred(db.Column(db.Text, nullable=True))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -49,69 +57,40 @@ class MapLocation(db.Model):
     
     def to_dict(self):
         """Convert the model to a dictionary."""
-        # Get location type information
-        location_type_info = None
-        if self.location_type:
-            location_type_info = {
-                'id': self.location_type.id,
-                'short_name': self.location_type.short_name,
-                'icon': self.location_type.icon,
-                'color': self.location_type.color
-            }
+        # Imported here to avoid a circular import, serializers imports from app
+        from serializers import fetch_locations_by_ids
         
-        # Get the geometry data using SQL Server's specific functions
-        try:
-            # Use SQL Server's specific functions to get the geometry as WKT
-            sql = text("SELECT geometry.STAsText() as wkt FROM map_location WHERE id = :id")
-            result = db.session.execute(sql, {"id": self.id}).fetchone()
-            
-            if result and result.wkt:
-                # Convert WKT to Shapely geometry
-                geom = shapely.wkt.loads(result.wkt)
-                
-                # Convert to GeoJSON
-                geojson = mapping(geom)
-                
-                return {
-                    'id': self.id,
-                    'name': self.name,
-                    'description': self.description,
-                    'geometry': geojson,
-                    'type': self.type,  # This is now the numeric ID
-                    'location_type': location_type_info,
-                    'lat': self.lat,
-                    'lng': self.lng,
-                    'created_at': self.created_at.isoformat() if self.created_at else None,
-                    'updated_at': self.updated_at.isoformat() if self.updated_at else None
-                }
-            else:
-                # No geometry found
-                return {
-                    'id': self.id,
-                    'name': self.name,
-                    'description': self.description,
-                    'type': self.type,
-                    'location_type': location_type_info,
-                    'lat': self.lat,
-                    'lng': self.lng,
-                    'error': "No geometry data found",
-                    'created_at': self.created_at.isoformat() if self.created_at else None,
-                    'updated_at': self.updated_at.isoformat() if self.updated_at else None
-                }
-        except Exception as e:
-            # Return a simplified dictionary without the geometry if there's an error
-            return {
-                'id': self.id,
-                'name': self.name,
-                'description': self.description,
-                'type': self.type,
-                'location_type': location_type_info,
-                'lat': self.lat,
-                'lng': self.lng,
-                'error': str(e),
-                'created_at': self.created_at.isoformat() if self.created_at else None,
-                'updated_at': self.updated_at.isoformat() if self.updated_at else None
-            }
+        # Use the shared set-based serializer so the geometry is fetched in the
+        # same query as the location attributes
+        locations = fetch_locations_by_ids([self.id])
+        if locations:
+            return locations[0]
+        
+        # The location has no matching row (e.g. an invalid type), return what we have
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'type': self.type,
+            'location_type': None,
+            'lat': self.lat,
+            'lng': self.lng,
+            'error': "No geometry data found",
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class MapLocationLod(db.Model):
+    """Model for the simplified geometries of a map location, one row per LOD tier."""
+    __tablename__ = 'map_location_lod'
+    __table_args__ = (
+        db.UniqueConstraint('location_id', 'tier', name='uq_map_location_lod_location_tier'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    location_id = db.Column(db.Integer, db.ForeignKey('map_location.id', ondelete='CASCADE'), nullable=False)
+    tier = db.Column(db.Integer, nullable=False)
+    geojson = db.Column(db.Text, nullable=False)  # Simplified geometry as GeoJSON text
 
 def calculate_center_coordinates(geometry):
     """
@@ -156,26 +135,46 @@ def calculate_center_coordinates(geometry):
             # Unknown type
             raise ValueError(f"Unknown geometry type: {type(geometry)}")
         
-        if geom.geom_type == 'Point':
-            # For points, use the coordinates directly
-            return (geom.y, geom.x)
-        
-        elif geom.geom_type == 'LineString':
-            # For linestrings, use the midpoint along the line
-            if len(geom.coords) >= 2:
-                # Calculate the midpoint of the line by interpolating at 0.5 distance
-                midpoint = geom.interpolate(0.5, normalized=True)
-                return (midpoint.y, midpoint.x)
-            else:
-                # Fallback to centroid for invalid linestrings
-                centroid = geom.centroid
-                return (centroid.y, centroid.x)
-        
-        else:
-            # For polygons and other geometries, use the centroid
-            centroid = geom.centroid
-            return (centroid.y, centroid.x)
+        # Use the same rules as the batch calculation
+        return calculate_center_coordinates_batch([geom])[0]
             
     except Exception as e:
         print(f"Error calculating center coordinates: {str(e)}")
-        return (None, None)
\ No newline at end of file
+        return (None, None)
+
+def calculate_center_coordinates_batch(geometries):
+    """
+    Calculate the center coordinates for many geometries at once.
+    
+    Points are used as they are, linestrings use the midpoint along the line
+    and everything else uses the centroid. The rules are applied with
+    shapely's vectorised functions instead of a Python loop.
+    
+    Args:
+        geometries: Sequence of Shapely geometries
+        
+    Returns:
+        list: (latitude, longitude) tuples, (None, None) for empty or missing geometries
+    """
+    geoms = np.asarray(geometries, dtype=object)
+    if len(geoms) == 0:
+        return []
+    
+    # Centroids for everything first, a point's centroid is the point itself
+    centers = shapely.centroid(geoms)
+    
+    # Replace the centroids of linestrings with the midpoint along the line
+    is_line = (shapely.get_type_id(geoms) == shapely.GeometryType.LINESTRING) & (shapely.get_num_coordinates(geoms) >= 2)
+    if is_line.any():
+        centers[is_line] = shapely.line_interpolate_point(geoms[is_line], 0.5, normalized=True)
+    
+    # get_x and get_y raise on empty points, so only read the centres that exist
+    has_center = ~(shapely.is_empty(centers) | shapely.is_missing(centers))
+    lats = np.full(len(geoms), np.nan)
+    lngs = np.full(len(geoms), np.nan)
+    lats[has_center] = shapely.get_y(centers[has_center])
+    lngs[has_center] = shapely.get_x(centers[has_center])
+    return [
+        (None, None) if np.isnan(lat) else (float(lat), float(lng))
+        for lat, lng in zip(lats, lngs)
+    ]
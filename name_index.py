@@ -0,0 +1,147 @@
+"""
+In-memory fuzzy index of location names for "did you mean" suggestions.
+
+Names are normalised (lower case, macrons removed) and indexed by trigram.
+A suggestion lookup only scores the names sharing the most trigrams with the
+query, instead of running difflib over every location name.
+"""
+from app import db
+from sqlalchemy import text
+from collections import Counter, defaultdict
+import difflib
+import heapq
+import threading
+
+from cache import locations_version
+from text_utils import normalize_text
+
+# Number of candidates, by shared trigrams, that get a full similarity score
+MAX_CANDIDATES = 50
+
+
+def _trigrams(normalized):
+    """Get the set of trigrams of a normalised name, padded to weight word starts."""
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Trigram index of location names, updated incrementally on writes."""
+
+    def __init__(self):
+        self.version = None
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        # location ID -> normalised name
+        self._ids = {}
+        # normalised name -> (original name, set of location IDs)
+        self._names = {}
+        # trigram -> set of normalised names
+        self._postings = defaultdict(set)
+
+    def load(self, rows, version):
+        """Rebuild the index from (id, name) rows for a dataset version."""
+        with self._lock:
+            self._clear()
+            for location_id, name in rows:
+                self._add(location_id, name)
+            self.version = version
+
+    def add(self, location_id, name):
+        """Add or rename a location."""
+        with self._lock:
+            self._remove(location_id)
+            self._add(location_id, name)
+
+    def remove(self, location_id):
+        """Remove a location."""
+        with self._lock:
+            self._remove(location_id)
+
+    def advance_version(self, previous_version, version):
+        """Mark the index current for a new version if it was current for the previous one."""
+        with self._lock:
+            if self.version == previous_version:
+                self.version = version
+
+    def _add(self, location_id, name):
+        if not name:
+            return
+
+        normalized = normalize_text(name.lower())
+        self._ids[location_id] = normalized
+
+        if normalized in self._names:
+            self._names[normalized][1].add(location_id)
+        else:
+            self._names[normalized] = (name, {location_id})
+            for trigram in _trigrams(normalized):
+                self._postings[trigram].add(normalized)
+
+    def _remove(self, location_id):
+        normalized = self._ids.pop(location_id, None)
+        if normalized is None:
+            return
+
+        original, location_ids = self._names[normalized]
+        location_ids.discard(location_id)
+        if location_ids:
+            return
+
+        del self._names[normalized]
+        for trigram in _trigrams(normalized):
+            names = self._postings.get(trigram)
+            if names is not None:
+                names.discard(normalized)
+                if not names:
+                    del self._postings[trigram]
+
+    def suggest(self, query, n=3, cutoff=0.5):
+        """
+        Get the location names closest to a query.
+
+        Scores use the same similarity ratio as difflib.get_close_matches.
+
+        Args:
+            query: The search text
+            n: Maximum number of suggestions
+            cutoff: Minimum similarity ratio between 0 and 1
+
+        Returns:
+            list: Original location names, best match first
+        """
+        normalized_query = normalize_text(query.lower())
+
+        with self._lock:
+            # Count the trigrams each name shares with the query
+            shared = Counter()
+            for trigram in _trigrams(normalized_query):
+                shared.update(self._postings.get(trigram, ()))
+
+            matcher = difflib.SequenceMatcher()
+            matcher.set_seq2(normalized_query)
+
+            scored = []
+            for candidate, _ in shared.most_common(MAX_CANDIDATES):
+                matcher.set_seq1(candidate)
+                if (matcher.real_quick_ratio() >= cutoff and
+                        matcher.quick_ratio() >= cutoff and
+                        matcher.ratio() >= cutoff):
+                    scored.append((matcher.ratio(), candidate))
+
+            best = heapq.nlargest(n, scored)
+            return [self._names[candidate][0] for score, candidate in best]
+
+
+name_index = NameIndex()
+
+
+def current_name_index():
+    """Get the name index, rebuilding it if the locations changed in another worker."""
+    version = locations_version.get()
+    if name_index.version != version:
+        rows = db.session.execute(text("SELECT id, name FROM map_location")).fetchall()
+        name_index.load([(row.id, row.name) for row in rows], version)
+    return name_index
@@ -0,0 +1,166 @@
+"""
+Keyset (cursor) pagination of location lists.
+
+Pages are read in a fixed order, by name then ID or by ID alone, and each
+page continues after the sort key of the last row of the previous page,
+which is handed to the client as an opaque cursor. Unlike OFFSET, a page
+costs the same however deep it is, and rows added or removed meanwhile
+don't shift the pages after them. One row more than the page size is
+fetched to tell whether there is a next page, without counting rows.
+"""
+import base64
+import json
+from collections import namedtuple
+
+# Page size when only a cursor is given, and the largest page allowed
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Sort orders: (columns of the sort key, ORDER BY, condition selecting the rows after a cursor).
+# SQL Server has no row value comparison, so the name order spells out the tie break on ID.
+# The name order is served by the idx_map_location_name_id index, the ID order by the primary key.
+SORT_ORDERS = {
+    'name': (
+        ('name', 'id'),
+        "ml.name, ml.id",
+        "(ml.name > :cursor_name OR (ml.name = :cursor_name AND ml.id > :cursor_id))"
+    ),
+    'id': (
+        ('id',),
+        "ml.id",
+        "ml.id > :cursor_id"
+    ),
+}
+
+# Types of the sort key columns, to validate cursors
+COLUMN_TYPES = {'name': str, 'id': int}
+
+# A requested page: its size, sort order and the sort key to continue after (None for the first page)
+Page = namedtuple('Page', ['limit', 'sort', 'after'])
+
+
+def encode_cursor(sort, values):
+    """Encode a sort order and the sort key of a row as an opaque, URL safe cursor."""
+    data = json.dumps([sort] + list(values), separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor.
+
+    Returns:
+        tuple: (sort order, list of sort key values)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(data, list) or not data or data[0] not in SORT_ORDERS:
+        raise ValueError("Invalid cursor")
+
+    sort, values = data[0], data[1:]
+    columns = SORT_ORDERS[sort][0]
+    if len(values) != len(columns):
+        raise ValueError("Invalid cursor")
+
+    for column, value in zip(columns, values):
+        if not isinstance(value, COLUMN_TYPES[column]) or isinstance(value, bool):
+            raise ValueError("Invalid cursor")
+
+    return sort, values
+
+
+def parse_page(args, default_sort='name', default_limit=None):
+    """
+    Parse the limit, cursor and sort query parameters.
+
+    Args:
+        args: The request's query parameters
+        default_sort: Sort order used when neither sort nor cursor is given
+        default_limit: Page size when no limit is given. If set, a page is
+            always returned, e.g. for pages that are never unpaginated.
+
+    Returns:
+        Page: The requested page, or None if neither limit nor cursor was
+            given and there is no default_limit
+
+    Raises:
+        ValueError: If a parameter is invalid
+    """
+    limit_value = args.get('limit')
+    cursor = args.get('cursor')
+    sort = args.get('sort')
+
+    if not limit_value and not cursor and default_limit is None:
+        return None
+
+    limit = default_limit or DEFAULT_PAGE_SIZE
+    if limit_value:
+        try:
+            limit = int(limit_value)
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if not (1 <= limit <= MAX_PAGE_SIZE):
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    after = None
+    if cursor:
+        cursor_sort, after = decode_cursor(cursor)
+        if sort and sort != cursor_sort:
+            raise ValueError("cursor belongs to a different sort order")
+        sort = cursor_sort
+
+    sort = sort or default_sort
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"sort must be one of: {', '.join(SORT_ORDERS)}")
+
+    return Page(limit, sort, after)
+
+
+def page_query(page, where=None, params=None):
+    """
+    Add a page's conditions to a location query.
+
+    Returns:
+        tuple: (where, params, order_by, row limit), the row limit being one
+            more than the page size to detect a next page
+    """
+    columns, order_by, condition = SORT_ORDERS[page.sort]
+    where = list(where or [])
+    params = dict(params or {})
+
+    if page.after is not None:
+        where.append(condition)
+        params.update({f"cursor_{column}": value for column, value in zip(columns, page.after)})
+
+    return where, params, order_by, page.limit + 1
+
+
+def page_fields(page):
+    """Get the fields a page's locations need for the next page's cursor."""
+    return SORT_ORDERS[page.sort][0]
+
+
+def split_page(page, locations):
+    """
+    Trim the extra row fetched for a page.
+
+    Args:
+        page: The page
+        locations: Location dictionaries fetched with the row limit from page_query
+
+    Returns:
+        tuple: (the page's locations, cursor of the next page or None if it is the last)
+    """
+    if len(locations) <= page.limit:
+        return locations, None
+
+    locations = locations[:page.limit]
+    last = locations[-1]
+    return locations, encode_cursor(page.sort, [last[column] for column in SORT_ORDERS[page.sort][0]])
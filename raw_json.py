@@ -0,0 +1,68 @@
+"""
+Splicing pre-encoded JSON into responses.
+
+Geometries are stored as GeoJSON text next to each location. Wrapping that
+text in RawJSON lets it be written into a response as it is, instead of
+being parsed into Python objects only to be encoded again.
+"""
+from flask.json.provider import DefaultJSONProvider
+import json
+import re
+import uuid
+
+
+class RawJSON:
+    """A piece of JSON text to be written into the output unchanged."""
+
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __repr__(self):
+        return f"RawJSON({self.text!r})"
+
+
+def dumps(obj, default=None, **kwargs):
+    """
+    Like json.dumps, but writes RawJSON values as their text.
+
+    Each RawJSON is first encoded as a placeholder string holding a random
+    marker, and the placeholders are then replaced with the raw text.
+    """
+    marker = uuid.uuid4().hex
+    raw_texts = []
+
+    def encode_default(o):
+        if isinstance(o, RawJSON):
+            raw_texts.append(o.text)
+            return f"\x00{marker}:{len(raw_texts) - 1}\x00"
+        if default is not None:
+            return default(o)
+        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+    output = json.dumps(obj, default=encode_default, **kwargs)
+
+    if raw_texts:
+        # NUL is always escaped by the encoder, so the markers can't clash with real strings
+        placeholder = re.compile(r'"\\u0000' + marker + r':(\d+)\\u0000"')
+        output = placeholder.sub(lambda match: raw_texts[int(match.group(1))], output)
+
+    return output
+
+
+def to_python(value):
+    """Parse a RawJSON value, leaving anything else as it is."""
+    if isinstance(value, RawJSON):
+        return json.loads(value.text)
+    return value
+
+
+class RawJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that understands RawJSON, used by jsonify."""
+
+    def dumps(self, obj, **kwargs):
+        kwargs.setdefault('default', self.default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return dumps(obj, **kwargs)
@@ -1,7 +1,22 @@
-from flask import render_template, request, jsonify, redirect, url_for
-from app import app, db
+from flask import render_template, request, jsonify, redirect, url_for, Response, stream_with_context
+from app import app, db, spatial
 import json
 from models import MapLocation, LocationType, calculate_center_coordinates
+from serializers import fetch_locations, fetch_locations_by_ids, fetch_nearby_locations, iter_locations, parse_projection, INTERSECTS_CONDITION, SPATIAL_INDEX_HINT
+from streaming import stream_envelope, stream_feature_collection, stream_ndjson, location_to_feature
+from export import FILE_FORMATS, write_export_file, stream_export_file
+from viewport import parse_bbox, parse_zoom, parse_point, bbox_to_wkt
+from lod import store_lod_geometries, delete_lod_geometries
+from tiles import tile_cache, render_tile, is_valid_tile, location_bounds, invalidate_tiles
+from cache import cached_snapshot, locations_version
+from name_index import name_index
+from cluster_index import current_cluster_index, cluster_index
+from search import run_search
+from pagination import parse_page, page_query, page_fields, split_page
+from location_types import current_location_types, invalidate_location_types
+from geojson_encoder import geometry_to_geojson_text
+from metrics import record_cache, render_metrics
+from bulk_import import BulkImportError, read_features, prepare_rows, insert_locations, import_bounds
 from geoalchemy2.functions import ST_GeomFromGeoJSON
 from geoalchemy2.shape import from_shape
 from shapely.geometry import shape
@@ -11,17 +26,39 @@ import traceback
 from sqlalchemy import text
 import shapely.wkt
 from shapely.geometry import mapping
-import requests
 import time
-import difflib
-import unicodedata
+import os
 
-# Function to normalize text by removing macrons
-def normalize_text(text):
-    # Normalize to decomposed form (separates base characters from diacritical marks)
-    decomposed = unicodedata.normalize('NFD', text)
-    # Remove diacritical marks and return
-    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+# Default and maximum number of locations returned by /api/locations/nearby
+DEFAULT_NEARBY = 10
+MAX_NEARBY = 100
+
+# Locations per page of the admin locations table
+ADMIN_PAGE_SIZE = 100
+
+# Function to invalidate caches once location changes have been committed
+def locations_changed(*bounds_list):
+    # Invalidate the cached API responses in every worker. The version is
+    # bumped before the tiles are dropped, so a tile rendered meanwhile is
+    # either not written or removed again (see get_tile).
+    previous_version = locations_version.get()
+    version, unchanged = locations_version.bump_from(previous_version)
+    # The name and cluster indexes were updated incrementally, so they stay
+    # current here, unless another worker changed the locations meanwhile:
+    # then they keep the old version and rebuild on their next use
+    if unchanged:
+        name_index.advance_version(previous_version, version)
+        cluster_index.advance_version(previous_version, version)
+    # Drop the cached tiles covering the changed geometries
+    invalidate_tiles(*bounds_list)
+
+# Function to invalidate caches once location type changes have been committed
+def location_types_changed():
+    # Reload the type registry in every worker
+    invalidate_location_types()
+    # Type colours and icons are baked into every tile
+    locations_version.bump()
+    tile_cache.clear()
 
 @app.route('/')
 def index():
@@ -45,21 +82,31 @@ def admin_map():
 
 @app.route('/admin/locations')
 def admin_locations_page():
-    """Render the admin locations page."""
+    """Render a page of the admin locations table, in name (or sort=id) order."""
     try:
-        # Build SQL query to get all locations with their types
-        sql_query = """
-            SELECT 
+        try:
+            page = parse_page(request.args, default_limit=ADMIN_PAGE_SIZE)
+        except ValueError as e:
+            return render_template('admin_locations.html', active_page='locations-admin',
+                                  locations=[], error=str(e))
+        
+        # Continue after the cursor, reading one extra row to know if there is a next page
+        where, params, order_by, row_limit = page_query(page)
+        params['row_limit'] = row_limit
+        
+        # Build SQL query to get a page of locations, their types come from the registry
+        sql_query = f"""
+            SELECT {spatial.top(':row_limit')}
                 ml.id, ml.name, ml.description, ml.type, ml.lat, ml.lng, 
-                ml.created_at, ml.updated_at,
-                lt.id as lt_id, lt.short_name, lt.icon, lt.color
+                ml.created_at, ml.updated_at
             FROM map_location ml
-            JOIN location_type lt ON ml.type = lt.id
-            ORDER BY ml.name
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY {order_by} {spatial.limit(':row_limit')}
         """
         
         # Execute the query
-        results = db.session.execute(text(sql_query)).fetchall()
+        location_types = current_location_types()
+        results = db.session.execute(text(sql_query), params).fetchall()
         
         # Process results
         locations = []
@@ -70,18 +117,17 @@ def admin_locations_page():
                 'description': row.description,
                 'lat': row.lat,
                 'lng': row.lng,
-                'location_type': {
-                    'id': row.lt_id,
-                    'short_name': row.short_name,
-                    'icon': row.icon,
-                    'color': row.color
-                },
+                'location_type': location_types.embed(row.type),
                 'created_at': row.created_at.isoformat() if row.created_at else None,
                 'updated_at': row.updated_at.isoformat() if row.updated_at else None
             }
             locations.append(location)
         
-        return render_template('admin_locations.html', active_page='locations-admin', locations=locations)
+        locations, next_cursor = split_page(page, locations)
+        
+        return render_template('admin_locations.html', active_page='locations-admin', locations=locations,
+                              next_cursor=next_cursor, page_size=page.limit, sort=page.sort,
+                              first_page=page.after is None)
         
     except Exception as e:
         app.logger.error(f"Error fetching locations for admin page: {str(e)}")
@@ -96,197 +142,9 @@ def search_locations():
     if not query or len(query) < 2:
         return jsonify({"results": [], "suggestions": []})
     
-    locations = []
-    suggestions = []
-    
     try:
-        # Get a list of all location names for suggestions if needed
-        all_locations_sql = text("""
-            SELECT name FROM map_location
-        """)
-        all_location_names = [row[0] for row in db.session.execute(all_locations_sql).fetchall()]
-        
-        # Search for dog parks in our database
-        sql = text("""
-            SELECT TOP 10
-                ml.id, ml.name, ml.description, ml.type, 
-                ml.lat, ml.lng,
-                lt.short_name as type_name, lt.icon, lt.color
-            FROM map_location ml
-            LEFT JOIN location_type lt ON ml.type = lt.id
-            WHERE LOWER(ml.name) LIKE LOWER(:query)
-            ORDER BY ml.name
-        """)
-        
-        results = db.session.execute(sql, {"query": f"%{query}%"}).fetchall()
-        
-        for row in results:
-            # Create location_type object with icon and color
-            location_type_info = None
-            if row.type:
-                location_type_info = {
-                    'id': row.type,
-                    'name': row.type_name,
-                    'icon': row.icon,
-                    'color': row.color
-                }
-                
-            locations.append({
-                'id': row.id,
-                'name': row.name,
-                'description': row.description,
-                'type': row.type,
-                'location_type': location_type_info,
-                'lat': row.lat,
-                'lng': row.lng,
-                'source': 'database'
-            })
-        
-        # If we have fewer than 10 results, search Photon API for locations in New Zealand
-        if len(locations) < 10:
-            # Use Photon API which is better for partial matches
-            photon_params = {
-                'q': query,
-                'limit': 10 - len(locations),
-                'lang': 'en',
-                'osm_tag': 'place',  # Focus on places
-                'bbox': '165.5,-47.5,179.0,-34.0'  # New Zealand bounding box
-            }
-            
-            photon_response = requests.get('https://photon.komoot.io/api/', params=photon_params)
-            
-            if photon_response.status_code == 200:
-                photon_data = photon_response.json()
-                
-                if 'features' in photon_data:
-                    for feature in photon_data['features']:
-                        if 'properties' in feature and 'geometry' in feature:
-                            properties = feature['properties']
-                            geometry = feature['geometry']
-                            
-                            # Skip if not in New Zealand
-                            if properties.get('country') != 'New Zealand':
-                                continue
-                            
-                            # Skip neighborhoods
-                            if properties.get('osm_key') == 'place' and properties.get('osm_value') == 'neighbourhood':
-                                continue
-                            
-                            # Get the name and type
-                            name = properties.get('name')
-                            if not name:
-                                continue
-                                
-                            # Check if query is actually part of the name (case insensitive)
-                            # Normalize both the query and name to handle macrons
-                            normalized_query = normalize_text(query.lower())
-                            normalized_name = normalize_text(name.lower())
-                            
-                            if normalized_query not in normalized_name:
-                                continue
-                            
-                            # Determine the place type
-                            place_type = 'Location'
-                            major_nz_cities = ['Wellington', 'Auckland', 'Christchurch', 'Hamilton', 'Tauranga', 'Dunedin']
-                            if name in major_nz_cities:
-                                place_type = 'City'
-                            elif properties.get('city'):
-                                place_type = 'City'
-                            elif properties.get('town'):
-                                place_type = 'Town'
-                            elif properties.get('suburb'):
-                                place_type = 'Suburb'
-                            elif properties.get('village'):
-                                place_type = 'Village'
-                            
-                            # Build a description from available properties
-                            description_parts = []
-                            for part in ['city', 'state', 'suburb', 'district']:
-                                if part in properties and properties[part] != name:
-                                    description_parts.append(properties[part])
-                            
-                            description = ', '.join(description_parts) if description_parts else place_type
-                            
-                            # Get coordinates
-                            if geometry['type'] == 'Point' and len(geometry['coordinates']) >= 2:
-                                lng, lat = geometry['coordinates']
-                                
-                                # Create a default location_type for external locations
-                                location_type_info = {
-                                    'id': None,
-                                    'name': place_type,
-                                    'icon': 'place',  # Material Icons map marker
-                                    'color': '#666666'  # Default gray color
-                                }
-                                
-                                locations.append({
-                                    'id': None,
-                                    'name': name,
-                                    'description': description,
-                                    'type': place_type,
-                                    'location_type': location_type_info,
-                                    'lat': lat,
-                                    'lng': lng,
-                                    'source': 'photon'
-                                })
-        
-        # Generate suggestions based on all location names
-        # Create a mapping of normalized names to original names for macron handling
-        normalized_to_original = {}
-        normalized_location_names = []
-        
-        for name in all_location_names:
-            normalized_name = normalize_text(name.lower())
-            normalized_location_names.append(normalized_name)
-            normalized_to_original[normalized_name] = name
-        
-        # Get close matches using normalized names
-        normalized_query = normalize_text(query.lower())
-        normalized_suggestions = difflib.get_close_matches(normalized_query, normalized_location_names, n=3, cutoff=0.5)
-        
-        # Convert suggestions back to original names with proper case and macrons
-        proper_case_suggestions = [normalized_to_original[suggestion] for suggestion in normalized_suggestions if suggestion in normalized_to_original]
-        
-        # If we have no results but need suggestions, use Photon API with relaxed parameters
-        if len(locations) == 0 and len(proper_case_suggestions) < 3:
-            # Use Photon API with more relaxed parameters to find similar locations
-            photon_suggestion_params = {
-                'q': query,
-                'limit': 5,
-                'lang': 'en',
-                'osm_tag': 'place',
-                'bbox': '165.5,-47.5,179.0,-34.0'  # New Zealand bounding box
-            }
-            
-            try:
-                photon_suggestion_response = requests.get('https://photon.komoot.io/api/', params=photon_suggestion_params)
-                
-                if photon_suggestion_response.status_code == 200:
-                    photon_suggestion_data = photon_suggestion_response.json()
-                    
-                    if 'features' in photon_suggestion_data:
-                        for feature in photon_suggestion_data['features']:
-                            if 'properties' in feature:
-                                properties = feature['properties']
-                                
-                                # Skip if not in New Zealand
-                                if properties.get('country') != 'New Zealand':
-                                    continue
-                                
-                                # Get the name
-                                name = properties.get('name')
-                                if not name or name.lower() == query.lower():
-                                    continue
-                                
-                                # Add to suggestions if not already there
-                                if name not in proper_case_suggestions:
-                                    proper_case_suggestions.append(name)
-                                    
-                                # Stop if we have enough suggestions
-                                if len(proper_case_suggestions) >= 3:
-                                    break
-            except Exception as e:
-                app.logger.error(f"Error getting suggestions from Photon API: {str(e)}")
+        # Query the database and the geocoder concurrently
+        locations, proper_case_suggestions = run_search(query)
         
         # If we have no results but have suggestions, prioritize showing suggestions
         if len(locations) == 0 and len(proper_case_suggestions) > 0:
@@ -299,78 +157,89 @@ def search_locations():
         return jsonify({"success": False, "error": str(e)})
 
 @app.route('/api/locations', methods=['GET'])
+@cached_snapshot
 def get_locations():
-    """Get all map locations."""
+    """
+    Get all map locations, optionally limited to a bbox viewport and simplified for a zoom level.
+    
+    Passing limit and/or cursor returns one page, in name (or sort=id) order,
+    with the cursor of the next page as next_cursor. fields=id,name,... and
+    geometry=none|centroid|simplified|full only fetch and return what is asked for.
+    """
     try:
         # Get query parameters
         type_filter = request.args.get('type')
+        output_format = request.args.get('format', 'json')
+        stream = request.args.get('stream', '').lower() in ('1', 'true', 'yes')
         
-        # Build SQL query
-        sql_query = """
-            SELECT 
-                ml.id, ml.name, ml.description, ml.type, ml.lat, ml.lng, 
-                ml.created_at, ml.updated_at,
-                lt.id as lt_id, lt.short_name, lt.icon, lt.color
-            FROM map_location ml
-            JOIN location_type lt ON ml.type = lt.id
-        """
+        try:
+            bbox = parse_bbox(request.args.get('bbox'))
+            zoom = parse_zoom(request.args.get('zoom'))
+            page = parse_page(request.args)
+            # Only the requested fields are selected and serialized, a page also keeps its sort key
+            projection = parse_projection(
+                request.args.get('fields'),
+                request.args.get('geometry'),
+                zoom,
+                required=page_fields(page) if page else ('id',)
+            )
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        if output_format not in ('json', 'geojson'):
+            return jsonify({"success": False, "error": f"Invalid format: {output_format}"}), 400
         
+        where = []
         params = {}
+        index_hint = None
         
         # Apply filters if provided
         if type_filter:
-            try:
-                # If it's a numeric ID
-                type_id = int(type_filter)
-                sql_query += " WHERE ml.type = :type_id"
-                params['type_id'] = type_id
-            except ValueError:
-                # If it's a string short_name
-                sql_query += " WHERE lt.short_name = :type_name"
-                params['type_name'] = type_filter
-        
-        # Execute the query
-        results = db.session.execute(text(sql_query), params).fetchall()
-        
-        # Process results
-        locations_dict = []
-        for row in results:
-            # Get the location ID to fetch geometry
-            location_id = row.id
+            # Resolve an ID or short_name through the type registry,
+            # an unknown type matches nothing
+            location_type = current_location_types().resolve(type_filter)
+            where.append("ml.type = :type_id")
+            params['type_id'] = location_type.id if location_type else None
+        
+        # Only return locations inside the viewport, using the spatial index
+        if bbox:
+            where.append(INTERSECTS_CONDITION)
+            params['bbox_wkt'] = bbox_to_wkt(bbox)
+            index_hint = SPATIAL_INDEX_HINT
+        
+        # Return a single page if limit or cursor was given, continuing after the cursor
+        if page:
+            where, params, order_by, row_limit = page_query(page, where, params)
+            locations_dict, next_cursor = split_page(page, fetch_locations(
+                where, params, order_by=order_by, index_hint=index_hint, zoom=zoom, limit=row_limit,
+                projection=projection
+            ))
             
-            # Get geometry data using SQL Server's specific functions
-            geo_sql = text("SELECT geometry.STAsText() as wkt FROM map_location WHERE id = :id")
-            geo_result = db.session.execute(geo_sql, {"id": location_id}).fetchone()
-            
-            # Process geometry if available
-            geometry_json = None
-            if geo_result and geo_result.wkt:
-                # Convert WKT to Shapely geometry
-                geom = shapely.wkt.loads(geo_result.wkt)
-                
-                # Convert to GeoJSON
-                geometry_json = mapping(geom)
-            
-            # Create location dictionary
-            location = {
-                'id': row.id,
-                'name': row.name,
-                'description': row.description,
-                'type': row.type,
-                'lat': row.lat,
-                'lng': row.lng,
-                'geometry': geometry_json,
-                'location_type': {
-                    'id': row.lt_id,
-                    'short_name': row.short_name,
-                    'icon': row.icon,
-                    'color': row.color
-                },
-                'created_at': row.created_at.isoformat() if row.created_at else None,
-                'updated_at': row.updated_at.isoformat() if row.updated_at else None
-            }
+            if output_format == 'geojson':
+                feature_collection = {
+                    'type': 'FeatureCollection',
+                    'features': [location_to_feature(location) for location in locations_dict],
+                    'next_cursor': next_cursor
+                }
+                return Response(app.json.dumps(feature_collection), mimetype='application/geo+json')
             
-            locations_dict.append(location)
+            return jsonify({"success": True, "data": locations_dict, "next_cursor": next_cursor})
+        
+        # GeoJSON is always streamed, as a FeatureCollection
+        if output_format == 'geojson':
+            locations = iter_locations(where, params, index_hint=index_hint, zoom=zoom, projection=projection)
+            return Response(stream_with_context(stream_feature_collection(locations)),
+                            mimetype='application/geo+json')
+        
+        # Stream the standard envelope straight from the cursor if requested
+        if stream:
+            locations = iter_locations(where, params, index_hint=index_hint, zoom=zoom, projection=projection)
+            return Response(stream_with_context(stream_envelope(locations)),
+                            mimetype='application/json')
+        
+        # Fetch attributes, type metadata and geometry in a single query,
+        # with geometry simplified for the zoom level if one was given
+        locations_dict = fetch_locations(where, params, index_hint=index_hint, zoom=zoom, projection=projection)
         
         return jsonify({"success": True, "data": locations_dict})
         
@@ -379,6 +248,85 @@ def get_locations():
         app.logger.error(traceback.format_exc())
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/clusters', methods=['GET'])
+@cached_snapshot
+def get_clusters():
+    """Get the locations in a bbox viewport clustered for a zoom level, one marker per cluster."""
+    try:
+        type_filter = request.args.get('type')
+        
+        try:
+            bbox = parse_bbox(request.args.get('bbox'))
+            zoom = parse_zoom(request.args.get('zoom'))
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        if zoom is None:
+            return jsonify({"success": False, "error": "zoom is required"}), 400
+        
+        location_types = current_location_types()
+        
+        type_id = None
+        if type_filter:
+            # An unknown type matches nothing
+            location_type = location_types.resolve(type_filter)
+            if not location_type:
+                return jsonify({"success": True, "data": []})
+            type_id = location_type.id
+        
+        # Cluster the centre points held in memory, without touching the database
+        clusters = current_cluster_index().clusters(zoom, bbox, type_id)
+        for cluster in clusters:
+            cluster['location_type'] = location_types.embed(cluster['type'])
+        
+        return jsonify({"success": True, "data": clusters})
+        
+    except Exception as e:
+        app.logger.error(f"Error fetching clusters: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/locations/nearby', methods=['GET'])
+def get_nearby_locations():
+    """Get the locations nearest to a point, e.g. the user's position, nearest first."""
+    try:
+        type_filter = request.args.get('type')
+        
+        try:
+            lat, lng = parse_point(request.args.get('lat'), request.args.get('lng'))
+            zoom = parse_zoom(request.args.get('zoom'))
+            k = int(request.args.get('k', DEFAULT_NEARBY))
+            radius_m = request.args.get('radius_m')
+            radius_m = float(radius_m) if radius_m else None
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        
+        if not (1 <= k <= MAX_NEARBY):
+            return jsonify({"success": False, "error": f"k must be between 1 and {MAX_NEARBY}"}), 400
+        
+        if radius_m is not None and radius_m <= 0:
+            return jsonify({"success": False, "error": "radius_m must be greater than 0"}), 400
+        
+        where = []
+        params = {}
+        
+        # Filter by type before picking the nearest, so k results of the type are returned
+        if type_filter:
+            # An unknown type matches nothing
+            location_type = current_location_types().resolve(type_filter)
+            where.append("type = :type_id")
+            params['type_id'] = location_type.id if location_type else None
+        
+        # Nearest first, with the distance to the edge of each geometry in metres
+        locations_dict = fetch_nearby_locations(lat, lng, k, radius_m, where, params, zoom=zoom)
+        
+        return jsonify({"success": True, "data": locations_dict})
+        
+    except Exception as e:
+        app.logger.error(f"Error fetching nearby locations: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/locations', methods=['POST'])
 def create_location():
     """Create a new map location."""
@@ -395,15 +343,8 @@ def create_location():
         # Get the location type
         location_type_input = data['location_type']
         
-        # Check if location_type is a numeric ID or a string name
-        location_type = None
-        if isinstance(location_type_input, int) or location_type_input.isdigit():
-            # If it's a numeric ID, get the location type by ID
-            type_id = int(location_type_input)
-            location_type = LocationType.query.get(type_id)
-        else:
-            # If it's a string, get the location type by short_name
-            location_type = LocationType.query.filter_by(short_name=location_type_input).first()
+        # Look up the location type by numeric ID or short_name in the type registry
+        location_type = current_location_types().resolve(location_type_input)
         
         if not location_type:
             return jsonify({"success": False, "error": f"Invalid location type: {location_type_input}"}), 400
@@ -437,33 +378,42 @@ def create_location():
                 
             wkt = geom_shape.wkt
             
-            # Create a SQL query to insert the geography data
-            sql = text("""
-                INSERT INTO map_location (name, description, geometry, type, lat, lng, created_at, updated_at)
-                VALUES (:name, :description, geography::STGeomFromText(:wkt, 4326), :type, :lat, :lng, GETUTCDATE(), GETUTCDATE());
-            """)
+            # Create a SQL query to insert the geography data, and the same
+            # geometry pre-encoded as GeoJSON for reads, returning the new ID
+            sql = text(spatial.insert_returning_id(
+                "INSERT INTO map_location (name, description, geometry, geojson, type, lat, lng, created_at, updated_at)",
+                f"VALUES (:name, :description, {spatial.geometry_from_wkt(':wkt')}, :geojson, :type, :lat, :lng, {spatial.now}, {spatial.now})"
+            ))
             
             # Execute the query with parameters
-            db.session.execute(
+            result = db.session.execute(
                 sql, 
                 {
                     'name': data['name'],
                     'description': data.get('description', ''),
                     'wkt': wkt,
+                    'geojson': geometry_to_geojson_text(geom_shape),
                     'type': location_type.id,
                     'lat': lat,
                     'lng': lng
                 }
             )
             
-            # Now get the ID of the newly created location
-            id_sql = text("SELECT IDENT_CURRENT('map_location') AS id")
-            result = db.session.execute(id_sql)
+            # The ID of the newly created location, from this statement rather
+            # than the table's last identity, which another insert may have taken
             location_id = int(result.scalar())
             
+            # Store the simplified geometries for each zoom tier
+            store_lod_geometries(location_id, geom_shape)
+            
             # Commit the transaction
             db.session.commit()
             
+            # Update the caches and indexes for the new location
+            name_index.add(location_id, data['name'])
+            cluster_index.add(location_id, lat, lng, location_type.id)
+            locations_changed(geom_shape.bounds)
+            
             # Return the new location
             return jsonify({"success": True, "data": {"id": location_id}}), 201
             
@@ -479,57 +429,88 @@ def create_location():
         app.logger.error(traceback.format_exc())
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/api/locations/export', methods=['GET'])
+def export_locations():
+    """Export every map location as NDJSON, FlatGeobuf or GeoPackage."""
+    output_format = request.args.get('format', 'ndjson')
+    
+    if output_format != 'ndjson' and output_format not in FILE_FORMATS:
+        return jsonify({"success": False, "error": f"Invalid format: {output_format}"}), 400
+    
+    try:
+        # NDJSON goes straight from the cursor to the client
+        if output_format == 'ndjson':
+            locations = iter_locations(order_by="ml.id")
+            response = Response(stream_with_context(stream_ndjson(locations)),
+                                mimetype='application/x-ndjson')
+            response.headers['Content-Disposition'] = 'attachment; filename=locations.ndjson'
+            return response
+        
+        # Binary formats are written to a temporary file first
+        try:
+            path = write_export_file(output_format)
+        except ImportError:
+            return jsonify({"success": False, "error": f"{output_format} export requires fiona to be installed"}), 501
+        
+        driver, extension, mimetype = FILE_FORMATS[output_format]
+        response = Response(stream_export_file(path), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename=locations{extension}'
+        response.headers['Content-Length'] = str(os.path.getsize(path))
+        return response
+        
+    except Exception as e:
+        app.logger.error(f"Error exporting locations: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/locations/bulk', methods=['POST'])
+def bulk_create_locations():
+    """Create many map locations from a GeoJSON FeatureCollection or newline delimited GeoJSON."""
+    try:
+        # Validate every feature before inserting anything
+        try:
+            rows, geoms = prepare_rows(read_features(request))
+        except BulkImportError as e:
+            return jsonify({"success": False, "error": str(e), "errors": e.errors}), 400
+        
+        if not rows:
+            return jsonify({"success": False, "error": "No features to import"}), 400
+        
+        try:
+            # Insert everything in one transaction
+            location_ids = insert_locations(rows, geoms)
+            db.session.commit()
+        except Exception as e:
+            # Rollback the transaction if an error occurs
+            db.session.rollback()
+            app.logger.error(f"Error importing locations: {str(e)}")
+            app.logger.error(traceback.format_exc())
+            return jsonify({"success": False, "error": str(e)}), 500
+        
+        # Update the caches and indexes for the new locations
+        for location_id, row in zip(location_ids, rows):
+            name_index.add(location_id, row['name'])
+            cluster_index.add(location_id, row['lat'], row['lng'], row['type'])
+        locations_changed(import_bounds(geoms))
+        
+        return jsonify({"success": True, "data": {"ids": location_ids, "count": len(location_ids)}}), 201
+        
+    except Exception as e:
+        app.logger.error(f"Error importing locations: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @app.route('/api/locations/<int:location_id>', methods=['GET'])
 def get_location(location_id):
     """Get a specific map location by ID."""
     try:
-        sql = text("""
-            SELECT 
-                id, name, description, type, 
-                geometry.STAsText() as wkt,
-                lat, lng,
-                created_at, updated_at
-            FROM map_location
-            WHERE id = :id
-        """)
-        
-        result = db.session.execute(sql, {"id": location_id}).fetchone()
+        locations = fetch_locations_by_ids([location_id])
         
-        if not result:
+        if not locations:
             error_msg = f"Location with ID {location_id} not found"
             return jsonify({"success": False, "error": error_msg}), 404
         
-        try:
-            geom = shapely.wkt.loads(result.wkt)
-            geojson = mapping(geom)
-            
-            location_dict = {
-                'id': result.id,
-                'name': result.name,
-                'description': result.description,
-                'geometry': geojson,
-                'type': result.type,
-                'lat': result.lat,
-                'lng': result.lng,
-                'created_at': result.created_at.isoformat(),
-                'updated_at': result.updated_at.isoformat()
-            }
-            
-            return jsonify({"success": True, "data": location_dict}), 200
-        except Exception as e:
-            error_msg = f"Error processing geometry for location {location_id}: {str(e)}"
-            location_dict = {
-                'id': result.id,
-                'name': result.name,
-                'description': result.description,
-                'type': result.type,
-                'lat': result.lat,
-                'lng': result.lng,
-                'error': error_msg,
-                'created_at': result.created_at.isoformat(),
-                'updated_at': result.updated_at.isoformat()
-            }
-            return jsonify({"success": True, "data": location_dict}), 200
+        return jsonify({"success": True, "data": locations[0]}), 200
     except Exception as e:
         error_msg = f"Error fetching location {location_id}: {str(e)}"
         return jsonify({"success": False, "error": error_msg}), 500
@@ -555,15 +536,8 @@ def update_location(location_id):
         # Get the location type
         location_type_input = data['location_type']
         
-        # Check if location_type is a numeric ID or a string name
-        location_type = None
-        if isinstance(location_type_input, int) or (isinstance(location_type_input, str) and location_type_input.isdigit()):
-            # If it's a numeric ID, get the location type by ID
-            type_id = int(location_type_input)
-            location_type = LocationType.query.get(type_id)
-        else:
-            # If it's a string, get the location type by short_name
-            location_type = LocationType.query.filter_by(short_name=location_type_input).first()
+        # Look up the location type by numeric ID or short_name in the type registry
+        location_type = current_location_types().resolve(location_type_input)
         
         if not location_type:
             return jsonify({"success": False, "error": f"Invalid location type: {location_type_input}"}), 400
@@ -597,17 +571,21 @@ def update_location(location_id):
                 
             wkt = geom_shape.wkt
             
+            # Remember where the location was, so its old tiles can be invalidated
+            old_bounds = location_bounds(location_id)
+            
             # Update the location with SQL
-            sql = text("""
+            sql = text(f"""
                 UPDATE map_location
                 SET 
                     name = :name,
                     description = :description,
-                    geometry = geography::STGeomFromText(:wkt, 4326),
+                    geometry = {spatial.geometry_from_wkt(':wkt')},
+                    geojson = :geojson,
                     type = :type,
                     lat = :lat,
                     lng = :lng,
-                    updated_at = GETUTCDATE()
+                    updated_at = {spatial.now}
                 WHERE id = :id
             """)
             
@@ -618,6 +596,7 @@ def update_location(location_id):
                     'name': data['name'],
                     'description': data.get('description', ''),
                     'wkt': wkt,
+                    'geojson': geometry_to_geojson_text(geom_shape),
                     'type': location_type.id,
                     'lat': lat,
                     'lng': lng,
@@ -625,12 +604,20 @@ def update_location(location_id):
                 }
             )
             
+            # Store the simplified geometries for each zoom tier
+            store_lod_geometries(location_id, geom_shape)
+            
             # Commit the transaction
             db.session.commit()
             
+            # Update the caches and indexes for the old and new geometry
+            name_index.add(location_id, data['name'])
+            cluster_index.add(location_id, lat, lng, location_type.id)
+            locations_changed(old_bounds, geom_shape.bounds)
+            
             # Return the updated location
-            updated_location = MapLocation.query.get(location_id)
-            return jsonify({"success": True, "data": updated_location.to_dict()}), 200
+            updated_location = fetch_locations_by_ids([location_id])[0]
+            return jsonify({"success": True, "data": updated_location}), 200
             
         except Exception as e:
             # Rollback the transaction if an error occurs
@@ -654,10 +641,18 @@ def delete_location(location_id):
         if not result:
             return jsonify({"success": False, "error": f"Location with ID {location_id} not found"}), 404
         
+        # Remember where the location was, so its tiles can be invalidated
+        old_bounds = location_bounds(location_id)
+        
+        delete_lod_geometries(location_id)
         delete_sql = text("DELETE FROM map_location WHERE id = :id")
         db.session.execute(delete_sql, {"id": location_id})
         db.session.commit()
         
+        name_index.remove(location_id)
+        cluster_index.remove(location_id)
+        locations_changed(old_bounds)
+        
         return jsonify({"success": True, "message": f"Location with ID {location_id} deleted successfully"}), 200
     except Exception as e:
         if 'db' in locals() and db.session:
@@ -666,70 +661,53 @@ def delete_location(location_id):
         return jsonify({"success": False, "error": error_msg}), 500
 
 @app.route('/api/dog_parks', methods=['GET'])
+@cached_snapshot
 def get_dog_parks():
     """Get all dog parks."""
     try:
-        # Build SQL query to get dog parks (type = 1)
-        sql_query = """
-            SELECT 
-                ml.id, ml.name, ml.description, ml.type, ml.lat, ml.lng, 
-                ml.created_at, ml.updated_at,
-                lt.id as lt_id, lt.short_name, lt.icon, lt.color
-            FROM map_location ml
-            JOIN location_type lt ON ml.type = lt.id
-            WHERE ml.type = 1
-        """
+        # Fetch dog parks (type = 1) with their geometry in a single query
+        locations_dict = fetch_locations(["ml.type = 1"])
         
-        # Execute the query
-        results = db.session.execute(text(sql_query)).fetchall()
+        return jsonify(locations_dict)
         
-        # Process results
-        locations_dict = []
-        for row in results:
-            # Get the location ID to fetch geometry
-            location_id = row.id
-            
-            # Get geometry data using SQL Server's specific functions
-            geo_sql = text("SELECT geometry.STAsText() as wkt FROM map_location WHERE id = :id")
-            geo_result = db.session.execute(geo_sql, {"id": location_id}).fetchone()
-            
-            # Process geometry if available
-            geometry_json = None
-            if geo_result and geo_result.wkt:
-                # Convert WKT to Shapely geometry
-                geom = shapely.wkt.loads(geo_result.wkt)
-                
-                # Convert to GeoJSON
-                geometry_json = mapping(geom)
-            
-            # Create location dictionary
-            location = {
-                'id': row.id,
-                'name': row.name,
-                'description': row.description,
-                'type': row.type,
-                'lat': row.lat,
-                'lng': row.lng,
-                'geometry': geometry_json,
-                'location_type': {
-                    'id': row.lt_id,
-                    'short_name': row.short_name,
-                    'icon': row.icon,
-                    'color': row.color
-                },
-                'created_at': row.created_at.isoformat() if row.created_at else None,
-                'updated_at': row.updated_at.isoformat() if row.updated_at else None
-            }
+    except Exception as e:
+        app.logger.error(f"Error fetching dog parks: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/tiles/<int:z>/<int:x>/<int:y>.pbf', methods=['GET'])
+def get_tile(z, x, y):
+    """Get a Mapbox Vector Tile of the map locations."""
+    if not is_valid_tile(z, x, y):
+        return jsonify({"success": False, "error": f"Invalid tile {z}/{x}/{y}"}), 404
+    
+    try:
+        data = tile_cache.get(z, x, y)
+        record_cache('tile', data is not None)
+        if data is None:
+            version = locations_version.get()
+            data = render_tile(z, x, y)
             
-            locations_dict.append(location)
+            # Don't cache a tile if the locations changed while it was rendered
+            if locations_version.get() == version:
+                tile_cache.put(z, x, y, data)
+                # A change committed while it was written may have invalidated the tiles before the write
+                if locations_version.get() != version:
+                    tile_cache.remove(z, x, y)
         
-        return jsonify(locations_dict)
+        return Response(data, mimetype='application/vnd.mapbox-vector-tile')
         
     except Exception as e:
-        app.logger.error(f"Error fetching dog parks: {str(e)}")
+        app.logger.error(f"Error rendering tile {z}/{x}/{y}: {str(e)}")
         app.logger.error(traceback.format_exc())
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Export the application metrics in the Prometheus text format."""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
 @app.route('/api/test-geography', methods=['POST'])
 def test_geography():
     """Test endpoint to diagnose Geography data type issues."""
@@ -746,12 +724,12 @@ def test_geography():
         description = "A test point for debugging"
         type = "test"
         
-        sql = text("""
-            INSERT INTO map_location (name, description, geometry, type, created_at, updated_at)
-            VALUES (:name, :description, geography::STGeomFromText(:wkt, 4326), :type, GETUTCDATE(), GETUTCDATE())
-        """)
+        sql = text(spatial.insert_returning_id(
+            "INSERT INTO map_location (name, description, geometry, type, created_at, updated_at)",
+            f"VALUES (:name, :description, {spatial.geometry_from_wkt(':wkt')}, :type, {spatial.now}, {spatial.now})"
+        ))
         
-        db.session.execute(
+        result = db.session.execute(
             sql, 
             {
                 'name': name, 
@@ -762,14 +740,12 @@ def test_geography():
         )
         
         # Get the ID of the newly inserted record
-        id_sql = text("SELECT IDENT_CURRENT('map_location') AS id")
-        result = db.session.execute(id_sql)
         inserted_id = int(result.scalar())
         
-        sql = text("""
+        sql = text(f"""
             SELECT 
                 id, name, description, type, 
-                geometry.STAsText() as wkt,
+                {spatial.as_text('geometry')} as wkt,
                 created_at, updated_at
             FROM map_location
             WHERE id = :id
@@ -860,6 +836,7 @@ def create_location_type():
         
         db.session.add(location_type)
         db.session.commit()
+        location_types_changed()
         
         return jsonify({
             'success': True,
@@ -897,6 +874,7 @@ def update_location_type(type_id):
             location_type.color = data['color']
         
         db.session.commit()
+        location_types_changed()
         
         return jsonify({
             'success': True,
@@ -926,6 +904,7 @@ def delete_location_type(type_id):
         
         db.session.delete(location_type)
         db.session.commit()
+        location_types_changed()
         
         return jsonify({
             'success': True,
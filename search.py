@@ -0,0 +1,262 @@
+"""
+Location search pipeline behind /api/search.
+
+Place names come from the offline gazetteer first. The geocoder is only
+asked when the gazetteer returns fewer than GAZETTEER_FALLBACK_THRESHOLD
+places (by default, when it has no match), and its places are merged in
+after the gazetteer's. It runs concurrently with the database lookup on a
+shared thread pool, merged once both return or once the geocoder deadline
+expires, so search latency is bounded by the slowest single source rather
+than the sum of all of them.
+"""
+from app import app, db, spatial
+from sqlalchemy import text
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import time
+
+from gazetteer import get_gazetteer, place_to_location
+from location_types import current_location_types
+from geocoder import geocoder
+from name_index import current_name_index
+from text_utils import normalize_text
+from metrics import with_request_metrics
+
+# Maximum number of search results
+MAX_RESULTS = 10
+
+# Maximum number of "did you mean" suggestions
+MAX_SUGGESTIONS = 3
+
+# Major cities, always shown as cities even if Photon doesn't say so
+MAJOR_NZ_CITIES = ['Wellington', 'Auckland', 'Christchurch', 'Hamilton', 'Tauranga', 'Dunedin']
+
+# The geocoder is asked when the gazetteer returns fewer places than this
+GAZETTEER_FALLBACK_THRESHOLD = app.config['GAZETTEER_FALLBACK_THRESHOLD']
+
+# How long to wait for the geocoder before answering with local results only
+SEARCH_DEADLINE = app.config['SEARCH_DEADLINE']
+
+# Shared pool for the concurrent lookups of all search requests. In gevent
+# workers the standard library is patched, so its threads are greenlets.
+executor = ThreadPoolExecutor(max_workers=app.config['SEARCH_THREADS'], thread_name_prefix='search')
+
+
+def _with_app_context(func, *args):
+    """Run a function inside an application context, for use on pool threads."""
+    with app.app_context():
+        return func(*args)
+
+
+def search_database(query):
+    """Search for locations in our database whose name contains the query."""
+    sql = text(f"""
+        SELECT {spatial.top(MAX_RESULTS)}
+            ml.id, ml.name, ml.description, ml.type,
+            ml.lat, ml.lng
+        FROM map_location ml
+        WHERE LOWER(ml.name) LIKE LOWER(:query)
+        ORDER BY ml.name {spatial.limit(MAX_RESULTS)}
+    """)
+
+    location_types = current_location_types()
+    results = db.session.execute(sql, {"query": f"%{query}%"}).fetchall()
+
+    locations = []
+    for row in results:
+        # Create location_type object with icon and color
+        location_type_info = None
+        location_type = location_types.by_id.get(row.type)
+        if location_type:
+            location_type_info = {
+                'id': location_type.id,
+                'name': location_type.short_name,
+                'icon': location_type.icon,
+                'color': location_type.color
+            }
+
+        locations.append({
+            'id': row.id,
+            'name': row.name,
+            'description': row.description,
+            'type': row.type,
+            'location_type': location_type_info,
+            'lat': row.lat,
+            'lng': row.lng,
+            'source': 'database'
+        })
+
+    return locations
+
+
+def photon_feature_to_location(feature, normalized_query):
+    """
+    Convert a Photon feature to a search result.
+
+    Returns:
+        dict: The search result, or None if the feature should be skipped
+    """
+    if 'properties' not in feature or 'geometry' not in feature:
+        return None
+
+    properties = feature['properties']
+    geometry = feature['geometry']
+
+    # Skip if not in New Zealand
+    if properties.get('country') != 'New Zealand':
+        return None
+
+    # Skip neighborhoods
+    if properties.get('osm_key') == 'place' and properties.get('osm_value') == 'neighbourhood':
+        return None
+
+    # Get the name and type
+    name = properties.get('name')
+    if not name:
+        return None
+
+    # Check if query is actually part of the name (case insensitive),
+    # normalizing the name to handle macrons
+    if normalized_query not in normalize_text(name.lower()):
+        return None
+
+    # Determine the place type
+    place_type = 'Location'
+    if name in MAJOR_NZ_CITIES:
+        place_type = 'City'
+    elif properties.get('city'):
+        place_type = 'City'
+    elif properties.get('town'):
+        place_type = 'Town'
+    elif properties.get('suburb'):
+        place_type = 'Suburb'
+    elif properties.get('village'):
+        place_type = 'Village'
+
+    # Build a description from available properties
+    description_parts = []
+    for part in ['city', 'state', 'suburb', 'district']:
+        if part in properties and properties[part] != name:
+            description_parts.append(properties[part])
+
+    description = ', '.join(description_parts) if description_parts else place_type
+
+    # Get coordinates
+    if geometry['type'] != 'Point' or len(geometry['coordinates']) < 2:
+        return None
+
+    lng, lat = geometry['coordinates'][:2]
+
+    return {
+        'id': None,
+        'name': name,
+        'description': description,
+        'type': place_type,
+        # Default location_type for external locations
+        'location_type': {
+            'id': None,
+            'name': place_type,
+            'icon': 'place',  # Material Icons map marker
+            'color': '#666666'  # Default gray color
+        },
+        'lat': lat,
+        'lng': lng,
+        'source': 'photon'
+    }
+
+
+def search_photon(query):
+    """Search the geocoder for places in New Zealand matching the query."""
+    normalized_query = normalize_text(query.lower())
+
+    locations = []
+    for feature in geocoder.search(query, limit=MAX_RESULTS):
+        location = photon_feature_to_location(feature, normalized_query)
+        if location:
+            locations.append(location)
+
+    return locations
+
+
+def photon_suggestions(query, suggestions):
+    """Add place names from a relaxed geocoder search to the suggestions."""
+    suggestions = list(suggestions)
+
+    for feature in geocoder.search(query, limit=5):
+        properties = feature.get('properties')
+        if not properties:
+            continue
+
+        # Skip if not in New Zealand
+        if properties.get('country') != 'New Zealand':
+            continue
+
+        # Get the name
+        name = properties.get('name')
+        if not name or name.lower() == query.lower():
+            continue
+
+        # Add to suggestions if not already there
+        if name not in suggestions:
+            suggestions.append(name)
+
+        # Stop if we have enough suggestions
+        if len(suggestions) >= MAX_SUGGESTIONS:
+            break
+
+    return suggestions
+
+
+def run_search(query):
+    """
+    Search the database, the gazetteer and, if needed, the geocoder.
+
+    Returns:
+        tuple: (list of results, list of suggestions)
+    """
+    started = time.monotonic()
+
+    # Count the pool thread's SQL against this request
+    database_future = executor.submit(with_request_metrics(_with_app_context), search_database, query)
+
+    # Places from the offline gazetteer, with the geocoder as a fallback for
+    # places it doesn't know about
+    places = [place_to_location(place) for place in get_gazetteer().search(query, MAX_RESULTS)]
+    photon_future = None
+    if len(places) < GAZETTEER_FALLBACK_THRESHOLD:
+        photon_future = executor.submit(search_photon, query)
+
+    # Suggestions come from the in-memory name index, built while we wait
+    suggestions = current_name_index().suggest(query, n=MAX_SUGGESTIONS, cutoff=0.5)
+
+    locations = database_future.result()
+    geocoder_in_time = True
+
+    # Fill the remaining slots with places
+    locations += places[:MAX_RESULTS - len(locations)]
+
+    # Then with places from the geocoder, if it answers in time
+    if photon_future is not None and len(locations) < MAX_RESULTS:
+        remaining = max(SEARCH_DEADLINE - (time.monotonic() - started), 0)
+        try:
+            # Skip the places the gazetteer already returned
+            known_names = {normalize_text(place['name'].lower()) for place in places}
+            photon_places = [
+                place for place in photon_future.result(timeout=remaining)
+                if normalize_text(place['name'].lower()) not in known_names
+            ]
+            locations += photon_places[:MAX_RESULTS - len(locations)]
+        except FutureTimeoutError:
+            geocoder_in_time = False
+            app.logger.warning(f"Geocoder missed the search deadline for '{query}'")
+        except Exception as e:
+            app.logger.error(f"Error searching Photon API: {str(e)}")
+
+    # Only ask the geocoder for more suggestions if we have nothing else to
+    # show, and it isn't already too slow to answer
+    if len(locations) == 0 and len(suggestions) < MAX_SUGGESTIONS and geocoder_in_time:
+        try:
+            suggestions = photon_suggestions(query, suggestions)
+        except Exception as e:
+            app.logger.error(f"Error getting suggestions from Photon API: {str(e)}")
+
+    return locations, suggestions
@@ -0,0 +1,417 @@
+"""
+Set-based serialization of map locations.
+
+Every endpoint that emits locations goes through this module so that the
+location attributes and the geometry are fetched together in a single query,
+instead of one geometry query per row. Location type metadata is embedded
+from the in-memory type registry rather than joined in.
+"""
+from app import app, db, spatial
+from sqlalchemy import text, bindparam
+from collections import namedtuple
+import shapely
+from geojson_encoder import geometry_to_geojson
+from raw_json import RawJSON
+from lod import LOD_TIERS, tier_for_zoom
+from location_types import current_location_types
+
+# SQL Server allows at most 2100 parameters per statement, so lookups by ID
+# are issued in chunks comfortably below that limit
+ID_CHUNK_SIZE = 1000
+
+# Rows fetched from the cursor at a time when streaming locations
+STREAM_BATCH_SIZE = 500
+
+# Columns selected for every serialized location
+LOCATION_COLUMNS = """
+    ml.id, ml.name, ml.description, ml.type, ml.lat, ml.lng,
+    ml.created_at, ml.updated_at
+"""
+
+# Geometry columns at full resolution, as pre-encoded GeoJSON or WKB to be encoded here
+GEOMETRY_COLUMNS = spatial.geometry_columns
+
+# Geometry columns for a LOD tier, falling back to the full resolution
+# geometry for locations without a simplified geometry for the tier
+LOD_GEOMETRY_COLUMNS = spatial.lod_geometry_columns
+
+# Table hint forcing the spatial index, on engines that need one
+SPATIAL_INDEX_HINT = spatial.spatial_index_hint
+
+# Condition selecting locations that intersect a WKT polygon, e.g. a viewport
+INTERSECTS_CONDITION = spatial.intersects_condition
+
+# Fields of a serialized location, in output order
+FIELDS = ('id', 'name', 'description', 'type', 'lat', 'lng', 'geometry',
+          'location_type', 'created_at', 'updated_at')
+
+# Column selected for each field other than the geometry
+FIELD_COLUMNS = {
+    'id': 'ml.id',
+    'name': 'ml.name',
+    'description': 'ml.description',
+    'type': 'ml.type',
+    'lat': 'ml.lat',
+    'lng': 'ml.lng',
+    'location_type': 'ml.type',
+    'created_at': 'ml.created_at',
+    'updated_at': 'ml.updated_at',
+}
+
+# Ways of returning the geometry: left out, a point at the centre (from the
+# lat/lng columns), simplified for the zoom level, or at full resolution
+GEOMETRY_MODES = ('none', 'centroid', 'simplified', 'full')
+
+# The fields of a sparse location query and how to return its geometry
+Projection = namedtuple('Projection', ['fields', 'geometry'])
+
+
+def parse_projection(fields_value, geometry_value, zoom=None, required=('id',)):
+    """
+    Parse the fields and geometry query parameters.
+
+    Args:
+        fields_value: Comma separated field names, all fields by default
+        geometry_value: One of GEOMETRY_MODES, simplified if a zoom was
+            given and full otherwise by default
+        zoom: The requested zoom level, if any
+        required: Fields always returned, e.g. the sort key of a page
+
+    Returns:
+        Projection: The projection, or None if neither parameter was given
+
+    Raises:
+        ValueError: If a field or the geometry mode is unknown
+    """
+    if not fields_value and not geometry_value:
+        return None
+
+    if fields_value:
+        requested = {field.strip() for field in fields_value.split(',') if field.strip()}
+        unknown = requested - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. "
+                             f"Valid fields are: {', '.join(FIELDS)}")
+    else:
+        requested = set(FIELDS)
+
+    if geometry_value:
+        if geometry_value not in GEOMETRY_MODES:
+            raise ValueError(f"geometry must be one of: {', '.join(GEOMETRY_MODES)}")
+        # Asking for a geometry mode includes the geometry
+        if geometry_value == 'none':
+            requested.discard('geometry')
+        else:
+            requested.add('geometry')
+        geometry = geometry_value
+    else:
+        geometry = 'simplified' if zoom is not None else 'full'
+
+    if 'geometry' not in requested:
+        geometry = 'none'
+
+    requested.update(required)
+    return Projection(tuple(field for field in FIELDS if field in requested), geometry)
+
+
+def _projection_lod_tier(projection, zoom):
+    """Get the LOD tier a query needs, None for full resolution or no geometry."""
+    if projection is None:
+        return tier_for_zoom(zoom)
+    if projection.geometry != 'simplified':
+        return None
+    # Without a zoom level, simplified means the most simplified tier
+    return tier_for_zoom(zoom) if zoom is not None else LOD_TIERS[0][0]
+
+
+def _projection_columns(projection, lod_tier):
+    """Get the SQL select list of a sparse location query."""
+    columns = ['ml.id']
+    for field in projection.fields:
+        column = FIELD_COLUMNS.get(field)
+        if column and column not in columns:
+            columns.append(column)
+
+    if projection.geometry == 'centroid':
+        # The point is built from the centre coordinates, no geometry is read
+        for column in ('ml.lat', 'ml.lng'):
+            if column not in columns:
+                columns.append(column)
+    elif projection.geometry != 'none':
+        columns.append(GEOMETRY_COLUMNS if lod_tier is None else LOD_GEOMETRY_COLUMNS)
+
+    return ', '.join(columns)
+
+
+def build_location_query(where=None, order_by=None, index_hint=None, lod_tier=None,
+                         extra_columns=None, join=None, limit=False, projection=None):
+    """
+    Build the SQL for a set-based location query.
+
+    Args:
+        where: Optional list of SQL conditions, combined with AND
+        order_by: Optional ORDER BY expression
+        index_hint: Optional table hint for map_location, e.g. SPATIAL_INDEX_HINT
+        lod_tier: Optional LOD tier, bound as :lod_tier, to use simplified geometries
+        extra_columns: Optional SQL for additional columns to select
+        join: Optional SQL for an additional join, e.g. spatial.nearest_join()
+        limit: Whether to return at most :row_limit rows
+        projection: Optional Projection, to only select the columns it needs
+
+    Returns:
+        str: The SQL query
+    """
+    if projection is None:
+        columns = f"{LOCATION_COLUMNS}, {GEOMETRY_COLUMNS if lod_tier is None else LOD_GEOMETRY_COLUMNS}"
+    else:
+        columns = _projection_columns(projection, lod_tier)
+    if extra_columns:
+        columns += f", {extra_columns}"
+
+    sql = f"""
+        SELECT {spatial.top(':row_limit') if limit else ''} {columns}
+        FROM map_location ml {index_hint or ''}
+        {join or ''}
+    """
+
+    if lod_tier is not None:
+        sql += " LEFT JOIN map_location_lod lod ON lod.location_id = ml.id AND lod.tier = :lod_tier"
+
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+
+    if limit:
+        sql += f" {spatial.limit(':row_limit')}"
+
+    return sql
+
+
+def serialize_location_row(row, geom=None, location_types=None):
+    """
+    Convert a row from a location query to a dictionary.
+
+    Args:
+        row: The row
+        geom: Optional Shapely geometry already decoded from row.wkb,
+            see serialize_location_rows
+        location_types: Optional location type registry, the current one by default
+    """
+    if location_types is None:
+        location_types = current_location_types()
+
+    return {
+        'id': row.id,
+        'name': row.name,
+        'description': row.description,
+        'type': row.type,
+        'lat': row.lat,
+        'lng': row.lng,
+        'geometry': _row_geometry(row, geom),
+        'location_type': location_types.embed(row.type),
+        'created_at': _isoformat(row.created_at),
+        'updated_at': _isoformat(row.updated_at)
+    }
+
+
+def serialize_projected_row(row, projection, geom=None, location_types=None):
+    """
+    Convert a row from a sparse location query to a dictionary with the projection's fields.
+
+    Takes the same arguments as serialize_location_row.
+    """
+    location = {}
+    for field in projection.fields:
+        if field == 'geometry':
+            if projection.geometry == 'centroid':
+                location['geometry'] = (
+                    {'type': 'Point', 'coordinates': [row.lng, row.lat]}
+                    if row.lat is not None and row.lng is not None else None
+                )
+            else:
+                location['geometry'] = _row_geometry(row, geom)
+        elif field == 'location_type':
+            if location_types is None:
+                location_types = current_location_types()
+            location['location_type'] = location_types.embed(row.type)
+        elif field in ('created_at', 'updated_at'):
+            location[field] = _isoformat(getattr(row, field))
+        else:
+            location[field] = getattr(row, field)
+    return location
+
+
+def _row_geometry(row, geom=None):
+    """Get the GeoJSON geometry of a row from its geojson or wkb column."""
+    try:
+        if row.geojson:
+            # Already stored as GeoJSON, spliced into the response as it is
+            return RawJSON(row.geojson)
+        if row.wkb:
+            # Convert WKB to Shapely geometry and then to GeoJSON
+            if geom is None:
+                geom = shapely.from_wkb(row.wkb)
+            return geometry_to_geojson(geom)
+    except Exception as e:
+        app.logger.warning(f"Error processing geometry for location {row.id}: {str(e)}")
+    return None
+
+
+def _isoformat(value):
+    """Format a timestamp column, which SQLite returns as text already."""
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+def serialize_location_rows(rows, location_types=None, projection=None):
+    """
+    Convert rows from a location query to dictionaries.
+
+    The geometries of all the rows are decoded with a single vectorised call.
+    Rows of a sparse query are serialized with only the projection's fields.
+    """
+    if location_types is None:
+        location_types = current_location_types()
+
+    if projection is not None and projection.geometry in ('none', 'centroid'):
+        # No geometry column was selected
+        return [serialize_projected_row(row, projection, None, location_types) for row in rows]
+
+    # Invalid WKB decodes to None rather than failing the whole batch
+    geoms = shapely.from_wkb([row.wkb for row in rows], on_invalid='ignore')
+
+    locations = []
+    for row, geom in zip(rows, geoms):
+        if row.wkb and geom is None:
+            app.logger.warning(f"Error processing geometry for location {row.id}: invalid WKB")
+        if projection is None:
+            locations.append(serialize_location_row(row, geom, location_types))
+        else:
+            locations.append(serialize_projected_row(row, projection, geom, location_types))
+    return locations
+
+
+def fetch_locations(where=None, params=None, order_by=None, index_hint=None, zoom=None, limit=None,
+                    projection=None):
+    """
+    Fetch and serialize all locations matching the given conditions.
+
+    Args:
+        where: Optional list of SQL conditions, combined with AND
+        params: Optional dictionary of bind parameters for the conditions
+        order_by: Optional ORDER BY expression
+        index_hint: Optional table hint for map_location
+        zoom: Optional map zoom level, used to pick simplified geometries
+        limit: Optional maximum number of locations, e.g. for a page
+        projection: Optional Projection, to only fetch and return some fields
+
+    Returns:
+        list: Serialized location dictionaries
+    """
+    sql, params = _prepare_location_query(where, params, order_by, index_hint, zoom, limit, projection)
+    results = db.session.execute(sql, params).fetchall()
+    return serialize_location_rows(results, projection=projection)
+
+
+def iter_locations(where=None, params=None, order_by=None, index_hint=None, zoom=None,
+                   limit=None, projection=None, batch_size=STREAM_BATCH_SIZE):
+    """
+    Serialize the locations matching the given conditions one at a time.
+
+    Rows are read from the cursor in batches as the generator is consumed, so
+    memory use stays flat however many locations match. Takes the same
+    arguments as fetch_locations.
+    """
+    sql, params = _prepare_location_query(where, params, order_by, index_hint, zoom, limit, projection)
+
+    # Load the type registry first, the connection can't run another query
+    # while the streamed result is open
+    location_types = current_location_types()
+
+    result = db.session.execute(sql, params, execution_options={'yield_per': batch_size})
+    for rows in result.partitions():
+        yield from serialize_location_rows(rows, location_types, projection)
+
+
+def fetch_nearby_locations(lat, lng, k, radius_m=None, where=None, params=None, zoom=None):
+    """
+    Fetch and serialize the locations nearest to a point, nearest first.
+
+    Distances are measured to the closest point of each location's geometry,
+    so a point inside a park is 0 metres from it.
+
+    Args:
+        lat, lng: The point
+        k: Maximum number of locations
+        radius_m: Optional maximum distance in metres
+        where: Optional list of SQL conditions on the map_location columns
+            (unaliased, e.g. "type = :type_id"), applied before picking the nearest
+        params: Optional dictionary of bind parameters for the conditions
+        zoom: Optional map zoom level, used to pick simplified geometries
+
+    Returns:
+        list: Serialized location dictionaries, each with a distance_m
+    """
+    params = dict(params or {})
+    params.update({'lat': lat, 'lng': lng, 'k': k})
+    if radius_m is not None:
+        params['radius_m'] = radius_m
+
+    join = spatial.nearest_join(radius_m is not None, where or [])
+
+    lod_tier = tier_for_zoom(zoom)
+    if lod_tier is not None:
+        params['lod_tier'] = lod_tier
+
+    sql = build_location_query(
+        order_by="nearest.distance_m, ml.id",
+        lod_tier=lod_tier,
+        extra_columns="nearest.distance_m",
+        join=join
+    )
+
+    rows = db.session.execute(text(sql), params).fetchall()
+    locations = serialize_location_rows(rows)
+    for row, location in zip(rows, locations):
+        location['distance_m'] = row.distance_m
+
+    return locations
+
+
+def _prepare_location_query(where, params, order_by, index_hint, zoom, limit=None, projection=None):
+    """Build the statement and bind parameters for fetch_locations and iter_locations."""
+    params = dict(params or {})
+    lod_tier = _projection_lod_tier(projection, zoom)
+    if lod_tier is not None:
+        params['lod_tier'] = lod_tier
+
+    if limit is not None:
+        params['row_limit'] = limit
+
+    sql = build_location_query(where, order_by, index_hint, lod_tier, limit=limit is not None,
+                               projection=projection)
+    return text(sql), params
+
+
+def fetch_locations_by_ids(location_ids):
+    """
+    Fetch and serialize locations by ID, preserving the order of the IDs.
+
+    IDs are looked up with batched IN (...) queries, so the number of round
+    trips depends on the number of chunks rather than the number of rows.
+    """
+    location_ids = list(location_ids)
+    sql = text(build_location_query(["ml.id IN :ids"])).bindparams(
+        bindparam('ids', expanding=True)
+    )
+
+    locations_by_id = {}
+    for start in range(0, len(location_ids), ID_CHUNK_SIZE):
+        chunk = location_ids[start:start + ID_CHUNK_SIZE]
+        for location in serialize_location_rows(db.session.execute(sql, {"ids": chunk}).fetchall()):
+            locations_by_id[location['id']] = location
+
+    return [locations_by_id[location_id] for location_id in location_ids if location_id in locations_by_id]
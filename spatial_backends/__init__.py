@@ -0,0 +1,38 @@
+"""
+Spatial SQL for each supported database engine.
+
+The queries in the rest of the app are written once, with the parts that
+differ between engines (geometry functions, nearest neighbour joins, row
+limits, returning inserted IDs) taken from the backend of the engine in use:
+
+- SQL Server and Azure SQL (mssql), used in production
+- PostgreSQL with PostGIS (postgresql)
+- SQLite with SpatiaLite (sqlite)
+"""
+from spatial_backends.base import SpatialBackend
+from spatial_backends.mssql import SqlServerBackend
+from spatial_backends.postgis import PostGISBackend
+from spatial_backends.spatialite import SpatiaLiteBackend
+
+# Backend of each SQLAlchemy dialect
+BACKENDS = {
+    'mssql': SqlServerBackend,
+    'postgresql': PostGISBackend,
+    'sqlite': SpatiaLiteBackend,
+}
+
+
+def get_spatial_backend(engine):
+    """
+    Get the spatial backend for an engine and set the engine up for it.
+
+    Raises:
+        ValueError: If the engine's database has no spatial backend
+    """
+    backend_class = BACKENDS.get(engine.dialect.name)
+    if backend_class is None:
+        raise ValueError(f"No spatial backend for the {engine.dialect.name} database engine")
+
+    backend = backend_class()
+    backend.install(engine)
+    return backend
@@ -0,0 +1,109 @@
+"""
+Base class of the spatial backends.
+
+The defaults here are the standard SQL shared by PostGIS and SpatiaLite
+(LIMIT, RETURNING, GeoJSON encoded by the database), the SQL Server backend
+overrides most of them.
+"""
+from sqlalchemy import text
+
+
+class SpatialBackend:
+    """SQL for the spatial features of one database engine."""
+
+    # Name of the backend, as used in logs and benchmark reports
+    name = None
+
+    # Table hint forcing the spatial index of map_location, if the engine needs one
+    spatial_index_hint = ""
+
+    # Expression for the current UTC time
+    now = "CURRENT_TIMESTAMP"
+
+    # Condition selecting locations that intersect the WKT polygon :bbox_wkt, e.g. a viewport
+    intersects_condition = None
+
+    # DDL creating the tables and spatial index, run by `flask create-spatial-schema`.
+    # None for engines whose schema is managed by the migrations.
+    schema_statements = None
+
+    def install(self, engine):
+        """Set up an engine for this backend, e.g. load extensions on connect."""
+
+    def geometry_from_wkt(self, wkt):
+        """Get the expression building a geometry from a WKT expression, e.g. a bind parameter."""
+        raise NotImplementedError
+
+    def as_binary(self, column):
+        """Get the expression reading a geometry column as WKB."""
+        raise NotImplementedError
+
+    def as_text(self, column):
+        """Get the expression reading a geometry column as WKT."""
+        raise NotImplementedError
+
+    def as_geojson(self, column):
+        """Get the expression reading a geometry column as GeoJSON text."""
+        raise NotImplementedError
+
+    @property
+    def geometry_columns(self):
+        """
+        Geometry columns of a location query at full resolution, as geojson and wkb.
+
+        The pre-encoded GeoJSON is used as it is, and the database encodes the
+        geometries of locations without it.
+        """
+        return f"COALESCE(ml.geojson, {self.as_geojson('ml.geometry')}) as geojson, NULL as wkb"
+
+    @property
+    def lod_geometry_columns(self):
+        """Geometry columns for a LOD tier, falling back to the full resolution geometry."""
+        return f"COALESCE(lod.geojson, ml.geojson, {self.as_geojson('ml.geometry')}) as geojson, NULL as wkb"
+
+    def nearest_join(self, within_radius, filters):
+        """
+        Get the join limiting a location query to the :k locations nearest to :lat, :lng.
+
+        The joined derived table is named nearest and has the distance in
+        metres to the closest point of each geometry as distance_m.
+
+        Args:
+            within_radius: Whether to only include locations within :radius_m metres
+            filters: List of SQL conditions on the unaliased map_location columns
+        """
+        raise NotImplementedError
+
+    def top(self, count):
+        """Get the clause after SELECT limiting the number of rows, if the engine uses one."""
+        return ""
+
+    def limit(self, count):
+        """Get the clause at the end of a query limiting the number of rows, if the engine uses one."""
+        return f"LIMIT {count}"
+
+    def insert_returning_id(self, insert, source):
+        """
+        Build an INSERT statement returning the IDs of the new rows.
+
+        Args:
+            insert: The INSERT INTO ... (columns) part
+            source: The VALUES (...) or SELECT ... part
+        """
+        return f"{insert} {source} RETURNING id"
+
+    def values_table(self, rows, columns, alias):
+        """
+        Build a derived table of literal rows, for inserting several rows in one statement.
+
+        Args:
+            rows: The rows as SQL, e.g. "(:a_0, :b_0), (:a_1, :b_1)"
+            columns: Names of the columns
+            alias: Name of the derived table
+        """
+        return f"(VALUES {rows}) AS {alias} ({', '.join(columns)})"
+
+    def create_schema(self, connection):
+        """Run the schema DDL on a connection."""
+        for statement in self.schema_statements:
+            connection.execute(text(statement))
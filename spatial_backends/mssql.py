@@ -0,0 +1,68 @@
+"""
+Spatial SQL for SQL Server and Azure SQL, the production database.
+
+Geometries are stored in a geography column with the spatial index created
+in migration 80932f59876b. SQL Server can't encode GeoJSON, so geometries
+without pre-encoded GeoJSON are read as WKB and encoded in Python.
+"""
+from spatial_backends.base import SpatialBackend
+
+# Join of the nearest locations. The inner query has the shape SQL Server
+# needs to answer it from the spatial index (TOP, ORDER BY STDistance and a
+# STDistance condition).
+NEAREST_JOIN = """
+    JOIN (
+        SELECT TOP (:k) id, geometry.STDistance(geography::Point(:lat, :lng, 4326)) as distance_m
+        FROM map_location WITH (INDEX(idx_map_location_geometry))
+        WHERE geometry.STDistance(geography::Point(:lat, :lng, 4326)) {condition}{filter}
+        ORDER BY geometry.STDistance(geography::Point(:lat, :lng, 4326))
+    ) nearest ON nearest.id = ml.id
+"""
+
+
+class SqlServerBackend(SpatialBackend):
+    """SQL Server geography backend."""
+
+    name = 'mssql'
+
+    spatial_index_hint = "WITH (INDEX(idx_map_location_geometry))"
+
+    now = "GETUTCDATE()"
+
+    intersects_condition = "ml.geometry.STIntersects(geography::STGeomFromText(:bbox_wkt, 4326)) = 1"
+
+    # The geography is only read, as WKB, for locations without pre-encoded GeoJSON
+    geometry_columns = """
+        ml.geojson as geojson,
+        CASE WHEN ml.geojson IS NULL THEN ml.geometry.STAsBinary() END as wkb
+    """
+
+    lod_geometry_columns = """
+        COALESCE(lod.geojson, ml.geojson) as geojson,
+        CASE WHEN lod.geojson IS NULL AND ml.geojson IS NULL THEN ml.geometry.STAsBinary() END as wkb
+    """
+
+    def geometry_from_wkt(self, wkt):
+        return f"geography::STGeomFromText({wkt}, 4326)"
+
+    def as_binary(self, column):
+        return f"{column}.STAsBinary()"
+
+    def as_text(self, column):
+        return f"{column}.STAsText()"
+
+    def nearest_join(self, within_radius, filters):
+        # The index can only be used with a bounded or IS NOT NULL distance
+        return NEAREST_JOIN.format(
+            condition="<= :radius_m" if within_radius else "IS NOT NULL",
+            filter=''.join(f" AND {clause}" for clause in filters)
+        )
+
+    def top(self, count):
+        return f"TOP ({count})"
+
+    def limit(self, count):
+        return ""
+
+    def insert_returning_id(self, insert, source):
+        return f"{insert} OUTPUT INSERTED.id {source}"
@@ -0,0 +1,91 @@
+"""
+Spatial SQL for PostgreSQL with PostGIS.
+
+Geometries are stored in a geography column, so distances are in metres as
+on SQL Server, with a GiST index. Nearest location queries order by the
+KNN <-> operator, which walks the index instead of measuring every row, and
+geometries without pre-encoded GeoJSON are encoded by ST_AsGeoJSON.
+"""
+from spatial_backends.base import SpatialBackend
+
+# The query point as a geography
+POINT = "CAST(ST_SetSRID(ST_MakePoint(:lng, :lat), 4326) AS geography)"
+
+NEAREST_JOIN = f"""
+    JOIN (
+        SELECT id, ST_Distance(geometry, {POINT}) as distance_m
+        FROM map_location
+        WHERE {{conditions}}
+        ORDER BY geometry <-> {POINT}
+        LIMIT :k
+    ) nearest ON nearest.id = ml.id
+"""
+
+
+class PostGISBackend(SpatialBackend):
+    """PostGIS geography backend."""
+
+    name = 'postgis'
+
+    now = "(now() AT TIME ZONE 'utc')"
+
+    intersects_condition = "ST_Intersects(ml.geometry, ST_GeogFromText(:bbox_wkt))"
+
+    schema_statements = [
+        "CREATE EXTENSION IF NOT EXISTS postgis",
+        """
+        CREATE TABLE IF NOT EXISTS location_type (
+            id SERIAL PRIMARY KEY,
+            short_name VARCHAR(50) NOT NULL UNIQUE,
+            icon VARCHAR(50) NOT NULL,
+            color VARCHAR(20) NOT NULL,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS map_location (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            description TEXT,
+            geometry GEOGRAPHY(GEOMETRY, 4326) NOT NULL,
+            type INTEGER NOT NULL REFERENCES location_type (id),
+            lat DOUBLE PRECISION,
+            lng DOUBLE PRECISION,
+            geojson TEXT,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_map_location_geometry ON map_location USING GIST (geometry)",
+        # Supports keyset pagination in name order
+        "CREATE INDEX IF NOT EXISTS idx_map_location_name_id ON map_location (name, id)",
+        """
+        CREATE TABLE IF NOT EXISTS map_location_lod (
+            id SERIAL PRIMARY KEY,
+            location_id INTEGER NOT NULL REFERENCES map_location (id) ON DELETE CASCADE,
+            tier INTEGER NOT NULL,
+            geojson TEXT NOT NULL,
+            CONSTRAINT uq_map_location_lod_location_tier UNIQUE (location_id, tier)
+        )
+        """,
+    ]
+
+    def geometry_from_wkt(self, wkt):
+        return f"ST_GeogFromText({wkt})"
+
+    def as_binary(self, column):
+        return f"ST_AsBinary({column})"
+
+    def as_text(self, column):
+        return f"ST_AsText({column})"
+
+    def as_geojson(self, column):
+        return f"ST_AsGeoJSON({column})"
+
+    def nearest_join(self, within_radius, filters):
+        conditions = ["TRUE"]
+        if within_radius:
+            # ST_DWithin uses the index, unlike comparing ST_Distance
+            conditions.append(f"ST_DWithin(geometry, {POINT}, :radius_m)")
+        return NEAREST_JOIN.format(conditions=" AND ".join(conditions + list(filters)))
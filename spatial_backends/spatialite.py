@@ -0,0 +1,121 @@
+"""
+Spatial SQL for SQLite with SpatiaLite, for running locally without a server.
+
+Geometries are stored as SpatiaLite geometries in SRID 4326 with an R*Tree
+spatial index. Viewport queries go through the SpatialIndex virtual table
+first, and distances are measured on the ellipsoid so they are in metres as
+on the other engines. Nearest location queries measure every candidate, so
+this backend is meant for development and benchmark baselines rather than
+large datasets.
+"""
+import os
+from sqlalchemy import event
+
+from spatial_backends.base import SpatialBackend
+
+# The mod_spatialite extension, override with the full path if it isn't on the library path
+SPATIALITE_LIBRARY = os.getenv('SPATIALITE_LIBRARY', 'mod_spatialite')
+
+# Distance in metres on the ellipsoid from the query point
+DISTANCE = "ST_Distance(geometry, MakePoint(:lng, :lat, 4326), 1)"
+
+NEAREST_JOIN = f"""
+    JOIN (
+        SELECT id, {DISTANCE} as distance_m
+        FROM map_location
+        WHERE {{conditions}}
+        ORDER BY distance_m
+        LIMIT :k
+    ) nearest ON nearest.id = ml.id
+"""
+
+
+class SpatiaLiteBackend(SpatialBackend):
+    """SpatiaLite geometry backend."""
+
+    name = 'spatialite'
+
+    intersects_condition = """
+        Intersects(ml.geometry, GeomFromText(:bbox_wkt, 4326)) = 1
+        AND ml.id IN (
+            SELECT rowid FROM SpatialIndex
+            WHERE f_table_name = 'map_location' AND f_geometry_column = 'geometry'
+            AND search_frame = GeomFromText(:bbox_wkt, 4326)
+        )
+    """
+
+    schema_statements = [
+        # Creates the spatial metadata tables if the database doesn't have them yet
+        "SELECT InitSpatialMetaData(1) WHERE CheckSpatialMetaData() = 0",
+        """
+        CREATE TABLE IF NOT EXISTS location_type (
+            id INTEGER PRIMARY KEY,
+            short_name VARCHAR(50) NOT NULL UNIQUE,
+            icon VARCHAR(50) NOT NULL,
+            color VARCHAR(20) NOT NULL,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS map_location (
+            id INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            description TEXT,
+            type INTEGER NOT NULL REFERENCES location_type (id),
+            lat REAL,
+            lng REAL,
+            geojson TEXT,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP
+        )
+        """,
+        # Both return 0 rather than failing when the column or index already exists
+        "SELECT AddGeometryColumn('map_location', 'geometry', 4326, 'GEOMETRY', 'XY', 1)",
+        "SELECT CreateSpatialIndex('map_location', 'geometry')",
+        # Supports keyset pagination in name order
+        "CREATE INDEX IF NOT EXISTS idx_map_location_name_id ON map_location (name, id)",
+        """
+        CREATE TABLE IF NOT EXISTS map_location_lod (
+            id INTEGER PRIMARY KEY,
+            location_id INTEGER NOT NULL REFERENCES map_location (id) ON DELETE CASCADE,
+            tier INTEGER NOT NULL,
+            geojson TEXT NOT NULL,
+            CONSTRAINT uq_map_location_lod_location_tier UNIQUE (location_id, tier)
+        )
+        """,
+    ]
+
+    def install(self, engine):
+        event.listen(engine, 'connect', self._on_connect)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        # Every connection needs the extension loaded, and SQLite only
+        # enforces foreign keys (e.g. the LOD cascade) when asked to
+        dbapi_connection.enable_load_extension(True)
+        dbapi_connection.load_extension(SPATIALITE_LIBRARY)
+        dbapi_connection.enable_load_extension(False)
+        dbapi_connection.execute("PRAGMA foreign_keys = ON")
+
+    def geometry_from_wkt(self, wkt):
+        return f"GeomFromText({wkt}, 4326)"
+
+    def as_binary(self, column):
+        return f"AsBinary({column})"
+
+    def as_text(self, column):
+        return f"AsText({column})"
+
+    def as_geojson(self, column):
+        return f"AsGeoJSON({column})"
+
+    def nearest_join(self, within_radius, filters):
+        conditions = ["geometry IS NOT NULL"]
+        if within_radius:
+            conditions.append(f"{DISTANCE} <= :radius_m")
+        return NEAREST_JOIN.format(conditions=" AND ".join(conditions + list(filters)))
+
+    def values_table(self, rows, columns, alias):
+        # SQLite can't name the columns of a derived table, VALUES names them column1, column2, ...
+        renamed = ", ".join(f"column{i + 1} AS {column}" for i, column in enumerate(columns))
+        return f"(SELECT {renamed} FROM (VALUES {rows})) AS {alias}"
@@ -8,35 +8,19 @@ document.addEventListener('DOMContentLoaded', function() {
     // Add a loading indicator
     locationsList.innerHTML = '<div class="loading">Loading locations...</div>';
     
-    // Function to fetch all locations
-    function fetchLocations() {
-        // Use type parameter to filter by location type if needed
-        fetch('/api/locations')
-            .then(response => {
-                if (!response.ok) {
-                    throw new Error(`HTTP error! Status: ${response.status}`);
-                }
-                return response.json();
-            })
-            .then(data => {
-                // Store all locations data
-                allLocations = data.data || [];
-                
-                // Clear loading indicator
-                locationsList.innerHTML = '';
-                
-                if (allLocations.length === 0) {
-                    locationsList.innerHTML = '<div class="no-locations">No locations found in the database.</div>';
-                    return;
-                }
-                
-                // Wait for the map to be initialized
-                waitForMap();
-            })
-            .catch(error => {
-                console.error('Error fetching locations:', error);
-                locationsList.innerHTML = `<div class="error">Error loading locations: ${error.message}</div>`;
-            });
+    // Function to collect locations as the map loads them for each viewport
+    function collectLocations(newLocations) {
+        // Store all locations loaded so far
+        allLocations = allLocations.concat(newLocations);
+        
+        // Show a message if nothing has been loaded yet
+        if (allLocations.length === 0) {
+            locationsList.innerHTML = '<div class="no-locations">No locations found in the current area.</div>';
+            return;
+        }
+        
+        // Wait for the map to be initialized
+        waitForMap();
     }
     
     // Function to wait for map to be initialized
@@ -52,7 +36,11 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     // Function to set up map event listeners
+    let mapEventsReady = false;
     function setupMapEvents() {
+        if (mapEventsReady) return;
+        mapEventsReady = true;
+        
         // Filter locations when map moves or zooms
         window.locationMap.on('moveend', filterLocationsByMapBounds);
         window.locationMap.on('zoomend', filterLocationsByMapBounds);
@@ -136,7 +124,7 @@ document.addEventListener('DOMContentLoaded', function() {
         // Add header with visible count and total count
         const header = document.createElement('h2');
         header.className = 'locations-header';
-        header.textContent = `Locations (${visibleLocations.length} visible of ${allLocations.length} total)`;
+        header.textContent = `Locations (${visibleLocations.length} visible of ${allLocations.length} loaded)`;
         locationsList.appendChild(header);
         
         // Show message if no locations are visible
@@ -252,6 +240,8 @@ document.addEventListener('DOMContentLoaded', function() {
         locationsList.appendChild(paginationContainer);
     }
     
-    // Start fetching locations
-    fetchLocations();
+    // The public map fetches locations for each viewport and shares them here
+    document.addEventListener('locationsloaded', function(event) {
+        collectLocations(event.detail || []);
+    });
 });
@@ -292,7 +292,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     },
                     removeOutsideVisibleBounds: true,
                     animate: true,
-                    animateAddingMarkers: true
+                    animateAddingMarkers: false
                 });
                 
                 drawings.forEach(drawing => {
@@ -535,8 +535,8 @@ document.addEventListener('DOMContentLoaded', function() {
                                 searchBox.value = details;
                                 
                                 // Only show the red marker for map locations (not location types from DB)
-                                // Check if this is a search result location from Photon API
-                                if (location.source === 'photon') {
+                                // Check if this is a place from the gazetteer or the Photon API
+                                if (location.source === 'photon' || location.source === 'gazetteer') {
                                     // Remove any existing marker
                                     if (currentMarker) {
                                         map.removeLayer(currentMarker);
@@ -694,221 +694,503 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
-    // Function to load all locations
-    function loadLocations() {
-        fetch('/api/locations')
+    // Create a single marker cluster group for all location types
+    const markerCluster = L.markerClusterGroup({
+        showCoverageOnHover: false,
+        maxClusterRadius: 50,
+        iconCreateFunction: function(cluster) {
+            const count = cluster.getChildCount();
+            let size = 'small';
+            
+            if (count > 10) {
+                size = 'medium';
+            }
+            if (count > 20) {
+                size = 'large';
+            }
+            
+            return L.divIcon({
+                html: `<div><span>${count}</span></div>`,
+                className: `marker-cluster marker-cluster-${size}`,
+                iconSize: L.point(40, 40)
+            });
+        },
+        removeOutsideVisibleBounds: true,
+        animate: true,
+        // Animating each added marker stalls slow devices when a viewport loads
+        animateAddingMarkers: false
+    });
+    
+    // Below this zoom level the server clusters the markers (/api/clusters),
+    // instead of every location being loaded and clustered in the browser
+    const SERVER_CLUSTER_MAX_ZOOM = 12;
+    
+    // Layer holding the cluster markers from the server
+    const serverClusterLayer = L.layerGroup();
+    
+    // Number of the latest cluster request, so responses to older ones are dropped
+    let clusterRequest = 0;
+    
+    // Store every location loaded so far by ID, shared with locations.js
+    window.loadedLocations = {};
+    
+    // Largest zoom level of each simplified geometry tier, as LOD_TIERS in lod.py.
+    // Zoom levels above the last one get the full resolution geometry.
+    const LOD_TIER_MAX_ZOOMS = [8, 11, 14];
+    
+    // Function to get the geometry tier the API uses for a zoom level, higher tiers are more detailed
+    function tierForZoom(zoom) {
+        const tier = LOD_TIER_MAX_ZOOMS.findIndex(maxZoom => zoom <= maxZoom);
+        return tier === -1 ? LOD_TIER_MAX_ZOOMS.length : tier;
+    }
+    
+    // Viewports (padded) that have already been loaded from the API, with their geometry tier
+    const loadedBounds = [];
+    
+    // Geometry tier and geometry layers of each loaded location by ID
+    const locationTiers = {};
+    const locationGeometryLayers = {};
+    
+    // IDs of the locations already sent to the locations list
+    const listedLocations = {};
+    
+    // Viewports (padded) listed while zoomed out, without loading their locations onto the map
+    const listedBounds = [];
+    
+    // Fields the locations list shows, fetched without geometries while zoomed out
+    const LIST_FIELDS = 'id,name,description,type,lat,lng,location_type';
+    
+    // Function to send the locations not listed yet to the locations list
+    function listLocations(locations) {
+        const newLocations = locations.filter(location => !listedLocations[location.id]);
+        newLocations.forEach(location => {
+            listedLocations[location.id] = true;
+        });
+        
+        // Sent even when empty, so the list stops showing that it is loading
+        document.dispatchEvent(new CustomEvent('locationsloaded', { detail: newLocations }));
+    }
+    
+    // Function to add the geometry layers of a location to the map
+    function addGeometryLayers(location) {
+        const layers = [];
+        
+        // Add the GeoJSON to the map with custom styling
+        const geoJSONLayer = L.geoJSON(location.geometry, {
+            style: function(feature) {
+                return {
+                    color: '#2E7D32', // Dark green to match paw icon
+                    weight: 3,
+                    opacity: 0.9,
+                    fillColor: '#2E7D32',
+                    fillOpacity: 0.2
+                };
+            },
+            pointToLayer: function(feature, latlng) {
+                // For point geometries, we'll handle them separately
+                return null;
+            }
+        });
+        
+        // Add all geometries to the non-point layers group
+        geoJSONLayer.eachLayer(layer => {
+            // Store the location ID on the layer for reference
+            layer.locationId = location.id;
+            layer.locationType = location.type;
+            
+            // Apply the styling directly to each layer based on type
+            applyLocationStyling(layer, location.type, location.location_type);
+            
+            nonPointLayers.addLayer(layer);
+            layers.push(layer);
+        });
+        
+        locationGeometryLayers[location.id] = layers;
+        return layers;
+    }
+    
+    // Function to swap a loaded location's geometry for a more detailed one
+    function replaceGeometry(location) {
+        try {
+            (locationGeometryLayers[location.id] || []).forEach(layer => {
+                nonPointLayers.removeLayer(layer);
+            });
+            
+            if (location.type !== 1 && location.type !== 2) {
+                return;
+            }
+            
+            const layers = addGeometryLayers(location);
+            
+            // Point the center marker at the new geometry
+            const centerMarker = window.locationMarkers[location.id];
+            if (centerMarker) {
+                markerToGeometryMap.delete(centerMarker);
+                layers.forEach(layer => {
+                    markerToGeometryMap.set(centerMarker, layer);
+                });
+            }
+        } catch (e) {
+            console.error('Error replacing location geometry:', e);
+        }
+    }
+    
+    // Function to add a single location to the map
+    function addLocation(location) {
+        try {
+            // Only process dog_park locations
+            if (location.type === 1 || location.type === 2) {
+                const geometryLayers = addGeometryLayers(location);
+                
+                // Create a marker at the center coordinates
+                if (location.lat !== null && location.lng !== null) {
+                    const centerLatLng = L.latLng(location.lat, location.lng);
+                    
+                    // Get location type information
+                    const locationType = location.location_type || { 
+                        short_name: location.type === 1 ? 'dog_park' : 'vet',
+                        icon: location.type === 1 ? 'pets' : 'local_hospital',
+                        color: location.type === 1 ? '#2E7D32' : '#1565C0'
+                    };
+                    
+                    // Create a visible marker for the center point
+                    const centerMarker = L.marker(centerLatLng, {
+                        icon: L.divIcon({
+                            className: locationType.short_name === 'vet' ? 'vet-marker' : 'paw-marker',
+                            html: `<i class="material-icons" style="color: ${locationType.color}">${locationType.icon}</i>`,
+                            iconSize: [30, 30],
+                            iconAnchor: [15, 15]
+                        })
+                    });
+                    
+                    // Add data to the marker for reference
+                    centerMarker.locationId = location.id;
+                    centerMarker.drawingType = location.geometry ? location.geometry.type : null;
+                    centerMarker.locationType = locationType.short_name;
+                    centerMarker.locationTypeId = location.type; // The type field is now the location_type_id
+                    
+                    // Store marker in global object for access from locations.js
+                    window.locationMarkers[location.id] = centerMarker;
+                    
+                    // Add hover events for tooltip
+                    centerMarker.on('mouseover', function() {
+                        showMarkerTooltip(centerMarker, location.name);
+                    });
+                    
+                    centerMarker.on('mouseout', function() {
+                        hideMarkerTooltip();
+                    });
+                    
+                    // Add to cluster, unless its type is currently filtered out
+                    const isHidden = (location.type === 1 && window.dogParksVisible === false) ||
+                                     (location.type === 2 && window.vetsVisible === false);
+                    if (!isHidden) {
+                        markerCluster.addLayer(centerMarker);
+                    }
+                    
+                    // Store reference between center marker and actual geometry
+                    geometryLayers.forEach(layer => {
+                        markerToGeometryMap.set(centerMarker, layer);
+                    });
+                } else {
+                    console.warn(`Location ${location.id} (${location.name}) has no center coordinates.`);
+                }
+            }
+        } catch (e) {
+            console.error('Error adding location to map:', e);
+        }
+    }
+    
+    // Function to format map bounds as a bbox query parameter
+    function boundsToBbox(bounds) {
+        return [
+            Math.max(bounds.getWest(), -180),
+            Math.max(bounds.getSouth(), -90),
+            Math.min(bounds.getEast(), 180),
+            Math.min(bounds.getNorth(), 90)
+        ].map(value => value.toFixed(5)).join(',');
+    }
+    
+    // Function to create the marker of a cluster from the server
+    function createServerClusterMarker(cluster) {
+        const latLng = L.latLng(cluster.lat, cluster.lng);
+        
+        // A single location is drawn with the icon of its type
+        if (cluster.count === 1) {
+            const locationType = cluster.location_type || {
+                short_name: 'dog_park',
+                icon: 'pets',
+                color: '#2E7D32'
+            };
+            
+            const marker = L.marker(latLng, {
+                icon: L.divIcon({
+                    className: locationType.short_name === 'vet' ? 'vet-marker' : 'paw-marker',
+                    html: `<i class="material-icons" style="color: ${locationType.color}">${locationType.icon}</i>`,
+                    iconSize: [30, 30],
+                    iconAnchor: [15, 15]
+                })
+            });
+            
+            // Zoom in far enough to load the location itself
+            marker.on('click', function() {
+                map.setView(latLng, SERVER_CLUSTER_MAX_ZOOM);
+            });
+            
+            return marker;
+        }
+        
+        // Same sizes as the browser-side clusters
+        let size = 'small';
+        if (cluster.count > 10) {
+            size = 'medium';
+        }
+        if (cluster.count > 20) {
+            size = 'large';
+        }
+        
+        const marker = L.marker(latLng, {
+            icon: L.divIcon({
+                html: `<div><span>${cluster.count}</span></div>`,
+                className: `marker-cluster marker-cluster-${size}`,
+                iconSize: L.point(40, 40)
+            })
+        });
+        
+        // Zoom to the area covered by the cluster's locations
+        marker.on('click', function() {
+            const [west, south, east, north] = cluster.bbox;
+            map.fitBounds([[south, west], [north, east]], { padding: [40, 40] });
+        });
+        
+        return marker;
+    }
+    
+    // Function to switch between the server's clusters and the loaded locations
+    function showServerClusters(visible) {
+        if (visible) {
+            map.removeLayer(markerCluster);
+            map.removeLayer(nonPointLayers);
+            map.addLayer(serverClusterLayer);
+        } else {
+            // Ignore cluster responses still on their way
+            clusterRequest++;
+            serverClusterLayer.clearLayers();
+            map.removeLayer(serverClusterLayer);
+            map.addLayer(markerCluster);
+            map.addLayer(nonPointLayers);
+        }
+    }
+    
+    // Function to load the server's clusters for the current viewport
+    function loadClusters() {
+        const request = ++clusterRequest;
+        const bbox = boundsToBbox(map.getBounds().pad(0.25));
+        
+        // Only ask for the types whose filter chip is on
+        let typeParam = '';
+        if (window.dogParksVisible === false && window.vetsVisible === false) {
+            serverClusterLayer.clearLayers();
+            return;
+        } else if (window.dogParksVisible === false) {
+            typeParam = '&type=vet';
+        } else if (window.vetsVisible === false) {
+            typeParam = '&type=dog_park';
+        }
+        
+        fetch(`/api/clusters?bbox=${bbox}&zoom=${map.getZoom()}${typeParam}`)
             .then(response => response.json())
             .then(data => {
-                if (!data.success) {
-                    console.error('Error loading locations:', data.error);
+                // A newer request has been made since, e.g. the map moved again
+                if (request !== clusterRequest) {
                     return;
                 }
                 
-                const locations = data.data;
+                if (!data.success) {
+                    console.error('Error loading clusters:', data.error);
+                    return;
+                }
                 
-                // Create a single marker cluster group for all location types
-                const markerCluster = L.markerClusterGroup({
-                    showCoverageOnHover: false,
-                    maxClusterRadius: 50,
-                    iconCreateFunction: function(cluster) {
-                        const count = cluster.getChildCount();
-                        let size = 'small';
-                        
-                        if (count > 10) {
-                            size = 'medium';
-                        }
-                        if (count > 20) {
-                            size = 'large';
-                        }
-                        
-                        return L.divIcon({
-                            html: `<div><span>${count}</span></div>`,
-                            className: `marker-cluster marker-cluster-${size}`,
-                            iconSize: L.point(40, 40)
-                        });
-                    },
-                    removeOutsideVisibleBounds: true,
-                    animate: true,
-                    animateAddingMarkers: true
+                serverClusterLayer.clearLayers();
+                data.data.forEach(cluster => {
+                    serverClusterLayer.addLayer(createServerClusterMarker(cluster));
                 });
+            })
+            .catch(error => {
+                console.error('Error loading clusters:', error);
+            });
+    }
+    
+    // Function to fill the locations list for the current viewport while the map shows the server's clusters
+    function loadListedLocations() {
+        const bounds = map.getBounds().pad(0.25);
+        
+        // Skip the request if this area has already been listed or loaded
+        if (listedBounds.some(listed => listed.contains(bounds)) ||
+            loadedBounds.some(loaded => loaded.bounds.contains(bounds))) {
+            return;
+        }
+        
+        const bbox = boundsToBbox(bounds);
+        
+        // The list doesn't need the geometries, which are most of the response
+        fetch(`/api/locations?bbox=${bbox}&fields=${LIST_FIELDS}&geometry=none`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    console.error('Error loading locations list:', data.error);
+                    return;
+                }
                 
-                // Track cluster changes to update our marker-to-cluster mapping
-                markerCluster.on('clustered', function(event) {
-                    window.updateClusterMapping();
-                });
+                listedBounds.push(bounds);
+                listLocations(data.data);
+            })
+            .catch(error => {
+                console.error('Error loading locations list:', error);
+            });
+    }
+    
+    // Function to load the locations in the current viewport
+    function loadLocations() {
+        // Zoomed out, draw the clusters computed by the server instead, and only list the locations
+        if (map.getZoom() < SERVER_CLUSTER_MAX_ZOOM) {
+            showServerClusters(true);
+            loadClusters();
+            loadListedLocations();
+            return;
+        }
+        
+        showServerClusters(false);
+        
+        // Fetch a padded viewport so small pans don't need another request
+        const bounds = map.getBounds().pad(0.25);
+        const tier = tierForZoom(map.getZoom());
+        
+        // Skip the request if this area has already been loaded with geometries at least as detailed
+        if (loadedBounds.some(loaded => loaded.tier >= tier && loaded.bounds.contains(bounds))) {
+            return;
+        }
+        
+        const bbox = boundsToBbox(bounds);
+        
+        fetch(`/api/locations?bbox=${bbox}&zoom=${map.getZoom()}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    console.error('Error loading locations:', data.error);
+                    return;
+                }
                 
-                // Also update cluster mapping when zoom changes
-                map.on('zoomend', function() {
-                    // Wait a bit for clusters to update
-                    setTimeout(function() {
-                        window.updateClusterMapping();
-                    }, 300);
-                });
+                loadedBounds.push({ bounds: bounds, tier: tier });
                 
-                locations.forEach(location => {
-                    try {
-                        // Only process dog_park locations
-                        if (location.type === 1 || location.type === 2) {
-                            // Add the GeoJSON to the map with custom styling
-                            const geoJSONLayer = L.geoJSON(location.geometry, {
-                                style: function(feature) {
-                                    return {
-                                        color: '#2E7D32', // Dark green to match paw icon
-                                        weight: 3,
-                                        opacity: 0.9,
-                                        fillColor: '#2E7D32',
-                                        fillOpacity: 0.2
-                                    };
-                                },
-                                pointToLayer: function(feature, latlng) {
-                                    // For point geometries, we'll handle them separately
-                                    return null;
-                                }
-                            });
-                            
-                            // Add all geometries to the non-point layers group
-                            geoJSONLayer.eachLayer(layer => {
-                                // Store the location ID on the layer for reference
-                                layer.locationId = location.id;
-                                layer.locationType = location.type;
-                                
-                                // Apply the styling directly to each layer based on type
-                                applyLocationStyling(layer, location.type, location.location_type);
-                                
-                                nonPointLayers.addLayer(layer);
-                            });
-                            
-                            // Create a marker at the center coordinates
-                            if (location.lat !== null && location.lng !== null) {
-                                const centerLatLng = L.latLng(location.lat, location.lng);
-                                
-                                // Get location type information
-                                const locationType = location.location_type || { 
-                                    short_name: location.type === 1 ? 'dog_park' : 'vet',
-                                    icon: location.type === 1 ? 'pets' : 'local_hospital',
-                                    color: location.type === 1 ? '#2E7D32' : '#1565C0'
-                                };
-                                
-                                // Create a visible marker for the center point
-                                const centerMarker = L.marker(centerLatLng, {
-                                    icon: L.divIcon({
-                                        className: locationType.short_name === 'vet' ? 'vet-marker' : 'paw-marker',
-                                        html: `<i class="material-icons" style="color: ${locationType.color}">${locationType.icon}</i>`,
-                                        iconSize: [30, 30],
-                                        iconAnchor: [15, 15]
-                                    })
-                                });
-                                
-                                // Add data to the marker for reference
-                                centerMarker.locationId = location.id;
-                                centerMarker.drawingType = location.geometry.type;
-                                centerMarker.locationType = locationType.short_name;
-                                centerMarker.locationTypeId = location.type; // The type field is now the location_type_id
-                                
-                                // Store marker in global object for access from locations.js
-                                window.locationMarkers[location.id] = centerMarker;
-                                
-                                // Add hover events for tooltip
-                                centerMarker.on('mouseover', function() {
-                                    showMarkerTooltip(centerMarker, location.name);
-                                });
-                                
-                                centerMarker.on('mouseout', function() {
-                                    hideMarkerTooltip();
-                                });
-                                
-                                // Add to cluster
-                                markerCluster.addLayer(centerMarker);
-                                
-                                // Store reference between center marker and actual geometry
-                                geoJSONLayer.eachLayer(layer => {
-                                    markerToGeometryMap.set(centerMarker, layer);
-                                });
-                            } else {
-                                console.warn(`Location ${location.id} (${location.name}) has no center coordinates.`);
-                            }
-                        }
-                    } catch (e) {
-                        console.error('Error adding location to map:', e);
+                // Locations already on the map only get their geometry replaced, when it is more detailed
+                data.data.forEach(location => {
+                    if (window.loadedLocations[location.id] && locationTiers[location.id] < tier) {
+                        window.loadedLocations[location.id].geometry = location.geometry;
+                        locationTiers[location.id] = tier;
+                        replaceGeometry(location);
                     }
                 });
                 
-                // Add the marker cluster to the map
-                markerCluster.addTo(map);
-                
-                // Set up event listeners for marker cluster
-                markerCluster.on('clusterclick', function(a) {
-                    // When a cluster is clicked, hide all non-point geometries
-                    nonPointLayers.eachLayer(function(layer) {
-                        layer.setStyle({ opacity: 0, fillOpacity: 0 });
-                    });
+                // Only add locations that aren't already on the map
+                const newLocations = data.data.filter(location => !window.loadedLocations[location.id]);
+                newLocations.forEach(location => {
+                    window.loadedLocations[location.id] = location;
+                    locationTiers[location.id] = tier;
+                    addLocation(location);
                 });
                 
-                markerCluster.on('animationend', function() {
-                    // When cluster animation ends, show geometries for visible markers
-                    nonPointLayers.eachLayer(function(layer) {
-                        // Default to hidden
-                        layer.setStyle({ opacity: 0, fillOpacity: 0 });
-                    });
-                    
-                    // For each visible marker, show its geometry
-                    map.eachLayer(function(layer) {
-                        if (layer instanceof L.Marker && layer.locationId) {
-                            const geometry = markerToGeometryMap.get(layer);
-                            if (geometry) {
-                                geometry.setStyle({ 
-                                    opacity: 0.9, 
-                                    fillOpacity: 0.2 
-                                });
-                            }
-                        }
-                    });
-                });
-                
-                // Handle zoom events
-                map.on('zoomend', function() {
-                    // When zoomed out, hide all geometries
-                    if (map.getZoom() < 12) {
-                        nonPointLayers.eachLayer(function(layer) {
-                            layer.setStyle({ opacity: 0, fillOpacity: 0 });
-                        });
-                    } else {
-                        // When zoomed in, show geometries for visible markers
-                        nonPointLayers.eachLayer(function(layer) {
-                            // Default to hidden
-                            layer.setStyle({ opacity: 0, fillOpacity: 0 });
-                        });
-                        
-                        // For each visible marker, show its geometry
-                        map.eachLayer(function(layer) {
-                            if (layer instanceof L.Marker && layer.locationId) {
-                                const geometry = markerToGeometryMap.get(layer);
-                                if (geometry) {
-                                    geometry.setStyle({ 
-                                        opacity: 0.9, 
-                                        fillOpacity: 0.2 
-                                    });
-                                }
-                            }
-                        });
-                    }
-                });
-                
-                // If there are parks, zoom to fit them all
-                if (markerCluster.getLayers().length > 0) {
-                    // Create a bounds object that includes both types of locations
-                    const combinedBounds = markerCluster.getBounds();
-                    
-                    map.fitBounds(combinedBounds, {
-                        padding: [50, 50]
-                    });
-                }
+                // Let the locations list know about the newly loaded locations
+                listLocations(newLocations);
             })
             .catch(error => {
                 console.error('Error loading locations:', error);
             });
     }
     
+    // Track cluster changes to update our marker-to-cluster mapping
+    markerCluster.on('clustered', function(event) {
+        window.updateClusterMapping();
+    });
+    
+    // Also update cluster mapping when zoom changes
+    map.on('zoomend', function() {
+        // Wait a bit for clusters to update
+        setTimeout(function() {
+            window.updateClusterMapping();
+        }, 300);
+    });
+    
+    // Add the marker cluster to the map
+    markerCluster.addTo(map);
+    
+    // Set up event listeners for marker cluster
+    markerCluster.on('clusterclick', function(a) {
+        // When a cluster is clicked, hide all non-point geometries
+        nonPointLayers.eachLayer(function(layer) {
+            layer.setStyle({ opacity: 0, fillOpacity: 0 });
+        });
+    });
+    
+    markerCluster.on('animationend', function() {
+        // When cluster animation ends, show geometries for visible markers
+        nonPointLayers.eachLayer(function(layer) {
+            // Default to hidden
+            layer.setStyle({ opacity: 0, fillOpacity: 0 });
+        });
+        
+        // For each visible marker, show its geometry
+        map.eachLayer(function(layer) {
+            if (layer instanceof L.Marker && layer.locationId) {
+                const geometry = markerToGeometryMap.get(layer);
+                if (geometry) {
+                    geometry.setStyle({ 
+                        opacity: 0.9, 
+                        fillOpacity: 0.2 
+                    });
+                }
+            }
+        });
+    });
+    
+    // Handle zoom events
+    map.on('zoomend', function() {
+        // When zoomed out, hide all geometries
+        if (map.getZoom() < 12) {
+            nonPointLayers.eachLayer(function(layer) {
+                layer.setStyle({ opacity: 0, fillOpacity: 0 });
+            });
+        } else {
+            // When zoomed in, show geometries for visible markers
+            nonPointLayers.eachLayer(function(layer) {
+                // Default to hidden
+                layer.setStyle({ opacity: 0, fillOpacity: 0 });
+            });
+            
+            // For each visible marker, show its geometry
+            map.eachLayer(function(layer) {
+                if (layer instanceof L.Marker && layer.locationId) {
+                    const geometry = markerToGeometryMap.get(layer);
+                    if (geometry) {
+                        geometry.setStyle({ 
+                            opacity: 0.9, 
+                            fillOpacity: 0.2 
+                        });
+                    }
+                }
+            });
+        }
+    });
+    
+    // Re-query the API as the viewport moves
+    let loadTimeout = null;
+    map.on('moveend', function() {
+        if (loadTimeout) {
+            clearTimeout(loadTimeout);
+        }
+        loadTimeout = setTimeout(loadLocations, 200);
+    });
+    
     // Function to format location details
     function formatLocationDetails(location) {
         // Compile all available information
@@ -956,16 +1238,6 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Filter markers based on location type
     function filterMarkers(locationType, isVisible) {
-        // Get the marker cluster group
-        let markerCluster;
-        map.eachLayer(function(layer) {
-            if (layer instanceof L.MarkerClusterGroup) {
-                markerCluster = layer;
-            }
-        });
-        
-        if (!markerCluster) return;
-        
         // Loop through all markers
         Object.keys(window.locationMarkers).forEach(function(markerId) {
             const marker = window.locationMarkers[markerId];
@@ -977,8 +1249,8 @@ document.addEventListener('DOMContentLoaded', function() {
             
             if (isMatch) {
                 if (isVisible) {
-                    // If the marker isn't on the map, add it back
-                    if (!map.hasLayer(marker)) {
+                    // If the marker isn't in the cluster group, add it back
+                    if (!markerCluster.hasLayer(marker)) {
                         markerCluster.addLayer(marker);
                     }
                 } else {
@@ -1005,6 +1277,11 @@ document.addEventListener('DOMContentLoaded', function() {
             window.vetsVisible = isVisible;
         }
         
+        // Zoomed out, fetch the clusters again for the visible types
+        if (map.getZoom() < SERVER_CLUSTER_MAX_ZOOM) {
+            loadClusters();
+        }
+        
         // Trigger the locations list to update based on the new filter state
         if (typeof window.updateLocationsListFilters === 'function') {
             window.updateLocationsListFilters();
@@ -1045,7 +1322,7 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
-    // Load all locations when the page loads
+    // Load the locations in the initial viewport
     loadLocations();
     
     // Initialize filter chips
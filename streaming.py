@@ -0,0 +1,88 @@
+"""
+Incremental JSON output for large location collections.
+
+The generators here turn an iterator of serialized locations into the JSON
+text of a response, a chunk at a time, so the whole collection never has to
+be held in memory. Use them with Flask's stream_with_context.
+"""
+from app import app
+
+from raw_json import dumps
+
+# Approximate size of each chunk handed to the server, in characters
+CHUNK_SIZE = 64 * 1024
+
+
+def _chunked(prefix, items, suffix):
+    """Join prefix, comma separated items and suffix, yielding roughly CHUNK_SIZE pieces."""
+    buffer = [prefix]
+    size = len(prefix)
+    first = True
+
+    try:
+        for item in items:
+            if not first:
+                buffer.append(',')
+            first = False
+
+            buffer.append(item)
+            size += len(item) + 1
+
+            if size >= CHUNK_SIZE:
+                yield ''.join(buffer)
+                buffer = []
+                size = 0
+    except Exception as e:
+        # The status line has already been sent, so all we can do is stop
+        # and leave the client with incomplete JSON
+        app.logger.error(f"Error streaming locations: {str(e)}")
+        yield ''.join(buffer)
+        return
+
+    buffer.append(suffix)
+    yield ''.join(buffer)
+
+
+def location_to_feature(location):
+    """Convert a serialized location to a GeoJSON Feature."""
+    properties = {key: value for key, value in location.items() if key != 'geometry'}
+    return {
+        'type': 'Feature',
+        'id': location['id'],
+        'geometry': location.get('geometry'),
+        'properties': properties
+    }
+
+
+def stream_envelope(locations):
+    """Stream locations in the standard {"success": true, "data": [...]} envelope."""
+    items = (dumps(location) for location in locations)
+    return _chunked('{"success": true, "data": [', items, ']}')
+
+
+def stream_feature_collection(locations):
+    """Stream locations as a GeoJSON FeatureCollection."""
+    items = (dumps(location_to_feature(location)) for location in locations)
+    return _chunked('{"type": "FeatureCollection", "features": [', items, ']}')
+
+
+def stream_ndjson(locations):
+    """Stream locations as newline delimited GeoJSON, one Feature per line."""
+    buffer = []
+    size = 0
+
+    try:
+        for location in locations:
+            line = dumps(location_to_feature(location)) + '\n'
+            buffer.append(line)
+            size += len(line)
+
+            if size >= CHUNK_SIZE:
+                yield ''.join(buffer)
+                buffer = []
+                size = 0
+    except Exception as e:
+        # Every complete line already sent is still a valid feature
+        app.logger.error(f"Error streaming locations: {str(e)}")
+
+    yield ''.join(buffer)
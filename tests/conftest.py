@@ -0,0 +1,17 @@
+"""
+Shared test setup.
+
+The app reads its configuration from the environment when it is imported,
+so the tests point it at an in-memory SQLite database and a throwaway cache
+directory before any test module imports it. The modules under test keep
+their state in memory and never connect to the database.
+"""
+import os
+import sys
+import tempfile
+
+# The app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['CACHE_DIR'] = tempfile.mkdtemp(prefix='dog-parks-test-cache-')
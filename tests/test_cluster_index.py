@@ -0,0 +1,122 @@
+"""
+Tests for the in-memory location clustering (cluster_index.py).
+"""
+import pytest
+
+from cluster_index import ClusterIndex, INITIAL_CAPACITY, MAX_CLUSTER_ZOOM
+
+PARK = 1
+BEACH = 2
+
+# Three locations close together in Wellington and one in Auckland
+ROWS = [
+    (1, -41.2865, 174.7762, PARK),
+    (2, -41.2870, 174.7770, PARK),
+    (3, -41.2860, 174.7755, BEACH),
+    (4, -36.8485, 174.7633, PARK),
+]
+
+WELLINGTON = (174.7, -41.35, 174.85, -41.2)
+
+
+def make_index(rows=ROWS, version='v1'):
+    index = ClusterIndex()
+    index.load(rows, version)
+    return index
+
+
+def counts(clusters):
+    return sorted(cluster['count'] for cluster in clusters)
+
+
+def test_nearby_locations_are_clustered():
+    clusters = make_index().clusters(5)
+    assert counts(clusters) == [1, 3]
+
+    wellington = next(cluster for cluster in clusters if cluster['count'] == 3)
+    assert wellington['id'] is None
+    assert wellington['type'] == PARK
+    assert wellington['lat'] == pytest.approx((-41.2865 - 41.2870 - 41.2860) / 3)
+    assert wellington['lng'] == pytest.approx((174.7762 + 174.7770 + 174.7755) / 3)
+    assert wellington['bbox'] == [174.7755, -41.2870, 174.7770, -41.2860]
+
+    auckland = next(cluster for cluster in clusters if cluster['count'] == 1)
+    assert auckland['id'] == 4
+
+
+def test_every_location_stands_alone_past_the_cluster_zoom():
+    clusters = make_index().clusters(MAX_CLUSTER_ZOOM + 1)
+    assert sorted(cluster['id'] for cluster in clusters) == [1, 2, 3, 4]
+
+
+def test_bbox_and_type_filters():
+    index = make_index()
+    assert counts(index.clusters(5, bbox=WELLINGTON)) == [3]
+    assert counts(index.clusters(5, type_id=BEACH)) == [1]
+    assert counts(index.clusters(5, bbox=WELLINGTON, type_id=PARK)) == [2]
+
+
+def test_locations_without_a_centre_are_skipped():
+    index = make_index(ROWS + [(5, None, None, PARK)])
+    assert counts(index.clusters(MAX_CLUSTER_ZOOM + 1)) == [1, 1, 1, 1]
+
+
+def test_empty_index():
+    assert make_index([]).clusters(5) == []
+
+
+def test_add_new_location():
+    index = make_index()
+    index.add(5, -41.2868, 174.7765, BEACH)
+    assert counts(index.clusters(5, bbox=WELLINGTON)) == [4]
+
+
+def test_add_existing_location_moves_it():
+    index = make_index()
+    index.add(1, -36.8480, 174.7640, PARK)
+
+    assert counts(index.clusters(5, bbox=WELLINGTON)) == [2]
+    assert counts(index.clusters(5)) == [2, 2]
+
+
+def test_add_without_a_centre_removes_the_location():
+    index = make_index()
+    index.add(4, None, None, PARK)
+    assert counts(index.clusters(5)) == [3]
+
+
+def test_remove():
+    index = make_index()
+    index.remove(2)
+    index.remove(404)
+
+    clusters = index.clusters(MAX_CLUSTER_ZOOM + 1)
+    assert sorted(cluster['id'] for cluster in clusters) == [1, 3, 4]
+
+
+def test_removed_slots_are_reused():
+    index = make_index()
+    index.remove(2)
+    index.add(6, -41.2868, 174.7765, PARK)
+
+    assert index._size == len(ROWS)
+    assert sorted(cluster['id'] for cluster in index.clusters(MAX_CLUSTER_ZOOM + 1)) == [1, 3, 4, 6]
+
+
+def test_arrays_grow_past_the_initial_capacity():
+    index = make_index([])
+    total = INITIAL_CAPACITY + 10
+    for location_id in range(total):
+        index.add(location_id, -41.2865 + location_id * 1e-6, 174.7762, PARK)
+
+    assert counts(index.clusters(0)) == [total]
+
+
+def test_advance_version_only_from_the_previous_version():
+    index = make_index(version='v1')
+
+    index.advance_version('v0', 'v2')
+    assert index.version == 'v1'
+
+    index.advance_version('v1', 'v2')
+    assert index.version == 'v2'
@@ -0,0 +1,67 @@
+"""
+Tests for the offline gazetteer (gazetteer.py).
+"""
+from gazetteer import Gazetteer, place_to_location
+
+
+def place(name, place_type, city='', region='Wellington'):
+    return {'name': name, 'place_type': place_type, 'city': city, 'region': region, 'lat': -41.2, 'lng': 174.9}
+
+
+PLACES = [
+    place('Lower Hutt', 'City'),
+    place('Upper Hutt', 'City'),
+    place('Hutt Central', 'Suburb', city='Lower Hutt'),
+    place('Paekākāriki', 'Village'),
+    place('Huntly', 'Town', region='Waikato'),
+]
+
+
+def names(places):
+    return [p['name'] for p in places]
+
+
+def test_search_matches_word_starts():
+    # Names starting with the query first, then by place type and name
+    assert names(Gazetteer(PLACES).search('hutt')) == ['Hutt Central', 'Lower Hutt', 'Upper Hutt']
+
+
+def test_search_matches_prefixes_across_words():
+    assert names(Gazetteer(PLACES).search('hu')) == ['Huntly', 'Hutt Central', 'Lower Hutt', 'Upper Hutt']
+    assert names(Gazetteer(PLACES).search('lower  hu')) == ['Lower Hutt']
+
+
+def test_search_ignores_macrons_and_case():
+    assert names(Gazetteer(PLACES).search('PAEKAKARIKI')) == ['Paekākāriki']
+
+
+def test_search_limit_and_misses():
+    gazetteer = Gazetteer(PLACES)
+    assert len(gazetteer.search('hu', limit=2)) == 2
+    assert gazetteer.search('zz') == []
+    assert gazetteer.search('   ') == []
+    assert Gazetteer([]).search('hutt') == []
+
+
+def test_from_csv_skips_invalid_rows(tmp_path):
+    path = tmp_path / 'places.csv'
+    path.write_text(
+        "name,place_type,city,region,lat,lng\n"
+        "Lower Hutt,City,,Wellington,-41.21,174.90\n"
+        "Nowhere,Town,,,not a number,174.0\n"
+        "Petone,,Lower Hutt,Wellington,-41.22,174.87\n",
+        encoding='utf-8'
+    )
+
+    gazetteer = Gazetteer.from_csv(str(path))
+    assert names(gazetteer.places) == ['Lower Hutt', 'Petone']
+    assert gazetteer.places[1]['place_type'] == 'Location'
+
+
+def test_place_to_location_description():
+    location = place_to_location(place('Hutt Central', 'Suburb', city='Lower Hutt'))
+    assert location['description'] == 'Lower Hutt, Wellington'
+    assert location['source'] == 'gazetteer'
+    assert location['id'] is None
+
+    assert place_to_location(place('Wellington', 'City'))['description'] == 'City'
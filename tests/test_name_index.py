@@ -0,0 +1,91 @@
+"""
+Tests for the fuzzy location name index (name_index.py).
+"""
+from name_index import NameIndex
+
+ROWS = [
+    (1, 'Taupō Domain'),
+    (2, 'Wellington Botanic Garden'),
+    (3, 'Western Springs Park'),
+    (4, 'Cornwall Park'),
+]
+
+
+def make_index(rows=ROWS, version='v1'):
+    index = NameIndex()
+    index.load(rows, version)
+    return index
+
+
+def test_suggest_finds_misspelled_names():
+    index = make_index()
+    assert index.suggest('Cornwal Prk') == ['Cornwall Park']
+    assert index.suggest('welington botanic garden')[0] == 'Wellington Botanic Garden'
+
+
+def test_suggest_ignores_macrons_and_returns_original_names():
+    index = make_index()
+    assert index.suggest('taupo domain') == ['Taupō Domain']
+
+
+def test_suggest_respects_cutoff_and_limit():
+    index = make_index()
+    assert index.suggest('zzzzzz') == []
+    assert len(index.suggest('park', n=1, cutoff=0)) == 1
+
+
+def test_add_and_rename():
+    index = make_index()
+    index.add(5, 'Dog Heaven Reserve')
+    assert index.suggest('dog heaven reserv') == ['Dog Heaven Reserve']
+
+    # Adding an existing ID renames it
+    index.add(4, 'One Tree Hill Domain')
+    assert 'Cornwall Park' not in index.suggest('cornwall park')
+    assert index.suggest('one tree hill domain')[0] == 'One Tree Hill Domain'
+
+
+def test_remove():
+    index = make_index()
+    index.remove(4)
+    assert 'Cornwall Park' not in index.suggest('cornwall park')
+
+    # Removing an unknown ID does nothing
+    index.remove(404)
+    assert index.suggest('western springs park') == ['Western Springs Park']
+
+
+def test_shared_names_stay_until_every_location_is_removed():
+    index = make_index([(1, 'Dog Park'), (2, 'dog park')])
+
+    index.remove(1)
+    assert index.suggest('dog park') == ['Dog Park']
+
+    index.remove(2)
+    assert index.suggest('dog park') == []
+    assert not index._postings
+
+
+def test_empty_names_are_skipped():
+    index = make_index([(1, None), (2, ''), (3, 'Cornwall Park')])
+    assert index.suggest('cornwall park') == ['Cornwall Park']
+    index.remove(1)
+
+
+def test_load_replaces_contents():
+    index = make_index()
+    index.load([(9, 'Hagley Park')], 'v2')
+
+    assert index.version == 'v2'
+    assert 'Cornwall Park' not in index.suggest('cornwall park')
+    assert index.suggest('hagley park') == ['Hagley Park']
+
+
+def test_advance_version_only_from_the_previous_version():
+    index = make_index(version='v1')
+
+    index.advance_version('v0', 'v2')
+    assert index.version == 'v1'
+
+    index.advance_version('v1', 'v2')
+    assert index.version == 'v2'
@@ -0,0 +1,134 @@
+"""
+Tests for keyset pagination (pagination.py).
+"""
+import pytest
+
+from pagination import (
+    MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE, Page, encode_cursor, decode_cursor,
+    parse_page, page_query, page_fields, split_page
+)
+
+
+@pytest.mark.parametrize('sort, values', [
+    ('name', ['Dog Park', 12]),
+    ('name', ['Ōtaki Beach "off leash" / area', 3]),
+    ('name', ['', 1]),
+    ('id', [987654321]),
+])
+def test_cursor_round_trip(sort, values):
+    cursor = encode_cursor(sort, values)
+    assert decode_cursor(cursor) == (sort, values)
+
+
+def test_cursor_is_url_safe():
+    # Names chosen so plain base64 would need + and / characters and padding
+    cursor = encode_cursor('name', ['>>>???~~~', 1])
+    assert not set(cursor) & set('+/=')
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor!',
+    encode_cursor('name', ['Dog Park', 1])[:-4],
+    encode_cursor('size', [1]),
+    encode_cursor('name', ['Dog Park']),
+    encode_cursor('id', [1, 2]),
+    encode_cursor('id', ['1']),
+    encode_cursor('id', [True]),
+    encode_cursor('name', [1, 1]),
+])
+def test_decode_cursor_rejects_invalid_cursors(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_parse_page_unpaginated_without_limit_or_cursor():
+    assert parse_page({}) is None
+    assert parse_page({'sort': 'id'}) is None
+
+
+def test_parse_page_defaults():
+    assert parse_page({'limit': '20'}) == Page(20, 'name', None)
+    assert parse_page({}, default_limit=50) == Page(50, 'name', None)
+    assert parse_page({'sort': 'id'}, default_limit=50) == Page(50, 'id', None)
+
+
+def test_parse_page_takes_sort_from_cursor():
+    cursor = encode_cursor('id', [41])
+    assert parse_page({'cursor': cursor}) == Page(DEFAULT_PAGE_SIZE, 'id', [41])
+    assert parse_page({'cursor': cursor, 'sort': 'id', 'limit': '5'}) == Page(5, 'id', [41])
+
+
+@pytest.mark.parametrize('args', [
+    {'limit': 'ten'},
+    {'limit': '0'},
+    {'limit': str(MAX_PAGE_SIZE + 1)},
+    {'limit': '10', 'sort': 'size'},
+    {'cursor': encode_cursor('id', [41]), 'sort': 'name'},
+    {'cursor': 'garbage'},
+])
+def test_parse_page_rejects_invalid_parameters(args):
+    with pytest.raises(ValueError):
+        parse_page(args)
+
+
+def test_page_query_first_page():
+    where, params, order_by, limit = page_query(Page(10, 'name', None), ["ml.type = :type"], {'type': 2})
+    assert where == ["ml.type = :type"]
+    assert params == {'type': 2}
+    assert order_by == "ml.name, ml.id"
+    assert limit == 11
+
+
+def test_page_query_after_cursor_leaves_arguments_alone():
+    base_where, base_params = ["ml.type = :type"], {'type': 2}
+    where, params, order_by, limit = page_query(Page(10, 'name', ['Dog Park', 7]), base_where, base_params)
+
+    assert where[0] == "ml.type = :type" and len(where) == 2
+    assert params == {'type': 2, 'cursor_name': 'Dog Park', 'cursor_id': 7}
+    assert base_where == ["ml.type = :type"]
+    assert base_params == {'type': 2}
+
+
+def test_page_fields():
+    assert page_fields(Page(10, 'name', None)) == ('name', 'id')
+    assert page_fields(Page(10, 'id', None)) == ('id',)
+
+
+def test_split_page_last_page():
+    locations = [{'id': 1, 'name': 'A'}, {'id': 2, 'name': 'B'}]
+    assert split_page(Page(2, 'name', None), locations) == (locations, None)
+
+
+def test_split_page_trims_extra_row():
+    locations = [{'id': 1, 'name': 'A'}, {'id': 2, 'name': 'B'}, {'id': 3, 'name': 'C'}]
+    page_locations, cursor = split_page(Page(2, 'name', None), locations)
+
+    assert page_locations == locations[:2]
+    assert decode_cursor(cursor) == ('name', ['B', 2])
+
+
+@pytest.mark.parametrize('sort', ['name', 'id'])
+def test_pages_cover_every_row_once(sort):
+    # Duplicate names exercise the tie break on ID
+    rows = [{'id': i, 'name': f"Park {i % 4}"} for i in range(1, 24)]
+    columns = page_fields(Page(5, sort, None))
+
+    def fetch(page):
+        # The in-memory equivalent of the query built by page_query
+        ordered = sorted(rows, key=lambda row: [row[column] for column in columns])
+        if page.after is not None:
+            ordered = [row for row in ordered if [row[column] for column in columns] > page.after]
+        return ordered[:page.limit + 1]
+
+    seen = []
+    args = {'limit': '5', 'sort': sort}
+    while True:
+        page = parse_page(args)
+        locations, cursor = split_page(page, fetch(page))
+        seen.extend(location['id'] for location in locations)
+        if cursor is None:
+            break
+        args = {'limit': '5', 'cursor': cursor}
+
+    assert sorted(seen) == [row['id'] for row in rows]
+    assert len(seen) == len(set(seen))
@@ -0,0 +1,70 @@
+"""
+Tests for splicing pre-encoded JSON into responses (raw_json.py).
+"""
+import datetime
+import json
+
+import pytest
+from flask import Flask, jsonify
+
+from raw_json import RawJSON, RawJSONProvider, dumps, to_python
+
+POINT = '{"type": "Point", "coordinates": [174.776, -41.2865]}'
+POLYGON = '{"type":"Polygon","coordinates":[[[174.7,-41.3],[174.8,-41.3],[174.8,-41.2],[174.7,-41.3]]]}'
+
+
+def test_raw_text_is_spliced_unchanged():
+    output = dumps({'id': 1, 'geometry': RawJSON(POINT)})
+
+    # The text is written as it is, spacing included, not re-encoded
+    assert POINT in output
+    assert json.loads(output) == {'id': 1, 'geometry': json.loads(POINT)}
+
+
+def test_many_raw_values_keep_their_places():
+    locations = [{'id': 1, 'geometry': RawJSON(POINT)}, {'id': 2, 'geometry': RawJSON(POLYGON)}]
+
+    assert json.loads(dumps(locations)) == [
+        {'id': 1, 'geometry': json.loads(POINT)},
+        {'id': 2, 'geometry': json.loads(POLYGON)},
+    ]
+
+
+def test_output_without_raw_values_matches_json_dumps():
+    data = {'name': 'Ōtaki "Beach"', 'tags': [1, 2.5, None, True]}
+    assert dumps(data) == json.dumps(data)
+    assert dumps(data, sort_keys=True, indent=2) == json.dumps(data, sort_keys=True, indent=2)
+
+
+def test_strings_that_look_like_placeholders_are_left_alone():
+    tricky = '\x00deadbeef:0\x00'
+    output = dumps({'name': tricky, 'geometry': RawJSON(POINT)})
+    assert json.loads(output) == {'name': tricky, 'geometry': json.loads(POINT)}
+
+
+def test_default_handles_other_types():
+    when = datetime.date(2024, 1, 2)
+    output = dumps({'date': when, 'geometry': RawJSON(POINT)}, default=lambda o: o.isoformat())
+    assert json.loads(output) == {'date': '2024-01-02', 'geometry': json.loads(POINT)}
+
+
+def test_unknown_types_are_rejected():
+    with pytest.raises(TypeError):
+        dumps({'value': object()})
+
+
+def test_to_python():
+    assert to_python(RawJSON(POINT)) == json.loads(POINT)
+    assert to_python({'a': 1}) == {'a': 1}
+    assert to_python(None) is None
+
+
+def test_provider_used_by_jsonify():
+    app = Flask(__name__)
+    app.json = RawJSONProvider(app)
+
+    with app.app_context():
+        response = jsonify({'success': True, 'geometry': RawJSON(POLYGON)})
+
+    assert POLYGON in response.get_data(as_text=True)
+    assert response.get_json() == {'success': True, 'geometry': json.loads(POLYGON)}
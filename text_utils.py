@@ -0,0 +1,12 @@
+"""
+Text helpers shared by the search features.
+"""
+import unicodedata
+
+
+# Function to normalize text by removing macrons
+def normalize_text(text):
+    # Normalize to decomposed form (separates base characters from diacritical marks)
+    decomposed = unicodedata.normalize('NFD', text)
+    # Remove diacritical marks and return
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
@@ -0,0 +1,302 @@
+"""
+Mapbox Vector Tiles (MVT) for map locations, with an on-disk tile cache.
+
+Tiles follow the standard XYZ web mercator scheme. Each tile holds a single
+"locations" layer with the location geometries clipped to the tile (plus a
+small buffer) and quantised to the tile extent, and the type attributes
+needed to style them.
+"""
+from app import app, db, spatial
+from sqlalchemy import text
+from collections import OrderedDict
+import math
+import os
+import shutil
+import tempfile
+import threading
+import mapbox_vector_tile
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+from serializers import fetch_locations, INTERSECTS_CONDITION, SPATIAL_INDEX_HINT
+from raw_json import to_python
+from viewport import bbox_to_wkt
+
+# Tile coordinate extent and clipping buffer, in tile units
+EXTENT = 4096
+BUFFER = 64
+
+# Name of the layer holding the locations
+LAYER_NAME = 'locations'
+
+# Latitude limit of the web mercator projection
+MAX_LATITUDE = 85.0511287798
+
+# Highest zoom level written to the cache. Deeper tiles hold very few
+# features, so they are cheap to render and not worth invalidating.
+MAX_CACHED_ZOOM = 16
+
+# If a write touches more tiles than this at one zoom level, the whole zoom
+# level is dropped from the cache instead of removing tiles one by one
+MAX_INVALIDATED_TILES = 256
+
+
+def _lng_to_tile_x(lng, zoom):
+    """Convert longitude to a fractional tile X coordinate."""
+    return (lng + 180.0) / 360.0 * (2 ** zoom)
+
+
+def _lat_to_tile_y(lat, zoom):
+    """Convert latitude to a fractional tile Y coordinate."""
+    lat = math.radians(max(min(lat, MAX_LATITUDE), -MAX_LATITUDE))
+    return (1.0 - math.log(math.tan(lat) + 1.0 / math.cos(lat)) / math.pi) / 2.0 * (2 ** zoom)
+
+
+def _tile_x_to_lng(x, zoom):
+    """Convert a tile X coordinate to longitude."""
+    return x / (2 ** zoom) * 360.0 - 180.0
+
+
+def _tile_y_to_lat(y, zoom):
+    """Convert a tile Y coordinate to latitude."""
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / (2 ** zoom)))))
+
+
+def is_valid_tile(z, x, y):
+    """Check that the tile coordinates exist at the zoom level."""
+    return 0 <= z <= 22 and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_bounds(z, x, y, buffer=0):
+    """
+    Get the bounds of a tile.
+
+    Args:
+        z, x, y: Tile coordinates
+        buffer: Optional buffer around the tile, in tile units
+
+    Returns:
+        tuple: (min_lng, min_lat, max_lng, max_lat)
+    """
+    pad = buffer / EXTENT
+    min_lng = max(_tile_x_to_lng(x - pad, z), -180.0)
+    max_lng = min(_tile_x_to_lng(x + 1 + pad, z), 180.0)
+    min_lat = _tile_y_to_lat(y + 1 + pad, z)
+    max_lat = _tile_y_to_lat(y - pad, z)
+    return (min_lng, min_lat, max_lng, max_lat)
+
+
+def tiles_for_bounds(bounds, z):
+    """
+    Get the range of tiles at a zoom level whose buffered area touches the bounds.
+
+    Returns:
+        tuple: (min_x, min_y, max_x, max_y), inclusive
+    """
+    min_lng, min_lat, max_lng, max_lat = bounds
+    pad = BUFFER / EXTENT
+    last = 2 ** z - 1
+    min_x = max(int(math.floor(_lng_to_tile_x(min_lng, z) - pad)), 0)
+    max_x = min(int(math.floor(_lng_to_tile_x(max_lng, z) + pad)), last)
+    min_y = max(int(math.floor(_lat_to_tile_y(max_lat, z) - pad)), 0)
+    max_y = min(int(math.floor(_lat_to_tile_y(min_lat, z) + pad)), last)
+    return (min_x, min_y, max_x, max_y)
+
+
+def _project_to_tile(geom, z, x, y):
+    """Project a lng/lat geometry to the coordinate space of a tile."""
+    scale = 2 ** z
+
+    def transform(coords):
+        lng = coords[:, 0]
+        lat = np.radians(np.clip(coords[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+        tile_x = (lng + 180.0) / 360.0 * scale
+        tile_y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * scale
+        return np.column_stack(((tile_x - x) * EXTENT, (tile_y - y) * EXTENT))
+
+    return shapely.transform(geom, transform)
+
+
+def render_tile(z, x, y):
+    """
+    Render a vector tile from the database.
+
+    Returns:
+        bytes: The encoded MVT tile
+    """
+    bounds = tile_bounds(z, x, y, buffer=BUFFER)
+
+    # A geography polygon can't be larger than a hemisphere, so the tiles of
+    # the lowest zoom levels read every location and rely on the clipping below
+    if bounds[2] - bounds[0] < 180:
+        where, params, index_hint = [INTERSECTS_CONDITION], {'bbox_wkt': bbox_to_wkt(bounds)}, SPATIAL_INDEX_HINT
+    else:
+        where, params, index_hint = [], {}, None
+
+    # Use the simplified geometries for the zoom level where available
+    locations = fetch_locations(where, params, index_hint=index_hint, zoom=z)
+
+    features = []
+    for location in locations:
+        if not location['geometry']:
+            continue
+
+        geom = _project_to_tile(shape(to_python(location['geometry'])), z, x, y)
+
+        # Clip to the buffered tile and snap to the integer tile grid
+        geom = shapely.clip_by_rect(geom, -BUFFER, -BUFFER, EXTENT + BUFFER, EXTENT + BUFFER)
+        geom = shapely.set_precision(geom, 1.0)
+        if geom.is_empty:
+            continue
+
+        location_type = location['location_type'] or {}
+        features.append({
+            'id': location['id'],
+            'geometry': geom,
+            'properties': {
+                'name': location['name'],
+                'type': location['type'],
+                'short_name': location_type.get('short_name'),
+                'icon': location_type.get('icon'),
+                'color': location_type.get('color')
+            }
+        })
+
+    return mapbox_vector_tile.encode(
+        [{'name': LAYER_NAME, 'features': features}],
+        default_options={'extents': EXTENT, 'y_coord_down': True}
+    )
+
+
+class TileCache:
+    """
+    Two level tile cache: an in-memory LRU in front of a directory of tiles.
+
+    The directory is shared by all workers, so invalidating a tile removes
+    the file and memory hits are only trusted while the file still exists.
+    """
+
+    def __init__(self, directory, max_memory_tiles=1024):
+        self.directory = directory
+        self.max_memory_tiles = max_memory_tiles
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, z, x, y):
+        return os.path.join(self.directory, str(z), str(x), f"{y}.pbf")
+
+    def get(self, z, x, y):
+        """Get a cached tile, or None if it isn't cached."""
+        key = (z, x, y)
+        path = self._path(z, x, y)
+
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                if os.path.exists(path):
+                    self._memory.move_to_end(key)
+                    return data
+                # Invalidated by another worker
+                del self._memory[key]
+
+        try:
+            with open(path, 'rb') as tile_file:
+                data = tile_file.read()
+        except OSError:
+            return None
+
+        self._remember(key, data)
+        return data
+
+    def put(self, z, x, y, data):
+        """Store a tile in the cache."""
+        if z > MAX_CACHED_ZOOM:
+            return
+
+        path = self._path(z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first so readers never see a partial tile
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tile_file:
+            tile_file.write(data)
+        os.replace(tmp_path, path)
+
+        self._remember((z, x, y), data)
+
+    def _remember(self, key, data):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_tiles:
+                self._memory.popitem(last=False)
+
+    def invalidate_bounds(self, bounds):
+        """Remove every cached tile that could show a geometry with these bounds."""
+        for z in range(MAX_CACHED_ZOOM + 1):
+            min_x, min_y, max_x, max_y = tiles_for_bounds(bounds, z)
+
+            if (max_x - min_x + 1) * (max_y - min_y + 1) > MAX_INVALIDATED_TILES:
+                self.invalidate_zoom(z)
+                continue
+
+            for x in range(min_x, max_x + 1):
+                for y in range(min_y, max_y + 1):
+                    self._remove(z, x, y)
+
+    def invalidate_zoom(self, z):
+        """Remove every cached tile at a zoom level."""
+        shutil.rmtree(os.path.join(self.directory, str(z)), ignore_errors=True)
+        with self._lock:
+            for key in [key for key in self._memory if key[0] == z]:
+                del self._memory[key]
+
+    def clear(self):
+        """Remove every cached tile."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        with self._lock:
+            self._memory.clear()
+
+    def remove(self, z, x, y):
+        """Remove a cached tile."""
+        self._remove(z, x, y)
+
+    def _remove(self, z, x, y):
+        try:
+            os.remove(self._path(z, x, y))
+        except OSError:
+            pass
+        with self._lock:
+            self._memory.pop((z, x, y), None)
+
+
+tile_cache = TileCache(os.path.join(app.config['CACHE_DIR'], 'tiles'), app.config['TILE_MEMORY_CACHE_SIZE'])
+
+
+def location_bounds(location_id):
+    """
+    Get the bounds of a stored location's geometry.
+
+    Returns:
+        tuple: (min_lng, min_lat, max_lng, max_lat), or None if it has no geometry
+    """
+    result = db.session.execute(
+        text(f"SELECT {spatial.as_binary('geometry')} as wkb FROM map_location WHERE id = :id"),
+        {"id": location_id}
+    ).fetchone()
+
+    if not result or not result.wkb:
+        return None
+
+    return shapely.from_wkb(result.wkb).bounds
+
+
+def invalidate_tiles(*bounds_list):
+    """Invalidate the cached tiles for each of the given geometry bounds."""
+    for bounds in bounds_list:
+        if bounds:
+            try:
+                tile_cache.invalidate_bounds(bounds)
+            except Exception as e:
+                app.logger.error(f"Error invalidating tile cache: {str(e)}")
@@ -0,0 +1,115 @@
+"""
+Helpers for viewport (bounding box and zoom) and position filtered location queries.
+"""
+import shapely
+from shapely.geometry import box
+
+# Valid zoom levels for the web map
+MIN_ZOOM = 0
+MAX_ZOOM = 22
+
+# Longest edge used when densifying a bounding box, in degrees. Geography
+# edges are great circle arcs, so long east-west edges are split up to keep
+# the polygon close to the rectangle shown on the map.
+MAX_EDGE_DEGREES = 1.0
+
+
+def parse_bbox(value):
+    """
+    Parse a bounding box query parameter.
+
+    Args:
+        value: String in the form "minLng,minLat,maxLng,maxLat"
+
+    Returns:
+        tuple: (min_lng, min_lat, max_lng, max_lat), or None if no value was given
+
+    Raises:
+        ValueError: If the bounding box is malformed or out of range
+    """
+    if not value:
+        return None
+
+    parts = value.split(',')
+    if len(parts) != 4:
+        raise ValueError("bbox must be in the form minLng,minLat,maxLng,maxLat")
+
+    try:
+        min_lng, min_lat, max_lng, max_lat = [float(part) for part in parts]
+    except ValueError:
+        raise ValueError("bbox values must be numbers")
+
+    if not (-180 <= min_lng < max_lng <= 180):
+        raise ValueError("bbox longitudes must be between -180 and 180 with minLng < maxLng")
+
+    if not (-90 <= min_lat < max_lat <= 90):
+        raise ValueError("bbox latitudes must be between -90 and 90 with minLat < maxLat")
+
+    # A geography polygon cannot be larger than a hemisphere
+    if max_lng - min_lng >= 180:
+        raise ValueError("bbox must be less than 180 degrees wide")
+
+    return (min_lng, min_lat, max_lng, max_lat)
+
+
+def parse_zoom(value):
+    """
+    Parse a zoom query parameter.
+
+    Returns:
+        int: The zoom level, or None if no value was given
+
+    Raises:
+        ValueError: If the zoom level is not an integer in the valid range
+    """
+    if value is None or value == '':
+        return None
+
+    try:
+        zoom = int(float(value))
+    except ValueError:
+        raise ValueError("zoom must be a number")
+
+    if not (MIN_ZOOM <= zoom <= MAX_ZOOM):
+        raise ValueError(f"zoom must be between {MIN_ZOOM} and {MAX_ZOOM}")
+
+    return zoom
+
+
+def parse_point(lat_value, lng_value):
+    """
+    Parse lat and lng query parameters.
+
+    Returns:
+        tuple: (lat, lng)
+
+    Raises:
+        ValueError: If either value is missing, not a number or out of range
+    """
+    if lat_value in (None, '') or lng_value in (None, ''):
+        raise ValueError("lat and lng are required")
+
+    try:
+        lat = float(lat_value)
+        lng = float(lng_value)
+    except ValueError:
+        raise ValueError("lat and lng must be numbers")
+
+    if not (-90 <= lat <= 90):
+        raise ValueError("lat must be between -90 and 90")
+
+    if not (-180 <= lng <= 180):
+        raise ValueError("lng must be between -180 and 180")
+
+    return (lat, lng)
+
+
+def bbox_to_wkt(bbox):
+    """
+    Convert a bounding box to a WKT polygon suitable for a geography query.
+
+    The ring is counter-clockwise, as SQL Server requires for geography
+    polygons, and densified so its edges follow the lines of latitude.
+    """
+    polygon = box(*bbox, ccw=True)
+    return shapely.segmentize(polygon, MAX_EDGE_DEGREES).wkt
@@ -0,0 +1,54 @@
+"""
+Warm-up of a worker process before it serves requests.
+
+Run from the gunicorn hooks in gunicorn.conf.py, so the first requests to a
+new worker don't pay for database logins and cache loading.
+"""
+from app import app, db
+from sqlalchemy import text
+
+
+def warm_shared_caches():
+    """
+    Load the caches that don't depend on the database.
+
+    Called in the master process before the workers are forked, so the
+    workers share the loaded data.
+    """
+    from gazetteer import get_gazetteer
+
+    try:
+        get_gazetteer()
+    except Exception as e:
+        app.logger.error(f"Error warming up the gazetteer: {str(e)}")
+
+
+def warm_connection_pool(connections):
+    """Open connections up to the given number and return them to the pool."""
+    opened = []
+    try:
+        with app.app_context():
+            for _ in range(connections):
+                connection = db.engine.connect()
+                opened.append(connection)
+                connection.execute(text("SELECT 1"))
+    except Exception as e:
+        app.logger.error(f"Error warming up the connection pool: {str(e)}")
+    finally:
+        for connection in opened:
+            connection.close()
+
+
+def warm_worker_caches():
+    """Load the database backed caches of a worker."""
+    from location_types import current_location_types
+    from name_index import current_name_index
+    from cluster_index import current_cluster_index
+
+    try:
+        with app.app_context():
+            current_location_types()
+            current_name_index()
+            current_cluster_index()
+    except Exception as e:
+        app.logger.error(f"Error warming up caches: {str(e)}")